@@ -0,0 +1,284 @@
+"""
+Cached loaders and sidebar state shared by the entry point (streamlit1.py) and the page modules in pages/.
+Everything here is light to import: plotting, Great Tables, the Census client and the page queries are
+imported by the pages that use them, so a cold start only pays for the page that is actually opened.
+"""
+import threading
+
+import polars as pl
+import streamlit as st
+
+from artifacts import artifact_counts, artifact_table, metadata_counts
+from backends import get_backend
+from baskets import basket_affinity
+from filter_engine import FilterEngine
+from ingest import batches_since, data_version, period_version
+from product_classes import load_product_classes
+from result_cache import cached_result, dataset_version, get_result_cache
+from rollups import (
+    build_payment_product_counts, build_weekly_product_cube, load_payment_facts, load_payment_product_counts,
+    load_store_totals, load_weekly_product_cube
+)
+from snapshots import load_snapshots, snapshots_enabled
+from tracing import result_rows, span, traced
+
+# NOTE: Page scripts and their titles in navigation order, the first one is the default page.
+PAGES = [
+    ("pages/home.py", "Home"),
+    ("pages/top_products.py", "Top 5 Products Weekly Sales"),
+    ("pages/beverages.py", "Packaged Beverages: Recommended Product Drops"),
+    ("pages/payments.py", "Cash Versus Credit Customers"),
+    ("pages/demographics.py", "Comparison Demographics of Shoppers: Store Level (Census Data)")
+]
+
+# NOTE: One backend per process (CSTORE_BACKEND, see backends.py), the DuckDB backend keeps its connection pool here.
+@traced("load_backend")
+@st.cache_resource
+def load_backend():
+    """Open the configured storage backend, parquet when it isn't available"""
+    return get_backend()
+
+
+# NOTE: One result cache per process (CSTORE_RESULT_CACHE, see result_cache.py), the store behind it is shared by every worker and instance.
+@st.cache_resource
+def load_result_cache():
+    """Open the configured result cache, the local directory when Redis isn't available"""
+    return get_result_cache()
+
+
+def shared_result(name, params, compute):
+    """compute() through the shared result cache, keyed by name, the filter params and the current data version"""
+    with span(f"result_cache {name}") as record:
+        value = cached_result(load_result_cache(), name, params, dataset_version(load_backend()), compute)
+        record['rows'] = result_rows(value)
+    return value
+
+
+def filter_params(year_filter, month_filter, store_filter=None):
+    """The global filters in a canonical JSON-ready form, so equal selections share one cache entry"""
+    return [year_filter, sorted(month_filter), sorted(store_filter) if store_filter else None]
+
+
+@traced("load_data")
+@st.cache_resource
+def load_data():
+    """Build lazy scans over every backend table and cache them, nothing is read until a page collects"""
+    return load_backend().tables()
+
+
+@traced("load_sidebar_metadata")
+@st.cache_resource
+def load_sidebar_metadata(_data_dict):
+    """Year range for the Year filter and the stores master table, read once per process"""
+    counts = load_table_counts(_data_dict)
+    return counts['min_year'], counts['max_year'], _data_dict["stores"].collect()
+
+
+# NOTE: The Data Validation expander and the Home page read these, they only change when the data does so they are counted once per process.
+# NOTE: A container built with build.py finds them in the artifact manifest and skips the scans.
+@traced("load_table_counts")
+@st.cache_resource
+def load_table_counts(_data_dict):
+    """Year range, row and distinct-value counts for the sidebar, the Data Validation expander and the Home page"""
+    return artifact_counts(load_backend()) or metadata_counts(_data_dict, load_backend())
+
+
+@traced("load_store_labels")
+@st.cache_resource
+def load_store_labels(_data_dict):
+    """STORE_ID -> "id - name (city)" for the sidebar store filter, in STORE_ID order"""
+    stores_master = load_sidebar_metadata(_data_dict)[2]
+    labels = (
+        stores_master
+        .sort("STORE_ID")
+        .select([
+            "STORE_ID",
+            pl.format(
+                "{} - {} ({})",
+                "STORE_ID",
+                pl.coalesce("STORE_NAME", "STORE_CHAIN_NAME").fill_null(""),
+                pl.col("CITY").fill_null("")
+            ).alias("label")
+        ])
+    )
+    return dict(labels.iter_rows())
+
+
+def selected_filters():
+    """
+    (year, months, stores) picked in the sidebar's global filters for this rerun
+    year is None for "All Years", stores is a sorted tuple of STORE_IDs or None for every store
+    """
+    return st.session_state["global_filters"]
+
+
+def prebuilt(name, fallback):
+    """Table name from the build artifact when it's still current, otherwise fallback()"""
+    df = artifact_table(name, load_backend())
+    return df if df is not None else fallback()
+
+
+# NOTE: Rollups come from the build artifact (build.py) when it matches the data, otherwise they are persisted under data/rollups and shared by every session.
+@traced("load_product_cube")
+@st.cache_resource
+def load_product_cube():
+    """Load (or build once) the weekly product rollup cube"""
+    return prebuilt('weekly_product_cube', lambda: load_weekly_product_cube(load_data()))
+
+
+@traced("load_classes")
+@st.cache_resource
+def load_classes():
+    """Load (or build once) the product classification flags, rebuilt when the rules file changes"""
+    return prebuilt('product_classes', lambda: load_product_classes(data=load_data()))
+
+
+@traced("load_payment_tables")
+@st.cache_resource
+def load_payment_tables():
+    """Load (or build once) the payment fact table and the product-by-payment-type counts"""
+    return (
+        prebuilt('payment_facts', lambda: load_payment_facts(load_data())),
+        prebuilt('payment_product_counts', lambda: load_payment_product_counts(load_data()))
+    )
+
+
+@traced("load_store_total_table")
+@st.cache_resource
+def load_store_total_table():
+    """Load (or build once) the per-store revenue and transactions by period"""
+    return prebuilt('store_totals', lambda: load_store_totals(load_data()))
+
+
+# NOTE: The filter engine is shared by every session, it loads each (year, month) partition once and keeps a small LRU of recent selections.
+# NOTE: A store selection is sliced out of those partitions through the engine's per-store row index.
+# NOTE: Backed by memory-mapped snapshots, so extra sessions and extra workers share the same pages instead of copies.
+# NOTE: On a database backend each partition is a query with the period filter pushed into SQL instead.
+@traced("get_filter_engine")
+@st.cache_resource
+def get_filter_engine(_data_dict):
+    """Build the per-period filter engine once per process"""
+    use_snapshots = snapshots_enabled() and load_backend().name == "parquet"
+    snapshots = load_snapshots(_data_dict) if use_snapshots else None
+    return FilterEngine(_data_dict, snapshots=snapshots)
+
+
+@st.cache_resource
+def ingest_state():
+    """The last ingest.py batch this process's caches include, the caches are first loaded from the data as it is now"""
+    return {'version': data_version(), 'lock': threading.Lock()}
+
+
+# NOTE: Runs at the top of every rerun, a stat of the batch log when nothing was ingested.
+@traced("refresh_ingested")
+def refresh_ingested():
+    """
+    Bring the caches up to date with batches ingested since this process last looked
+    The filter engine drops only the touched periods, the rollups and counts are reloaded (ingest.py already merged the batch into them)
+    """
+    state = ingest_state()
+    with state['lock']:
+        batches = batches_since(state['version'])
+        if not batches:
+            return
+        # NOTE: A scan resolves its file list once, fresh scans are needed to see the new partition files.
+        load_data.clear()
+        data = load_data()
+        engine = get_filter_engine(data)
+        snapshots = load_snapshots(data) if engine.uses_snapshots else None
+        engine.invalidate([tuple(p) for batch in batches for p in batch['periods']], data, snapshots)
+        for loader in (
+            load_product_cube, load_payment_tables, load_store_total_table, load_classes,
+            load_table_counts, load_sidebar_metadata, load_store_labels
+        ):
+            loader.clear()
+        state['version'] = batches[-1]['batch']
+
+
+# NOTE: Removed @st.cache_data to prevent MemoryError - selections are cached by the filter engine instead of pickled per session.
+@traced("get_unified_data")
+def get_unified_data(_data_dict, year_filter, month_filter, store_filter=None):
+    """
+    Filter all data sources consistently by year/month/store
+    Returns unified dataset for all pages, as lazy frames over the engine's cached partitions
+    year_filter can be None for "All Years", store_filter None for every store
+    """
+    selection = get_filter_engine(_data_dict).select(year_filter, month_filter, store_filter)
+
+    return {
+        'filtered_daily': selection['filtered_daily'].lazy(),
+        'filtered_sets': selection['filtered_sets'].lazy(),
+        'filtered_items': selection['filtered_items'].lazy(),
+        'total_revenue': selection['total_revenue'],
+        'total_transactions': selection['total_transactions'],
+        'unique_stores': selection['unique_stores']
+    }
+
+
+@traced("load_product_dimension")
+@st.cache_resource
+def load_product_dimension(_data_dict):
+    """GTIN -> brand and category lookup used to label basket items"""
+    return _data_dict["gtin"].select(["GTIN", "BRAND", "CATEGORY", "SUBCATEGORY"]).collect()
+
+
+# NOTE: Basket co-occurrence is cached per filter window, only the small result tables are kept per entry.
+# NOTE: The window's period_version is part of the key, so an ingested batch only misses the windows it touched.
+@st.cache_data(max_entries=16)
+def cached_basket_affinity(_data_dict, year_filter, month_filter, store_filter, data_version):
+    def compute():
+        selection = get_filter_engine(_data_dict).select(year_filter, month_filter, store_filter)
+        return basket_affinity(selection['filtered_items'], load_product_dimension(_data_dict), load_classes())
+    return shared_result("basket_affinity", filter_params(year_filter, month_filter, store_filter), compute)
+
+
+@traced("get_basket_affinity")
+def get_basket_affinity(_data_dict, year_filter, month_filter, store_filter=None):
+    """Packaged beverage brand x brand/category affinity and revenue at risk for the selected window and stores"""
+    return cached_basket_affinity(
+        _data_dict, year_filter, month_filter, store_filter, period_version(year_filter, month_filter)
+    )
+
+
+# NOTE: The rollups have no store dimension, for a store selection they are rebuilt from the selection's slices, which only hold those stores' rows.
+@traced("get_product_cube")
+def get_product_cube(_data_dict, year_filter, month_filter, store_filter=None):
+    """Weekly product cube for the selected stores, the shared rollup when every store is selected"""
+    if not store_filter:
+        return load_product_cube()
+
+    def compute():
+        selection = get_filter_engine(_data_dict).select(year_filter, month_filter, store_filter)
+        return build_weekly_product_cube(selection['filtered_daily'].lazy()).collect()
+    return shared_result("product_cube", filter_params(year_filter, month_filter, store_filter), compute)
+
+
+@traced("get_payment_tables")
+def get_payment_tables(_data_dict, year_filter, month_filter, store_filter=None):
+    """Payment facts and product-by-payment-type counts for the selected stores, the shared rollups for every store"""
+    payment_facts, payment_products = load_payment_tables()
+    if not store_filter:
+        return payment_facts, payment_products
+
+    def compute():
+        selection = get_filter_engine(_data_dict).select(year_filter, month_filter, store_filter)
+        return build_payment_product_counts(
+            selection['filtered_sets'].lazy(), selection['filtered_items'].lazy(), _data_dict["gtin"]
+        ).collect()
+    store_products = shared_result(
+        "payment_product_counts", filter_params(year_filter, month_filter, store_filter), compute
+    )
+    return payment_facts.filter(pl.col("STORE_ID").is_in(store_filter)), store_products
+
+
+@traced("get_beverage_performance")
+def get_beverage_performance(_data_dict, year_filter, month_filter, store_filter, min_transactions):
+    """Packaged beverage brand performance for the selected window and stores, shared across workers"""
+    def compute():
+        # NOTE: queries.py pulls in the Census module, it's only imported when a result has to be computed.
+        from queries import beverage_brand_performance
+
+        selection = get_filter_engine(_data_dict).select(year_filter, month_filter, store_filter)
+        return beverage_brand_performance(selection['filtered_daily'], min_transactions, load_classes())
+    params = filter_params(year_filter, month_filter, store_filter) + [min_transactions]
+    return shared_result("beverage_brand_performance", params, compute)
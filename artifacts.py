@@ -0,0 +1,197 @@
+"""
+Build-time artifact of the derived tables the pages start from.
+build.py materializes them ahead of time (during `docker build`) into a versioned directory:
+
+    data/artifacts/CURRENT                   name of the newest version
+    data/artifacts/<version>/manifest.json   format, backend, counts and every table's inputs with their checksums
+    data/artifacts/<version>/<table>.parquet
+
+The inputs of a table are the source files it was computed from (parquet files or the DuckDB database),
+the Census cache files and rules file it reads, and the modules that compute it. A table is only served
+from the artifact while every input still matches its sha256 checksum, otherwise the app falls back to
+computing it on the fly. Files whose size and mtime are unchanged since the build aren't rehashed, so a
+container checks its image in a few stat calls. Set CSTORE_ARTIFACT_DIR to move the directory,
+CSTORE_ARTIFACTS=0 turns it off.
+"""
+import hashlib
+import json
+import os
+import threading
+
+import polars as pl
+
+from data_layer import DATA_DIR, source_files
+
+ARTIFACT_DIR = os.environ.get("CSTORE_ARTIFACT_DIR", f"{DATA_DIR}/artifacts")
+# NOTE: Bumped whenever a table's layout changes in a way the code checksums can't see (e.g. a new manifest field).
+ARTIFACT_FORMAT = 1
+
+CODE_DIR = os.path.dirname(os.path.abspath(__file__))
+CODE_FILES = [
+    "artifacts.py", "build.py", "census.py", "data_layer.py", "product_classes.py", "queries.py", "rollups.py"
+]
+
+# NOTE: Source tables and extra inputs (the rules file, the Census cache files) each artifact entry is computed from.
+TABLE_SOURCES = {
+    'weekly_product_cube': (['daily'], []),
+    'payment_facts': (['sets', 'items'], []),
+    'payment_product_counts': (['sets', 'items', 'gtin'], []),
+    'store_totals': (['daily'], []),
+    'product_classes': (['gtin', 'daily'], ['rules']),
+    'stores_enriched': (['stores'], ['census']),
+    'counts': (['stores', 'gtin', 'sets', 'items', 'daily'], []),
+}
+
+_checksums = {}
+_frames = {}
+_lock = threading.Lock()
+
+
+def artifacts_enabled():
+    """Artifacts are used unless CSTORE_ARTIFACTS=0"""
+    return os.environ.get("CSTORE_ARTIFACTS", "1") != "0"
+
+
+def metadata_counts(data, backend):
+    """Year range plus the row and distinct-value counts the Data Validation expander and the Home page show"""
+    stores_master = data["stores"].collect()
+    year_bounds = data["daily"].select(
+        pl.col("CALENDAR_YEAR").min().alias("min_year"),
+        pl.col("CALENDAR_YEAR").max().alias("max_year")
+    ).collect()
+    return {
+        'min_year': int(year_bounds["min_year"].item()),
+        'max_year': int(year_bounds["max_year"].item()),
+        'stores': len(stores_master),
+        'gtin': backend.row_count('gtin'),
+        'sets': backend.row_count('sets'),
+        'items': backend.row_count('items'),
+        'states': stores_master.select("STATE").n_unique(),
+        'chains': stores_master.select("STORE_CHAIN_NAME").n_unique(),
+        'stores_in_daily': data["daily"].select(pl.col("STORE_ID").n_unique()).collect().item()
+    }
+
+
+def extra_files(kind):
+    """Files behind an extra input, imported here so the app only loads census.py for the demographics page"""
+    if kind == 'rules':
+        from product_classes import RULES_FILE
+        return [RULES_FILE]
+    from census import COUNTY_ACS_FILE, TRACT_ACS_FILE, TRACT_GEOCODED_FILE
+    return [TRACT_GEOCODED_FILE, TRACT_ACS_FILE, COUNTY_ACS_FILE]
+
+
+def input_files(name, backend):
+    """Every file the artifact entry name depends on with the given backend, in a stable order"""
+    tables, extra = TABLE_SOURCES[name]
+    if backend.name == "duckdb":
+        files = [backend.path]
+    else:
+        files = [f for table in tables for f in source_files(table)]
+    for kind in extra:
+        files += extra_files(kind)
+    return files + [os.path.join(CODE_DIR, f) for f in CODE_FILES]
+
+
+def file_checksum(path):
+    """sha256 of a file's content, None when the file doesn't exist"""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_record(path):
+    """Checksum, size and mtime of a file as the manifest records it, None when the file doesn't exist"""
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return {'sha256': file_checksum(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def input_matches(path, record):
+    """True when a file still has the recorded content, it's only rehashed when its size or mtime moved"""
+    if record is None or not os.path.exists(path):
+        return record is None and not os.path.exists(path)
+    stat = os.stat(path)
+    if stat.st_size != record['size']:
+        return False
+    if stat.st_mtime_ns == record['mtime_ns']:
+        return True
+    # NOTE: A copy or a touch changes the mtime but not the content, the rehash is kept per (size, mtime).
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    if key not in _checksums:
+        _checksums[key] = file_checksum(path)
+    return _checksums[key] == record['sha256']
+
+
+def current_version(root=ARTIFACT_DIR):
+    """Directory of the newest artifact, None when nothing has been built"""
+    pointer = f"{root}/CURRENT"
+    if not os.path.exists(pointer):
+        return None
+    with open(pointer) as f:
+        return f"{root}/{f.read().strip()}"
+
+
+def read_manifest(root=ARTIFACT_DIR):
+    """Manifest of the newest artifact, None when there is none or it was written by another format"""
+    version = current_version(root)
+    if version is None or not os.path.exists(f"{version}/manifest.json"):
+        return None
+    with open(f"{version}/manifest.json") as f:
+        manifest = json.load(f)
+    if manifest.get('format') != ARTIFACT_FORMAT:
+        return None
+    return {**manifest, 'path': version}
+
+
+def entry_matches(manifest, name, backend):
+    """True when the entry was built on this backend from exactly the inputs it would read now"""
+    entry = manifest['entries'].get(name)
+    if entry is None or manifest['backend'] != backend.name:
+        return False
+    inputs = entry['inputs']
+    if list(inputs) != input_files(name, backend):
+        return False
+    return all(input_matches(path, record) for path, record in inputs.items())
+
+
+def artifact_table(name, backend, root=ARTIFACT_DIR):
+    """A materialized table when the artifact has it and its inputs still match, otherwise None"""
+    if not artifacts_enabled():
+        return None
+    manifest = read_manifest(root)
+    if manifest is None or not entry_matches(manifest, name, backend):
+        return None
+    path = f"{manifest['path']}/{name}.parquet"
+    with _lock:
+        if path not in _frames:
+            _frames[path] = pl.read_parquet(path)
+        return _frames[path]
+
+
+def artifact_counts(backend, root=ARTIFACT_DIR):
+    """The metadata_counts() recorded by the build when their inputs still match, otherwise None"""
+    if not artifacts_enabled():
+        return None
+    manifest = read_manifest(root)
+    if manifest is None or not entry_matches(manifest, 'counts', backend):
+        return None
+    return manifest['counts']
+
+
+def artifact_summary(root=ARTIFACT_DIR):
+    """Version, build time and per-table row counts of the newest artifact, for reports"""
+    manifest = read_manifest(root)
+    if manifest is None:
+        return None
+    return {
+        'version': os.path.basename(manifest['path']),
+        'built_at': manifest['built_at'],
+        'backend': manifest['backend'],
+        'tables': {name: entry.get('rows') for name, entry in manifest['entries'].items()}
+    }
@@ -0,0 +1,215 @@
+"""
+Storage backends behind the dashboard's data feed.
+Every backend hands out the same dict of normalized LazyFrames as data_layer.scan_all(), so the filter engine,
+rollups and page queries run unchanged on top of any of them:
+
+    parquet  the parquet files under data/ (default, and the fallback when another backend is unavailable)
+    duckdb   a DuckDB database file, typically outside the container image
+
+DuckDB tables are exposed through a polars IO source that turns projections and filters into SQL, so a page
+only pulls the columns and periods it asks for. Aggregations, joins and n_unique still run in polars on the
+batches the source hands over, only direct SQL (row counts, query()) is aggregated inside DuckDB.
+Each process opens the database once (read-only, so every worker can share the file). Every scan opens its own
+short-lived cursor, query() borrows one from a fixed pool, results come back as Arrow.
+
+Pick the backend with CSTORE_BACKEND=duckdb and CSTORE_DUCKDB_PATH (default data/cstore.duckdb), size it with
+CSTORE_DB_POOL_SIZE (cursors, default 4), CSTORE_DB_POOL_TIMEOUT (seconds to wait for one, default 30) and
+CSTORE_DB_MEMORY_LIMIT (default 512MB), and load the parquet tables into a database with:
+
+    python backends.py
+    python backends.py --path /mnt/warehouse/cstore.duckdb
+"""
+import argparse
+from contextlib import contextmanager
+import os
+import queue
+
+import polars as pl
+from polars.io.plugins import register_io_source
+
+from data_layer import (
+    DAILY_COLUMNS, DATA_DIR, ITEMS_COLUMNS, PARTITION_COLUMNS, SETS_COLUMNS, TABLE_PATHS,
+    is_partitioned, normalize, row_count, scan_all, source_files
+)
+
+BACKEND = os.environ.get("CSTORE_BACKEND", "parquet")
+DUCKDB_PATH = os.environ.get("CSTORE_DUCKDB_PATH", f"{DATA_DIR}/cstore.duckdb")
+POOL_SIZE = int(os.environ.get("CSTORE_DB_POOL_SIZE", "4"))
+POOL_TIMEOUT = float(os.environ.get("CSTORE_DB_POOL_TIMEOUT", "30"))
+# NOTE: DuckDB defaults to 80% of host RAM for its buffer pool, far more than a Cloud Run instance has.
+MEMORY_LIMIT = os.environ.get("CSTORE_DB_MEMORY_LIMIT", "512MB")
+
+# NOTE: Same projections as scan_all(), the calendar columns ride along so period filters are pushed into SQL.
+TABLE_COLUMNS = {'daily': DAILY_COLUMNS, 'sets': SETS_COLUMNS, 'items': ITEMS_COLUMNS}
+
+
+class ParquetBackend:
+    """Lazy parquet scans from data_layer, nothing changes from the original data feed"""
+
+    name = "parquet"
+
+    def tables(self):
+        return scan_all()
+
+    def row_count(self, name):
+        return row_count(scan_all()[name])
+
+    def has_table(self, name):
+        return bool(source_files(name))
+
+
+class DuckDBBackend:
+    """Tables of a DuckDB database file as LazyFrames with projection and filter pushdown"""
+
+    name = "duckdb"
+
+    def __init__(self, path=DUCKDB_PATH, pool_size=POOL_SIZE, memory_limit=MEMORY_LIMIT, pool_timeout=POOL_TIMEOUT):
+        import duckdb
+
+        self.path = path
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
+        self._db = duckdb.connect(path, read_only=True, config={'memory_limit': memory_limit})
+        # NOTE: A DuckDB connection must not be used from two threads at once, every query borrows its own cursor.
+        self._pool = queue.Queue()
+        for _ in range(pool_size):
+            self._pool.put(self._db.cursor())
+        with self.connection() as cursor:
+            self.table_names = {row[0] for row in cursor.execute("SELECT table_name FROM duckdb_tables()").fetchall()}
+
+    @contextmanager
+    def connection(self):
+        """Borrow a cursor from the pool, TimeoutError when none is returned within pool_timeout seconds"""
+        try:
+            cursor = self._pool.get(timeout=self.pool_timeout)
+        except queue.Empty:
+            raise TimeoutError(
+                f"no DuckDB cursor free after {self.pool_timeout:g}s, raise CSTORE_DB_POOL_SIZE (now {self.pool_size})"
+            ) from None
+        try:
+            yield cursor
+        finally:
+            self._pool.put(cursor)
+
+    def query(self, sql, params=None):
+        """Run SQL and return the result as a DataFrame, fetched as Arrow"""
+        with self.connection() as cursor:
+            return pl.from_arrow(cursor.execute(sql, params).to_arrow_table(), rechunk=False)
+
+    def scan(self, name):
+        """LazyFrame over one table, the columns and filters polars pushes into the scan are run as SQL"""
+        with self.connection() as cursor:
+            schema = cursor.sql(f'SELECT * FROM "{name}"').pl(lazy=True).collect_schema()
+
+        def source(with_columns, predicate, n_rows, batch_size):
+            # NOTE: A query reads several sources at once (items, sets and gtin of an export) and each holds its cursor
+            # until its last batch, so sources open their own cursor instead of waiting on the pool held by the others.
+            with self._db.cursor() as cursor:
+                # NOTE: DuckDB's own polars source translates the projection and predicate, it's rebuilt per collect.
+                lf = cursor.sql(f'SELECT * FROM "{name}"').pl(lazy=True)
+                if with_columns is not None:
+                    lf = lf.select(with_columns)
+                if predicate is not None:
+                    lf = lf.filter(predicate)
+                if n_rows is not None:
+                    lf = lf.head(n_rows)
+                # NOTE: Batches are passed on as DuckDB fetches them, a sink downstream (export.py) never holds the whole result.
+                yield from lf.collect_batches(chunk_size=batch_size)
+
+        return register_io_source(source, schema=schema)
+
+    def tables(self):
+        data = {}
+        for name in TABLE_PATHS:
+            if name not in self.table_names:
+                # NOTE: Tables that were never loaded behave like a missing parquet file, empty until they are added.
+                data[name] = scan_all()[name]
+                continue
+            lf = self.scan(name)
+            columns = TABLE_COLUMNS.get(name)
+            if columns is not None:
+                available = lf.collect_schema().names()
+                lf = lf.select(columns + [c for c in PARTITION_COLUMNS if c in available and c not in columns])
+            data[name] = normalize(lf)
+        return data
+
+    def row_count(self, name):
+        if name not in self.table_names:
+            return row_count(scan_all()[name])
+        return self.query(f'SELECT count(*) AS n FROM "{name}"')["n"].item()
+
+    def has_table(self, name):
+        return name in self.table_names or bool(source_files(name))
+
+
+def get_backend(name=None, path=None):
+    """
+    Backend named by CSTORE_BACKEND, parquet when DuckDB isn't installed or the database file is missing,
+    corrupt or can't be opened (locked by a writer, unreadable)
+    """
+    name = name or BACKEND
+    path = path or DUCKDB_PATH
+    if name == "duckdb" and os.path.exists(path):
+        try:
+            import duckdb
+        except ImportError:
+            return ParquetBackend()
+        try:
+            return DuckDBBackend(path)
+        except duckdb.Error:
+            pass
+    return ParquetBackend()
+
+
+def sql_string(value):
+    """SQL string literal of value, single quotes doubled"""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def source_sql(name):
+    """SELECT over a table's parquet files, sets and items gain Int32 CALENDAR_YEAR/CALENDAR_MONTH columns"""
+    files = ", ".join(sql_string(f) for f in source_files(name))
+    scan = f"read_parquet([{files}], hive_partitioning = {str(is_partitioned(name)).lower()})"
+    if name == 'sets' and not is_partitioned(name):
+        return (
+            f"SELECT *, CAST(year(DATE_TIME) AS INTEGER) AS CALENDAR_YEAR, "
+            f"CAST(month(DATE_TIME) AS INTEGER) AS CALENDAR_MONTH FROM {scan}"
+        )
+    if name == 'items' and not is_partitioned(name):
+        return (
+            f"SELECT i.*, s.CALENDAR_YEAR, s.CALENDAR_MONTH FROM {scan} i "
+            f"JOIN sets s USING (TRANSACTION_SET_ID)"
+        )
+    return f"SELECT * FROM {scan}"
+
+
+def build_database(path=DUCKDB_PATH):
+    """Load every parquet table into a DuckDB file, transaction tables sorted by period so filters skip row groups"""
+    import duckdb
+
+    tmp = f"{path}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    counts = {}
+    with duckdb.connect(tmp) as db:
+        # NOTE: items take their calendar columns from sets, so sets is loaded before them.
+        for name in sorted(TABLE_PATHS, key=lambda n: n == 'items'):
+            if not source_files(name):
+                continue
+            order = " ORDER BY CALENDAR_YEAR, CALENDAR_MONTH" if name in TABLE_COLUMNS else ""
+            db.execute(f'CREATE TABLE "{name}" AS {source_sql(name)}{order}')
+            counts[name] = db.execute(f'SELECT count(*) FROM "{name}"').fetchone()[0]
+    os.replace(tmp, path)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default=DUCKDB_PATH)
+    args = parser.parse_args()
+    for name, rows in build_database(args.path).items():
+        print(f"{name}: {rows:,} rows in {args.path}")
+
+
+if __name__ == "__main__":
+    main()
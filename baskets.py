@@ -0,0 +1,102 @@
+"""
+Market-basket co-occurrence for brand-drop decisions.
+Transaction items are reduced to one row per (basket, brand) and (basket, category). Co-occurrence is a
+hash self-join of those rows on TRANSACTION_SET_ID, so the brand x brand and brand x category matrices come
+out in sparse coordinate form (only pairs that were actually bought together) without a Python loop over
+baskets. Support, confidence and lift follow the usual association-rule definitions:
+
+    support(A, B) = baskets(A and B) / baskets
+    confidence(A -> B) = baskets(A and B) / baskets(A)
+    lift(A, B) = support(A, B) / (support(A) * support(B))
+"""
+import polars as pl
+
+from product_classes import CLASS_KEYS, with_flag
+from tracing import traced
+
+# NOTE: Pairs bought together in fewer baskets than this are dropped, lift on a handful of baskets is noise.
+MIN_PAIR_BASKETS = 5
+
+
+def basket_lines(items, gtin):
+    """Item revenue per (basket, brand, category, subcategory), items without a brand are dropped"""
+    return (
+        items.lazy()
+        .join(gtin.lazy().select(["GTIN", "BRAND"] + CLASS_KEYS), on="GTIN", how="inner")
+        .filter(pl.col("BRAND").is_not_null())
+        .group_by(["TRANSACTION_SET_ID", "BRAND"] + CLASS_KEYS)
+        .agg(pl.col("GRAND_TOTAL_AMOUNT").sum().alias("revenue"))
+    )
+
+
+def _baskets_by(lines, key):
+    """One row per (basket, key) with the key's revenue in that basket"""
+    return lines.group_by(["TRANSACTION_SET_ID", key]).agg(pl.col("revenue").sum())
+
+
+def _pair_matrix(focus, other, other_key, total_baskets, min_baskets):
+    """Sparse focus-brand x other_key matrix with support, confidence and lift"""
+    focus_counts = focus.group_by("BRAND").agg(pl.len().alias("brand_baskets"))
+    other_counts = other.group_by(other_key).agg(pl.len().alias("other_baskets"))
+    pairs = focus.select(["TRANSACTION_SET_ID", "BRAND"]).join(
+        other.select(["TRANSACTION_SET_ID", other_key]), on="TRANSACTION_SET_ID", how="inner"
+    )
+    if other_key == "OTHER_BRAND":
+        pairs = pairs.filter(pl.col("BRAND") != pl.col("OTHER_BRAND"))
+    return (
+        pairs
+        .group_by(["BRAND", other_key])
+        .agg(pl.len().alias("pair_baskets"))
+        .filter(pl.col("pair_baskets") >= min_baskets)
+        .join(focus_counts, on="BRAND", how="left")
+        .join(other_counts, on=other_key, how="left")
+        .with_columns([
+            (pl.col("pair_baskets") / total_baskets).alias("support"),
+            (pl.col("pair_baskets") / pl.col("brand_baskets")).alias("confidence"),
+            (pl.col("pair_baskets") * total_baskets / (pl.col("brand_baskets") * pl.col("other_baskets"))).alias("lift")
+        ])
+    )
+
+
+@traced()
+def basket_affinity(items, gtin, product_classes, flag="is_packaged_beverage", min_baskets=MIN_PAIR_BASKETS):
+    """
+    Co-occurrence of every brand carrying flag with all other brands and categories in the same baskets
+    Returns {'brand_pairs', 'category_pairs', 'revenue_at_risk'} as collected DataFrames
+    """
+    lines = basket_lines(items, gtin).collect()
+    total_baskets = lines["TRANSACTION_SET_ID"].n_unique()
+
+    focus, brands, categories = pl.collect_all([
+        _baskets_by(with_flag(lines, product_classes, flag), "BRAND"),
+        _baskets_by(lines.lazy(), "BRAND").rename({"BRAND": "OTHER_BRAND"}),
+        _baskets_by(lines.lazy(), "CATEGORY")
+    ])
+
+    brand_pairs, category_pairs = pl.collect_all([
+        _pair_matrix(focus.lazy(), brands.lazy(), "OTHER_BRAND", total_baskets, min_baskets),
+        _pair_matrix(focus.lazy(), categories.lazy(), "CATEGORY", total_baskets, min_baskets)
+    ])
+
+    # NOTE: Worst case for a dropped brand: its own revenue plus everything else in the baskets it was part of.
+    basket_totals = lines.group_by("TRANSACTION_SET_ID").agg(pl.col("revenue").sum().alias("basket_revenue"))
+    top_partner = (
+        brand_pairs
+        .sort("lift", descending=True)
+        .group_by("BRAND", maintain_order=True)
+        .first()
+        .select(["BRAND", pl.col("OTHER_BRAND").alias("top_partner"), pl.col("lift").alias("top_partner_lift")])
+    )
+    revenue_at_risk = (
+        focus
+        .join(basket_totals, on="TRANSACTION_SET_ID", how="inner")
+        .group_by("BRAND")
+        .agg([
+            pl.len().alias("baskets"),
+            pl.col("revenue").sum().alias("own_revenue"),
+            (pl.col("basket_revenue") - pl.col("revenue")).sum().alias("halo_revenue")
+        ])
+        .with_columns((pl.col("own_revenue") + pl.col("halo_revenue")).alias("revenue_at_risk"))
+        .join(top_partner, on="BRAND", how="left")
+    )
+    return {'brand_pairs': brand_pairs, 'category_pairs': category_pairs, 'revenue_at_risk': revenue_at_risk}
@@ -0,0 +1,200 @@
+"""
+Benchmark suite for every dashboard query path.
+Generates a synthetic dataset per scale (1x, 10x, 100x of benchmarks/synthetic.py BASE_ROWS), runs the
+data layer, filter engine, rollup builds and every page query against it, and reports wall time and
+peak RSS growth for each step.
+
+    python benchmarks/run_benchmarks.py                  # 1x, 10x and 100x
+    python benchmarks/run_benchmarks.py --scales 1 10 --output bench.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import polars as pl  # noqa: E402
+
+import synthetic  # noqa: E402
+import backends  # noqa: E402
+import baskets  # noqa: E402
+import export  # noqa: E402
+from data_layer import scan_all  # noqa: E402
+from filter_engine import FilterEngine  # noqa: E402
+import product_classes  # noqa: E402
+import queries  # noqa: E402
+import result_cache  # noqa: E402
+import rollups  # noqa: E402
+import snapshots  # noqa: E402
+from tracing import current_rss  # noqa: E402
+
+ALL_MONTHS = list(range(1, 13))
+
+
+def measure(fn):
+    """Run fn once, returning (result, seconds, peak RSS growth in bytes) sampled every 5 ms"""
+    baseline = current_rss()
+    peak = [baseline]
+    done = threading.Event()
+
+    def sample():
+        while not done.is_set():
+            peak[0] = max(peak[0], current_rss())
+            time.sleep(0.005)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    try:
+        result = fn()
+    finally:
+        elapsed = time.perf_counter() - start
+        done.set()
+        sampler.join()
+    peak[0] = max(peak[0], current_rss())
+    return result, elapsed, peak[0] - baseline
+
+
+def result_rows(result):
+    if isinstance(result, pl.DataFrame):
+        return len(result)
+    if isinstance(result, tuple):
+        return sum(result_rows(r) for r in result)
+    if isinstance(result, dict) and 'filtered_sets' in result:
+        return len(result['filtered_sets'])
+    return None
+
+
+def run_scale(scale, workdir):
+    """Generate the dataset for one scale and time every query path against it"""
+    counts = synthetic.generate(workdir, scale)
+    os.chdir(workdir)
+    steps = []
+
+    def step(name, fn):
+        result, seconds, peak = measure(fn)
+        steps.append({
+            'scale': scale,
+            'step': name,
+            'seconds': round(seconds, 4),
+            'peak_rss_mb': round(peak / 2**20, 1),
+            'rows': result_rows(result)
+        })
+        return result
+
+    data = step("load_data", scan_all)
+    engine = step("filter_engine_index", lambda: FilterEngine(data))
+    unified = step("get_unified_data (cold, all years)", lambda: engine.select(None, ALL_MONTHS))
+    step("get_unified_data (LRU hit)", lambda: engine.select(None, ALL_MONTHS))
+    step("get_unified_data (toggle one month)", lambda: engine.select(None, ALL_MONTHS[:-1]))
+    step("get_unified_data (single year)", lambda: engine.select(synthetic.YEARS[-1], ALL_MONTHS))
+
+    snapshot_dir = os.path.join(workdir, "data", "snapshots")
+    step("build snapshots", lambda: snapshots.load_snapshots(data, snapshot_dir))
+    mapped = step("map snapshots", lambda: snapshots.load_snapshots(data, snapshot_dir))
+    snapshot_engine = step("filter_engine_index (snapshots)", lambda: FilterEngine(data, snapshots=mapped))
+    step("get_unified_data (cold, all years, snapshots)", lambda: snapshot_engine.select(None, ALL_MONTHS))
+
+    db_path = os.path.join(workdir, "data", "cstore.duckdb")
+    step("build duckdb", lambda: backends.build_database(db_path))
+    duckdb_data = backends.DuckDBBackend(db_path).tables()
+    duckdb_engine = step("filter_engine_index (duckdb)", lambda: FilterEngine(duckdb_data))
+    step("get_unified_data (cold, all years, duckdb)", lambda: duckdb_engine.select(None, ALL_MONTHS))
+    step("get_unified_data (single year, duckdb)", lambda: duckdb_engine.select(synthetic.YEARS[-1], ALL_MONTHS))
+
+    cube = step("build weekly_product_cube", lambda: rollups.build_weekly_product_cube(data["daily"]).collect())
+    facts = step("build payment_facts", lambda: rollups.build_payment_facts(data["sets"], data["items"]).collect())
+    product_counts = step(
+        "build payment_product_counts",
+        lambda: rollups.build_payment_product_counts(data["sets"], data["items"], data["gtin"]).collect()
+    )
+    totals = step("build store_totals", lambda: rollups.build_store_totals(data["daily"]).collect())
+
+    classes = step("build product_classes", lambda: product_classes.load_product_classes())
+    fuel_categories = product_classes.flagged(classes, "is_fuel", ["CATEGORY"])["CATEGORY"]
+    period_cube = rollups.non_fuel_period(cube, None, ALL_MONTHS, fuel_categories)
+    step("top5_overall + weekly_top5", lambda: rollups.top_products(period_cube, None, n=5))
+    filtered_daily = unified['filtered_daily']
+    step("bev_perf", lambda: queries.beverage_brand_performance(filtered_daily, 18, classes))
+    shared = result_cache.DirectoryCache(os.path.join(workdir, "data", "results"))
+    for outcome in ("miss", "hit"):
+        step(
+            f"bev_perf (result cache {outcome})",
+            lambda: result_cache.cached_result(
+                shared, "beverage_brand_performance", [None, ALL_MONTHS, None, 18], "bench",
+                lambda: queries.beverage_brand_performance(filtered_daily, 18, classes)
+            )
+        )
+    gtin_df = data["gtin"].collect()
+    step(
+        "basket_affinity",
+        lambda: baskets.basket_affinity(unified['filtered_items'], gtin_df, classes)['revenue_at_risk']
+    )
+    step("payment_summary", lambda: rollups.summarize_payments(facts, None, ALL_MONTHS, ["CASH", "CREDIT"]))
+    step(
+        "top_products_by_payment",
+        lambda: rollups.rank_products_by_payment(product_counts, None, ALL_MONTHS, ["CASH", "CREDIT"])
+    )
+
+    stores_df = (
+        pl.read_parquet("data/cstore_stores.parquet")
+        .select(["STORE_ID", "LATITUDE", "LONGITUDE", "STATE", "CITY"])
+        .with_columns(pl.col("STORE_ID").cast(pl.Int64))
+    )
+    tract_df = pl.read_parquet("data/census_tract_geocoded.parquet")
+    acs_tract_df = pl.read_parquet("data/census_tract_acs.parquet")
+    county_acs_df = pl.read_parquet("data/census_county_acs.parquet")
+    enriched = step(
+        "store/tract/county joins",
+        lambda: queries.enrich_stores(stores_df, tract_df, acs_tract_df, county_acs_df)
+    )
+    store_perf = step("store_totals", lambda: rollups.store_totals(totals, None, ALL_MONTHS))
+    valid_stores = queries.stores_with_demographics(enriched, store_perf)
+    step("state_demographics_summary", lambda: queries.state_demographics_summary(valid_stores))
+
+    # NOTE: Peak RSS of the exports should stay flat across scales, they are streamed rather than collected.
+    for fmt in export.FORMATS:
+        path = os.path.join(workdir, f"items.{fmt}")
+        step(
+            f"export items ({fmt})",
+            lambda: export.write_export(export.export_frame(data, 'items', None, ALL_MONTHS), path, fmt)
+        )
+
+    return counts, steps
+
+
+def print_report(all_steps):
+    print(f"{'scale':>5}  {'step':<46} {'seconds':>9} {'peak MB':>9} {'rows':>12}")
+    for s in all_steps:
+        rows = f"{s['rows']:,}" if s['rows'] is not None else ""
+        print(f"{s['scale']:>4}x  {s['step']:<46} {s['seconds']:>9.4f} {s['peak_rss_mb']:>9.1f} {rows:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--output", help="optional JSON file for the results")
+    args = parser.parse_args()
+
+    all_steps, datasets = [], {}
+    for scale in args.scales:
+        with tempfile.TemporaryDirectory(prefix=f"cstore_bench_{scale}x_") as workdir:
+            counts, steps = run_scale(scale, workdir)
+            os.chdir(REPO_ROOT)
+        datasets[scale] = counts
+        all_steps.extend(steps)
+        print_report(steps)
+        print()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({'datasets': datasets, 'steps': all_steps}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Cold start benchmark for the Streamlit app.
+Every measurement runs in a fresh interpreter against a synthetic dataset (benchmarks/synthetic.py), the way
+a Cloud Run instance scaled up from zero would:
+
+    imports      time to import the entry point's modules, then each page's own imports on top of them
+    first paint  the first Home run of a new process (imports, lazy scans, filter engine, page render)
+    rerun        a second Home run in the same process, everything cached
+    first visit  the first run of every other page in that process
+    ingest       a Home rerun right after ingest.py appended a day, which refreshes the touched periods
+
+build.py runs first and one untimed run builds the rollups and snapshots, so the timed runs see an image
+whose artifacts are already on disk (--no-build skips build.py, for the on-the-fly path).
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --scale 10 --runs 5 --output startup.json
+"""
+import argparse
+import ast
+from datetime import date
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import synthetic  # noqa: E402
+
+ENTRY_POINT = os.path.join(REPO_ROOT, "streamlit1.py")
+PAGES = {
+    'Home': "pages/home.py",
+    'Top 5 Products': "pages/top_products.py",
+    'Packaged Beverages': "pages/beverages.py",
+    'Cash vs Credit': "pages/payments.py",
+    'Demographics': "pages/demographics.py",
+}
+
+
+def import_statements(path):
+    """Source of every top-level import statement in a script"""
+    with open(path) as f:
+        source = f.read()
+    tree = ast.parse(source)
+    return "\n".join(
+        ast.get_source_segment(source, node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))
+    )
+
+
+def child_imports():
+    """Seconds to run the entry point's imports, then each page's imports on top of them (one page per process)"""
+    timings = {}
+    entry = import_statements(ENTRY_POINT)
+    for page, path in PAGES.items():
+        code = (
+            "import sys, time\n"
+            f"sys.path.insert(0, {REPO_ROOT!r})\n"
+            "start = time.perf_counter()\n"
+            f"exec({entry!r})\n"
+            "entry = time.perf_counter() - start\n"
+            f"exec({import_statements(os.path.join(REPO_ROOT, path))!r})\n"
+            "print(entry, time.perf_counter() - start - entry)\n"
+        )
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout.split()
+        timings['entry point'] = min(timings.get('entry point', float("inf")), float(out[0]))
+        timings[page] = float(out[1])
+    return timings
+
+
+def child_app(workdir):
+    """First paint, rerun and first visit of every page in this (fresh) process"""
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_ROOT)
+    from streamlit.testing.v1 import AppTest
+
+    timings = {}
+    at = AppTest.from_file(ENTRY_POINT, default_timeout=600)
+    start = time.perf_counter()
+    at.run()
+    timings['first paint (Home)'] = time.perf_counter() - start
+    start = time.perf_counter()
+    at.run()
+    timings['rerun (Home)'] = time.perf_counter() - start
+    for page, path in list(PAGES.items())[1:]:
+        start = time.perf_counter()
+        at.switch_page(path).run()
+        timings[f"first visit ({page})"] = time.perf_counter() - start
+        if at.exception:
+            raise RuntimeError(f"{page}: {at.exception[0].value}")
+
+    # NOTE: A batch appended while the process runs must be picked up by the next rerun, not break it.
+    # NOTE: switch_page runs the page script on its own, a new AppTest reruns the entry point where the refresh happens.
+    from ingest import ingest
+    ingest(**synthetic.generate_batch(workdir, date(synthetic.YEARS[-1], 12, 31)))
+    at = AppTest.from_file(ENTRY_POINT, default_timeout=600)
+    start = time.perf_counter()
+    at.run()
+    timings['rerun after ingest (Home)'] = time.perf_counter() - start
+    if at.exception:
+        raise RuntimeError(f"after ingest: {at.exception[0].value}")
+    return timings
+
+
+def run_child(*args):
+    """Run this script in a fresh interpreter and return (its JSON result, process wall time)"""
+    env = {**os.environ, 'CSTORE_PERF_LOG': "0"}
+    start = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), *args], capture_output=True, text=True, check=True, env=env
+    ).stdout
+    wall = time.perf_counter() - start
+    return json.loads(out.strip().splitlines()[-1]), wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--output", help="optional JSON file for the results")
+    parser.add_argument("--no-build", action="store_true", help="don't run build.py before the timed runs")
+    parser.add_argument("--child", choices=["imports", "app"], help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child == "imports":
+        print(json.dumps(child_imports()))
+        return
+    if args.child == "app":
+        print(json.dumps(child_app(args.workdir)))
+        return
+
+    samples = {}
+    with tempfile.TemporaryDirectory(prefix=f"cstore_startup_{args.scale}x_") as workdir:
+        synthetic.generate(workdir, args.scale)
+        if not args.no_build:
+            subprocess.run(
+                [sys.executable, os.path.join(REPO_ROOT, "build.py")], cwd=workdir, capture_output=True, check=True
+            )
+        run_child("--child", "app", "--workdir", workdir)
+        for _ in range(args.runs):
+            imports, _wall = run_child("--child", "imports")
+            app, wall = run_child("--child", "app", "--workdir", workdir)
+            for name, seconds in {**{f"import {k}": v for k, v in imports.items()}, **app, 'process total': wall}.items():
+                samples.setdefault(name, []).append(seconds)
+
+    results = {name: statistics.median(values) for name, values in samples.items()}
+    print(f"{'step':<46} {'median s':>9}   ({args.runs} runs, {args.scale}x data)")
+    for name, seconds in results.items():
+        print(f"{name:<46} {seconds:>9.4f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({'scale': args.scale, 'runs': args.runs, 'median_seconds': results, 'samples': samples}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
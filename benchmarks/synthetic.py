@@ -0,0 +1,197 @@
+"""
+Synthetic C-Store dataset with the same schema as data/, scaled by a row multiplier.
+The benchmark suite generates one dataset per scale so query cost can be compared at 1x, 10x and 100x.
+"""
+from datetime import date
+import os
+
+import numpy as np
+import polars as pl
+
+from census import ACS_VARS
+
+# NOTE: Row counts at scale 1, every transaction table is multiplied by the scale factor.
+BASE_ROWS = {
+    'stores': 167,
+    'gtin': 20_000,
+    'daily': 150_000,
+    'sets': 100_000,
+    'items': 300_000,
+}
+ITEM_SHARDS = 7
+YEARS = [2022, 2023, 2024]
+
+CATEGORIES = [
+    ("FUEL", "Gasoline"), ("Packaged Beverages", "Carbonated Soft Drinks"), ("Packaged Beverages", "Energy Drinks"),
+    ("Packaged Beverages", "Bottled Water"), ("Cold Dispensed Beverage", "Fountain Drink"), ("Salty Snacks", "Chips"),
+    ("Candy", "Chocolate"), ("Tobacco", "Cigarettes"), ("Beer", "Domestic"), ("Lottery/Gaming", "Lottery"),
+    ("Foodservice", "Hot Food"), ("Dairy", "Milk")
+]
+PAYMENT_TYPES = ["CASH", "CREDIT", "DEBIT", "EBT", None]
+
+
+def _gtin_table(rng, n):
+    category_idx = rng.integers(0, len(CATEGORIES), n)
+    brand_idx = rng.integers(0, max(n // 40, 1), n)
+    return pl.DataFrame({
+        "GTIN": [f"{i:014d}" for i in range(n)],
+        "CATEGORY": [CATEGORIES[i][0] for i in category_idx],
+        "SUBCATEGORY": [CATEGORIES[i][1] for i in category_idx],
+        "BRAND": [f"BRAND {b}" for b in brand_idx],
+        "SKUPOS_DESCRIPTION": [f"PRODUCT {i}" for i in range(n)],
+    })
+
+
+def _stores_table(rng, n):
+    return pl.DataFrame({
+        "STORE_ID": np.arange(10_000, 10_000 + n, dtype=np.int64),
+        "STORE_NAME": [f"Store {i}" for i in range(n)],
+        "STORE_CHAIN_NAME": [f"Chain {i % 25}" for i in range(n)],
+        "CITY": [f"City {i % 60}" for i in range(n)],
+        "STATE": rng.choice(["ID", "UT", "WA", "OR"], n),
+        "LATITUDE": rng.uniform(42.0, 49.0, n),
+        "LONGITUDE": rng.uniform(-117.0, -111.0, n),
+    })
+
+
+def _census_tables(stores):
+    """Geocoded tracts, tract ACS and county ACS matching the synthetic stores"""
+    n = len(stores)
+    tracts = pl.DataFrame({
+        "STORE_ID": stores["STORE_ID"],
+        "STATEFP": ["16"] * n,
+        "COUNTYFP": [f"{i % 44:03d}" for i in range(n)],
+        "TRACT": [f"{i:06d}" for i in range(n)],
+    })
+    tract_acs = tracts.drop("STORE_ID").with_columns(
+        [pl.lit(str(1000 + 10 * i)).alias(var) for i, var in enumerate(ACS_VARS)]
+    )
+    county_acs = pl.DataFrame({
+        **{var: [str(50_000 + 100 * i)] * 44 for i, var in enumerate(ACS_VARS)},
+        "NAME": [f"County {c}, Idaho" for c in range(44)],
+        "state": ["16"] * 44,
+        "county": [f"{c:03d}" for c in range(44)],
+    })
+    return tracts, tract_acs, county_acs
+
+
+def generate(root, scale=1, seed=0):
+    """Write a synthetic data/ directory under root, returns the row counts written"""
+    rng = np.random.default_rng(seed)
+    data_dir = os.path.join(root, "data")
+    os.makedirs(os.path.join(data_dir, "transaction_items"), exist_ok=True)
+
+    gtin = _gtin_table(rng, BASE_ROWS['gtin'])
+    stores = _stores_table(rng, BASE_ROWS['stores'] * scale)
+    gtin.write_parquet(os.path.join(data_dir, "cstore_master_ctin.parquet"))
+    stores.write_parquet(os.path.join(data_dir, "cstore_stores.parquet"))
+
+    store_ids = stores["STORE_ID"].to_numpy()
+    days = (date(YEARS[-1], 12, 31) - date(YEARS[0], 1, 1)).days + 1
+
+    n_daily = BASE_ROWS['daily'] * scale
+    product = rng.integers(0, len(gtin), n_daily)
+    day = pl.Series(np.datetime64(f"{YEARS[0]}-01-01") + rng.integers(0, days, n_daily).astype("timedelta64[D]"))
+    daily = (
+        gtin[product]
+        .with_columns([
+            pl.Series("STORE_ID", rng.choice(store_ids, n_daily)),
+            day.alias("DATE"),
+            pl.Series("TOTAL_REVENUE_AMOUNT", rng.gamma(2.0, 15.0, n_daily).round(2)),
+            pl.Series("QUANTITY", rng.integers(1, 40, n_daily)),
+            pl.Series("TRANSACTION_COUNT", rng.integers(1, 30, n_daily)),
+        ])
+        .with_columns([
+            pl.col("DATE").dt.year().alias("CALENDAR_YEAR"),
+            pl.col("DATE").dt.month().alias("CALENDAR_MONTH"),
+            pl.col("DATE").dt.week().alias("WEEk"),
+        ])
+    )
+    daily.write_parquet(os.path.join(data_dir, "cstore_transactions_daily_agg.parquet"))
+
+    n_sets = BASE_ROWS['sets'] * scale
+    seconds = rng.integers(0, days * 86_400, n_sets)
+    sets = pl.DataFrame({
+        "TRANSACTION_SET_ID": np.arange(n_sets, dtype=np.int64),
+        "STORE_ID": rng.choice(store_ids, n_sets),
+        "DATE_TIME": pl.Series((np.datetime64(f"{YEARS[0]}-01-01T00:00:00") + seconds.astype("timedelta64[s]")).astype("datetime64[us]")),
+        "PAYMENT_TYPE": pl.Series(PAYMENT_TYPES, dtype=pl.Utf8).gather(rng.integers(0, len(PAYMENT_TYPES), n_sets)),
+        "GRAND_TOTAL_AMOUNT": rng.gamma(2.0, 8.0, n_sets).round(2),
+    })
+    sets.write_parquet(os.path.join(data_dir, "cstore_transaction_sets.parquet"))
+
+    # NOTE: Items are generated shard by shard so the 100x dataset never has to fit in memory at once.
+    n_items = BASE_ROWS['items'] * scale
+    per_shard = -(-n_items // ITEM_SHARDS)
+    for shard in range(ITEM_SHARDS):
+        rows = min(per_shard, n_items - shard * per_shard)
+        pl.DataFrame({
+            "TRANSACTION_SET_ID": rng.integers(0, n_sets, rows),
+            "GTIN": gtin["GTIN"].gather(rng.integers(0, len(gtin), rows)),
+            "UNIT_QUANTITY": rng.integers(1, 4, rows),
+            "UNIT_PRICE": rng.gamma(2.0, 2.5, rows).round(2),
+            "GRAND_TOTAL_AMOUNT": rng.gamma(2.0, 4.0, rows).round(2),
+        }).write_parquet(os.path.join(data_dir, "transaction_items", f"part-{shard:05d}.parquet"))
+
+    tracts, tract_acs, county_acs = _census_tables(stores)
+    tracts.write_parquet(os.path.join(data_dir, "census_tract_geocoded.parquet"))
+    tract_acs.write_parquet(os.path.join(data_dir, "census_tract_acs.parquet"))
+    county_acs.write_parquet(os.path.join(data_dir, "census_county_acs.parquet"))
+
+    return {
+        'stores': len(stores),
+        'gtin': len(gtin),
+        'daily': n_daily,
+        'sets': n_sets,
+        'items': n_items,
+    }
+
+
+def generate_batch(root, day, rows=1_000, seed=1):
+    """
+    Write one day of new daily, sets and items rows under root/batch for ingest.py, returns their paths per table
+    Transaction ids continue after the largest one already stored under root/data
+    """
+    from data_layer import scan_table
+
+    rng = np.random.default_rng(seed)
+    batch_dir = os.path.join(root, "batch")
+    os.makedirs(batch_dir, exist_ok=True)
+    data_dir = os.path.join(root, "data")
+    gtin = pl.read_parquet(os.path.join(data_dir, "cstore_master_ctin.parquet"))
+    store_ids = pl.read_parquet(os.path.join(data_dir, "cstore_stores.parquet"))["STORE_ID"].to_numpy()
+    # NOTE: scan_table reads relative to the working directory, like the app does.
+    first_id = scan_table('sets', ["TRANSACTION_SET_ID"]).select(pl.col("TRANSACTION_SET_ID").max()).collect().item() + 1
+
+    product = rng.integers(0, len(gtin), rows)
+    daily = gtin[product].with_columns([
+        pl.Series("STORE_ID", rng.choice(store_ids, rows)),
+        pl.lit(day).alias("DATE"),
+        pl.Series("TOTAL_REVENUE_AMOUNT", rng.gamma(2.0, 15.0, rows).round(2)),
+        pl.Series("QUANTITY", rng.integers(1, 40, rows)),
+        pl.Series("TRANSACTION_COUNT", rng.integers(1, 30, rows)),
+        pl.lit(day.year).alias("CALENDAR_YEAR"),
+        pl.lit(day.month).alias("CALENDAR_MONTH"),
+        pl.lit(day.isocalendar()[1]).cast(pl.Int8).alias("WEEk"),
+    ])
+    sets = pl.DataFrame({
+        "TRANSACTION_SET_ID": np.arange(first_id, first_id + rows, dtype=np.int64),
+        "STORE_ID": rng.choice(store_ids, rows),
+        "DATE_TIME": pl.Series(
+            (np.datetime64(day.isoformat()) + rng.integers(0, 86_400, rows).astype("timedelta64[s]")).astype("datetime64[us]")
+        ),
+        "PAYMENT_TYPE": pl.Series(PAYMENT_TYPES, dtype=pl.Utf8).gather(rng.integers(0, len(PAYMENT_TYPES), rows)),
+        "GRAND_TOTAL_AMOUNT": rng.gamma(2.0, 8.0, rows).round(2),
+    })
+    items = pl.DataFrame({
+        "TRANSACTION_SET_ID": sets["TRANSACTION_SET_ID"].gather(rng.integers(0, rows, rows * 3)),
+        "GTIN": gtin["GTIN"].gather(rng.integers(0, len(gtin), rows * 3)),
+        "UNIT_QUANTITY": rng.integers(1, 4, rows * 3),
+        "UNIT_PRICE": rng.gamma(2.0, 2.5, rows * 3).round(2),
+        "GRAND_TOTAL_AMOUNT": rng.gamma(2.0, 4.0, rows * 3).round(2),
+    })
+    paths = {}
+    for name, df in (('daily', daily), ('sets', sets), ('items', items)):
+        paths[name] = [os.path.join(batch_dir, f"{name}-{day.isoformat()}.parquet")]
+        df.write_parquet(paths[name][0])
+    return paths
@@ -0,0 +1,152 @@
+"""
+Precompute the derived tables into a versioned artifact (see artifacts.py), run by `docker build` so a
+fresh container starts from them instead of recomputing them on its first requests:
+
+    weekly_product_cube, payment_facts, payment_product_counts,
+    store_totals                                                 the rollups.py cubes
+    product_classes                                              the product_classes.py flags
+    stores_enriched                                              stores x tract x county ACS join (needs the Census cache files)
+    counts                                                       year range and table counts, kept in the manifest
+
+Tables are computed on the configured backend (CSTORE_BACKEND), which is what the app checks them against.
+
+    python build.py
+    python build.py --output /tmp/artifacts --keep 1
+"""
+import argparse
+from datetime import datetime, timezone
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import polars as pl
+
+from artifacts import (
+    ARTIFACT_DIR, ARTIFACT_FORMAT, CODE_FILES, TABLE_SOURCES, file_record, input_files, metadata_counts
+)
+from backends import get_backend
+from census import COUNTY_ACS_FILE, TRACT_ACS_FILE, TRACT_GEOCODED_FILE, read_geocoded
+from product_classes import build_product_classes, load_rules
+from queries import enrich_stores
+from rollups import build_payment_facts, build_payment_product_counts, build_store_totals, build_weekly_product_cube
+
+# NOTE: The previous version stays on disk so a process that read the old CURRENT can finish with it.
+KEEP_VERSIONS = 2
+
+
+def build_tables(data, backend):
+    """
+    Every artifact table whose source tables exist, as collected DataFrames
+    stores_enriched is only built when the Census cache files exist as well
+    """
+    builders = {
+        'weekly_product_cube': lambda: build_weekly_product_cube(data["daily"]),
+        'payment_facts': lambda: build_payment_facts(data["sets"], data["items"]),
+        'payment_product_counts': lambda: build_payment_product_counts(data["sets"], data["items"], data["gtin"]),
+        'store_totals': lambda: build_store_totals(data["daily"]),
+        'product_classes': lambda: build_product_classes(data["gtin"], data["daily"], load_rules())
+    }
+    # NOTE: A missing table leaves its entries out of the artifact, the app computes those on the fly as before.
+    names = [name for name in builders if all(backend.has_table(t) for t in TABLE_SOURCES[name][0])]
+    tables = dict(zip(names, pl.collect_all([builders[name]() for name in names])))
+
+    # NOTE: Same frames the demographics page reads from the caches, so the join is identical to the one it computes.
+    census_files = (TRACT_GEOCODED_FILE, TRACT_ACS_FILE, COUNTY_ACS_FILE)
+    if backend.has_table('stores') and all(os.path.exists(f) for f in census_files):
+        stores_df = data["stores"].collect().select(["STORE_ID", "LATITUDE", "LONGITUDE", "STATE", "CITY"])
+        tables['stores_enriched'] = enrich_stores(
+            stores_df,
+            read_geocoded(TRACT_GEOCODED_FILE),
+            pl.read_parquet(TRACT_ACS_FILE),
+            pl.read_parquet(COUNTY_ACS_FILE)
+        )
+    return tables
+
+
+def write_artifact(root=ARTIFACT_DIR, keep=KEEP_VERSIONS, backend=None):
+    """Build every table, write them with their manifest as a new version and point CURRENT at it"""
+    backend = backend or get_backend()
+    # NOTE: Inputs are checksummed before anything is computed, a file changing mid-build leaves a mismatch rather than a stale match.
+    records = {}
+    inputs = {}
+    for name in TABLE_SOURCES:
+        files = input_files(name, backend)
+        for path in files:
+            if path not in records:
+                records[path] = file_record(path)
+        inputs[name] = {path: records[path] for path in files}
+
+    start = time.perf_counter()
+    data = backend.tables()
+    tables = build_tables(data, backend)
+    has_counts = all(backend.has_table(t) for t in TABLE_SOURCES['counts'][0])
+    counts = metadata_counts(data, backend) if has_counts else None
+
+    checksums = {path: record and record['sha256'] for path, record in records.items()}
+    digest = hashlib.sha256(json.dumps([ARTIFACT_FORMAT, backend.name, checksums], sort_keys=True).encode())
+    version = f"v{ARTIFACT_FORMAT}-{digest.hexdigest()[:12]}"
+    path = f"{root}/{version}"
+    tmp = f"{path}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    entries = {}
+    for name, df in tables.items():
+        df.write_parquet(f"{tmp}/{name}.parquet", statistics=True)
+        entries[name] = {'rows': len(df), 'inputs': inputs[name]}
+    if counts is not None:
+        entries['counts'] = {'inputs': inputs['counts']}
+    manifest = {
+        'format': ARTIFACT_FORMAT,
+        'version': version,
+        'built_at': datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        'build_seconds': round(time.perf_counter() - start, 3),
+        'backend': backend.name,
+        'polars': pl.__version__,
+        'code_files': CODE_FILES,
+        'counts': counts,
+        'entries': entries
+    }
+    with open(f"{tmp}/manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+    with open(f"{root}/CURRENT.tmp", "w") as f:
+        f.write(version)
+    os.replace(f"{root}/CURRENT.tmp", f"{root}/CURRENT")
+    prune_versions(root, keep, current=version)
+    return manifest
+
+
+def prune_versions(root, keep, current):
+    """Remove all but the newest keep versions, the current one is always kept"""
+    versions = sorted(
+        (entry for entry in os.scandir(root) if entry.is_dir() and not entry.name.endswith(".tmp")),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True
+    )
+    kept = [v for v in versions if v.name == current] + [v for v in versions if v.name != current][:max(keep - 1, 0)]
+    for entry in versions:
+        if entry not in kept:
+            shutil.rmtree(entry.path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=ARTIFACT_DIR, help="artifact directory (default %(default)s)")
+    parser.add_argument("--keep", type=int, default=KEEP_VERSIONS, help="versions to keep (default %(default)s)")
+    args = parser.parse_args()
+    manifest = write_artifact(args.output, args.keep)
+    print(f"artifact {manifest['version']} ({manifest['backend']}) built in {manifest['build_seconds']:.1f}s in {args.output}")
+    for name, entry in manifest['entries'].items():
+        if 'rows' in entry:
+            print(f"  {name}: {entry['rows']:,} rows")
+    if manifest['counts'] is not None:
+        print(f"  counts: {manifest['counts']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Census API clients for the demographics page.
+Network calls go through a pooled requests.Session, a shared token-bucket rate limiter and
+retry with exponential backoff. Base URLs can be overridden with environment variables so the
+whole pipeline can run against a local stub server.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
+import random
+import threading
+import time
+
+import polars as pl
+import requests
+from requests.adapters import HTTPAdapter
+
+GEOCODER_URL = os.environ.get(
+    "CENSUS_GEOCODER_URL",
+    "https://geocoding.geo.census.gov/geocoder/geographies/coordinates"
+)
+
+ACS_BASE_URL = os.environ.get("CENSUS_ACS_URL", "https://api.census.gov/data/2023/acs/acs5")
+API_KEY = os.environ.get("CENSUS_API_KEY", "551c09e32d473ee287b8d267cfee54aa81c502d9")
+
+ACS_VARS = [
+    "B01003_001E",  # Total Population
+    "B01001_001E",  # Age/Sex Total Population
+    "B19019_001E",  # Median Household Income
+    "B15003_025E",  # Professional Degree
+    "B17001_002E",  # Below Poverty Level
+    "B25077_001E",  # Median Home Value
+    "B25064_001E",  # Median Gross Rent
+    "B08301_001E",  # Total Workers (Commute)
+    "B23025_004E",  # Unemployed Population
+    "B08201_001E"   # Households with Vehicles
+]
+
+ACS_LABELS = {
+    "B01003_001E": "Total Population",
+    "B01001_001E": "Age/Sex Total Population",
+    "B19019_001E": "Median Household Income",
+    "B15003_025E": "Professional Degree",
+    "B17001_002E": "Below Poverty Level",
+    "B25077_001E": "Median Home Value",
+    "B25064_001E": "Median Gross Rent",
+    "B08301_001E": "Total Workers (Commute)",
+    "B23025_004E": "Unemployed Population",
+    "B08201_001E": "Households with Vehicles"
+}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+TRACT_GEOCODED_FILE = "data/census_tract_geocoded.parquet"
+TRACT_SCHEMA = {"STORE_ID": pl.Int64, "STATEFP": pl.Utf8, "COUNTYFP": pl.Utf8, "TRACT": pl.Utf8}
+TRACT_ACS_FILE = "data/census_tract_acs.parquet"
+COUNTY_ACS_FILE = "data/census_county_acs.parquet"
+
+
+class TokenBucket:
+    """Thread-safe token bucket, acquire() blocks until a request is allowed"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def make_session(pool_size=8):
+    """requests.Session with a connection pool sized for the worker threads"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_json(session, url, params, limiter=None, timeout=15, retries=4, backoff=0.5):
+    """GET a JSON document, retrying timeouts, connection errors, 429 and 5xx with exponential backoff"""
+    for attempt in range(retries + 1):
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            r = session.get(url, params=params, timeout=timeout)
+            if r.status_code not in RETRY_STATUSES or attempt == retries:
+                r.raise_for_status()
+                return r.json()
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == retries:
+                raise
+        time.sleep(backoff * (2 ** attempt) * (1 + random.random()))
+
+
+def geocode_coordinates(session, lat, lon, limiter=None, base_url=None):
+    """Census tract (STATE, COUNTY, TRACT) containing a latitude/longitude"""
+    params = {
+        "x": lon,
+        "y": lat,
+        "benchmark": "Public_AR_Census2020",
+        "vintage": "Census2020_Census2020",
+        "format": "json"
+    }
+    result = get_json(session, base_url or GEOCODER_URL, params, limiter=limiter)
+    geo = result["result"]["geographies"]["Census Tracts"][0]
+    return {"STATEFP": geo["STATE"], "COUNTYFP": geo["COUNTY"], "TRACT": geo["TRACT"]}
+
+
+def read_geocoded(cache_file=TRACT_GEOCODED_FILE):
+    """Previously geocoded stores, or an empty frame with the tract schema"""
+    if os.path.exists(cache_file):
+        # NOTE: Caches written before STORE_ID became an integer key hold it as a string, the cast migrates them on read.
+        return pl.read_parquet(cache_file).cast(TRACT_SCHEMA)
+    return pl.DataFrame(schema=TRACT_SCHEMA)
+
+
+def write_atomic(df, path):
+    """Write parquet to a temp file and rename it into place, so a crash never leaves a truncated cache"""
+    tmp_path = f"{path}.tmp"
+    df.write_parquet(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def pending_stores(stores_df, geocoded):
+    """Stores that have no tract yet, failed lookups from an earlier run are retried"""
+    done = geocoded.filter(pl.col("TRACT").is_not_null()).select("STORE_ID")
+    return stores_df.join(done, on="STORE_ID", how="anti")
+
+
+def geocode_stores(stores_df, cache_file=TRACT_GEOCODED_FILE, max_workers=8, rate=10, flush_every=100,
+                   base_url=None, progress=None):
+    """
+    Geocode every store that isn't in the cache yet, using a bounded thread pool
+    Results are flushed to cache_file every flush_every stores, so an interrupted run resumes where it stopped
+    progress, when given, is called with (completed, total) after each store
+    Returns (tract_df, failed_count)
+    """
+    geocoded = read_geocoded(cache_file)
+    todo = pending_stores(stores_df, geocoded)
+    total = len(todo)
+    if total == 0:
+        return geocoded, 0
+
+    session = make_session(max_workers)
+    limiter = TokenBucket(rate)
+    results = []
+    failed = 0
+
+    def lookup(row):
+        try:
+            geo = geocode_coordinates(session, row["LATITUDE"], row["LONGITUDE"], limiter=limiter, base_url=base_url)
+        except Exception:
+            geo = {"STATEFP": None, "COUNTYFP": None, "TRACT": None}
+        return {"STORE_ID": row["STORE_ID"], **geo}
+
+    def flush():
+        new = pl.DataFrame(results, schema=TRACT_SCHEMA)
+        merged = pl.concat([geocoded.join(new.select("STORE_ID"), on="STORE_ID", how="anti"), new])
+        write_atomic(merged, cache_file)
+        return merged
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(lookup, row) for row in todo.iter_rows(named=True)]
+        for idx, future in enumerate(as_completed(futures)):
+            result = future.result()
+            failed += result["TRACT"] is None
+            results.append(result)
+            if progress is not None:
+                progress(idx + 1, total)
+            if (idx + 1) % flush_every == 0:
+                flush()
+
+    return flush(), failed
+
+
+def acs_frame(rows):
+    """Census API JSON (header row + data rows) as a string-typed polars DataFrame"""
+    header, body = rows[0], rows[1:]
+    return pl.DataFrame(body, schema={col: pl.Utf8 for col in header}, orient="row")
+
+
+def fetch_county_tracts(session, state, county, limiter=None, base_url=None):
+    """Every tract in one county with a single ACS request"""
+    params = {
+        "get": ",".join(ACS_VARS),
+        "for": "tract:*",
+        "in": f"state:{state} county:{county}",
+        "key": API_KEY
+    }
+    return acs_frame(get_json(session, base_url or ACS_BASE_URL, params, limiter=limiter, timeout=60))
+
+
+def fetch_tract_acs(unique_tracts, cache_file=TRACT_ACS_FILE, max_workers=4, rate=5, base_url=None, progress=None):
+    """
+    ACS variables for the given (STATEFP, COUNTYFP, TRACT) rows
+    Tracts are grouped by county and each county is fetched once, then filtered locally and written in one pass
+    progress, when given, is called with (completed, total) after each county
+    Returns (acs_tract_df, failed_counties)
+    """
+    counties = unique_tracts.select(["STATEFP", "COUNTYFP"]).unique().sort(["STATEFP", "COUNTYFP"])
+    total = len(counties)
+    session = make_session(max_workers)
+    limiter = TokenBucket(rate)
+    frames = []
+    failed = []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(fetch_county_tracts, session, row["STATEFP"], row["COUNTYFP"], limiter, base_url): row
+            for row in counties.iter_rows(named=True)
+        }
+        for idx, future in enumerate(as_completed(futures)):
+            try:
+                frames.append(future.result())
+            except Exception:
+                row = futures[future]
+                failed.append(f"{row['STATEFP']}-{row['COUNTYFP']}")
+            if progress is not None:
+                progress(idx + 1, total)
+
+    schema = {"STATEFP": pl.Utf8, "COUNTYFP": pl.Utf8, "TRACT": pl.Utf8, **{var: pl.Utf8 for var in ACS_VARS}}
+    if not frames:
+        return pl.DataFrame(schema=schema), failed
+
+    acs_tract_df = (
+        pl.concat(frames)
+        .rename({"state": "STATEFP", "county": "COUNTYFP", "tract": "TRACT"})
+        .join(unique_tracts.select(["STATEFP", "COUNTYFP", "TRACT"]), on=["STATEFP", "COUNTYFP", "TRACT"], how="semi")
+        .select(list(schema))
+    )
+    write_atomic(acs_tract_df, cache_file)
+    return acs_tract_df, failed
+
+
+def fetch_county_acs(base_url=None):
+    """ACS variables and names for every county in the country, in one request"""
+    params = {
+        "get": ",".join(ACS_VARS) + ",NAME",
+        "for": "county:*",
+        "in": "state:*",
+        "key": API_KEY
+    }
+    return acs_frame(get_json(make_session(1), base_url or ACS_BASE_URL, params, timeout=60))
@@ -0,0 +1,237 @@
+"""
+Lazy data layer for the C-Store dashboard.
+Every source is exposed as a polars LazyFrame built on pl.scan_parquet, so a page only
+reads the columns and row groups it asks for instead of the whole dataset.
+Every scan is normalized to the compact schema in COMPACT_SCHEMA, print the per-table savings with:
+
+    python data_layer.py
+"""
+from datetime import datetime
+import functools
+import glob
+import operator
+import os
+
+import polars as pl
+import polars.selectors as cs
+
+
+DATA_DIR = "data"
+
+# NOTE: One entry per source table, transaction items stay split across their shards and are scanned with a glob.
+TABLE_PATHS = {
+    'gtin': f"{DATA_DIR}/cstore_master_ctin.parquet",
+    'discounts': f"{DATA_DIR}/cstore_discounts.parquet",
+    'stores': f"{DATA_DIR}/cstore_stores.parquet",
+    'payments': f"{DATA_DIR}/cstore_payments.parquet",
+    'daily': f"{DATA_DIR}/cstore_transactions_daily_agg.parquet",
+    'shopper': f"{DATA_DIR}/cstore_shopper.parquet",
+    'sets': f"{DATA_DIR}/cstore_transaction_sets.parquet",
+    'status': f"{DATA_DIR}/cstore_store_status.parquet",
+    'items': f"{DATA_DIR}/transaction_items/part-*.parquet",
+}
+
+# NOTE: Columns the pages actually read from the three large transaction tables, everything else is never loaded.
+DAILY_COLUMNS = [
+    "STORE_ID", "CALENDAR_YEAR", "CALENDAR_MONTH", "WEEk",
+    "CATEGORY", "SUBCATEGORY", "BRAND", "SKUPOS_DESCRIPTION",
+    "TOTAL_REVENUE_AMOUNT", "QUANTITY", "TRANSACTION_COUNT"
+]
+SETS_COLUMNS = ["TRANSACTION_SET_ID", "STORE_ID", "DATE_TIME", "PAYMENT_TYPE", "GRAND_TOTAL_AMOUNT"]
+ITEMS_COLUMNS = ["TRANSACTION_SET_ID", "GTIN", "UNIT_QUANTITY", "UNIT_PRICE", "GRAND_TOTAL_AMOUNT"]
+
+
+# NOTE: Offline layout written by partition_data.py, see that module for the directory structure.
+PARTITIONED_DIR = f"{DATA_DIR}/partitioned"
+PARTITIONED_TABLES = ['daily', 'sets', 'items']
+PARTITION_COLUMNS = ["CALENDAR_YEAR", "CALENDAR_MONTH", "STORE_ID"]
+HIVE_SCHEMA = {"CALENDAR_YEAR": pl.Int32, "CALENDAR_MONTH": pl.Int32, "STORE_ID": pl.Int64}
+
+
+# NOTE: One canonical type per column across every table. Repeated strings become dictionary-encoded Categoricals
+# (polars keeps one global category mapping, so joins and group-bys run on the integer codes). STORE_ID is Int64
+# everywhere, the stores table stores it as a Decimal. GTIN is a Categorical rather than an integer because the
+# product master has non-numeric GTINs ("00000000kwikee"). Amounts stay Float64, Float32 would round cents.
+# Casts are strict, a value that doesn't fit fails instead of wrapping.
+COMPACT_SCHEMA = {
+    "STORE_ID": pl.Int64,
+    "GTIN": pl.Categorical,
+    "TRANSACTION_SET_ID": pl.Int64,
+    "CATEGORY": pl.Categorical,
+    "SUBCATEGORY": pl.Categorical,
+    "BRAND": pl.Categorical,
+    "SKUPOS_DESCRIPTION": pl.Categorical,
+    "PAYMENT_TYPE": pl.Categorical,
+    "STATE": pl.Categorical,
+    "CITY": pl.Categorical,
+    "STORE_CHAIN_NAME": pl.Categorical,
+    "WEEk": pl.Int8,
+    "QUANTITY": pl.Int32,
+    "TRANSACTION_COUNT": pl.Int32,
+    "UNIT_QUANTITY": pl.Int32,
+}
+
+
+def is_partitioned(name):
+    """True when partition_data.py has written a Hive layout for this table"""
+    return name in PARTITIONED_TABLES and os.path.isdir(f"{PARTITIONED_DIR}/{name}")
+
+
+def source_files(name):
+    """Parquet files currently backing a table, partitioned layout first"""
+    if is_partitioned(name):
+        return sorted(glob.glob(f"{PARTITIONED_DIR}/{name}/**/*.parquet", recursive=True))
+    return sorted(glob.glob(TABLE_PATHS[name]))
+
+
+def source_mtime(name):
+    """Latest modification time across a table's files, 0 when the table is missing"""
+    return max((os.path.getmtime(f) for f in source_files(name)), default=0)
+
+
+def scan_table(name, columns=None):
+    """Return a LazyFrame for one source table, optionally projected to the given columns"""
+    if is_partitioned(name):
+        lf = pl.scan_parquet(
+            f"{PARTITIONED_DIR}/{name}/**/*.parquet",
+            hive_partitioning=True,
+            hive_schema=HIVE_SCHEMA
+        )
+        # NOTE: Keep the partition columns in the projection so filters on them prune whole files.
+        if columns is not None:
+            columns = columns + [c for c in PARTITION_COLUMNS if c not in columns]
+    else:
+        lf = pl.scan_parquet(TABLE_PATHS[name])
+    if columns is not None:
+        lf = lf.select(columns)
+    return lf
+
+
+def normalize(lf):
+    """Cast every column listed in COMPACT_SCHEMA to its canonical compact type, columns a table lacks are skipped"""
+    # NOTE: Selectors resolve against the schema at collect time, so building the scan never touches the file.
+    return lf.with_columns([
+        cs.by_name(column, require_all=False).cast(dtype) for column, dtype in COMPACT_SCHEMA.items()
+    ])
+
+
+def scan_all():
+    """Return a normalized LazyFrame for every source table, nothing is read until a page collects"""
+    return {
+        'gtin': normalize(scan_table('gtin')),
+        'discounts': normalize(scan_table('discounts')),
+        'stores': normalize(scan_table('stores')),
+        'payments': normalize(scan_table('payments')),
+        'daily': normalize(scan_table('daily', DAILY_COLUMNS)),
+        'shopper': normalize(scan_table('shopper')),
+        'sets': normalize(scan_table('sets', SETS_COLUMNS)),
+        'status': normalize(scan_table('status')),
+        'items': normalize(scan_table('items', ITEMS_COLUMNS))
+    }
+
+
+def has_calendar_columns(lf):
+    """True when the frame carries CALENDAR_YEAR/CALENDAR_MONTH (daily, or any partitioned table)"""
+    return "CALENDAR_MONTH" in lf.collect_schema().names()
+
+
+def sets_with_calendar(sets):
+    """Transaction sets with CALENDAR_YEAR/CALENDAR_MONTH, taken from the partition path when available"""
+    if has_calendar_columns(sets):
+        return sets
+    return sets.with_columns([
+        pl.col("DATE_TIME").dt.year().alias("CALENDAR_YEAR"),
+        pl.col("DATE_TIME").dt.month().alias("CALENDAR_MONTH")
+    ])
+
+
+def one_of(column, values):
+    """column equal to any of values, written as ORed equalities so database scans can push it into SQL (is_in isn't)"""
+    if not values:
+        return pl.lit(False)
+    return functools.reduce(operator.or_, [pl.col(column) == value for value in values])
+
+
+def calendar_predicate(year_filter, month_filter, store_filter=None):
+    """Predicate on the CALENDAR_YEAR/CALENDAR_MONTH/STORE_ID columns"""
+    predicate = one_of("CALENDAR_MONTH", month_filter)
+    if year_filter is not None:
+        predicate = predicate & (pl.col("CALENDAR_YEAR") == year_filter)
+    if store_filter:
+        predicate = predicate & pl.col("STORE_ID").is_in(store_filter)
+    return predicate
+
+
+def filter_daily(lf, year_filter, month_filter, store_filter=None, category_filter=None):
+    """Daily aggregate restricted to the selected period, pushed down into the parquet scan"""
+    predicate = calendar_predicate(year_filter, month_filter, store_filter)
+    if category_filter:
+        predicate = predicate & pl.col("CATEGORY").is_in(category_filter)
+    return lf.filter(predicate)
+
+
+def filter_sets(lf, year_filter, month_filter, store_filter=None):
+    """Transaction sets restricted to the selected period, pushed down into the parquet scan"""
+    if has_calendar_columns(lf):
+        return lf.filter(calendar_predicate(year_filter, month_filter, store_filter))
+
+    predicate = pl.col("DATE_TIME").dt.month().is_in(month_filter)
+    if year_filter is not None:
+        # NOTE: A plain range comparison lets the parquet reader skip row groups from min/max statistics, dt.year() alone can't.
+        predicate = (
+            (pl.col("DATE_TIME") >= datetime(year_filter, 1, 1)) &
+            (pl.col("DATE_TIME") < datetime(year_filter + 1, 1, 1)) &
+            predicate
+        )
+    if store_filter:
+        predicate = predicate & pl.col("STORE_ID").is_in(store_filter)
+    return lf.filter(predicate)
+
+
+def filter_items(lf, filtered_sets, year_filter, month_filter, store_filter=None):
+    """Transaction items belonging to the filtered sets, pruned by partition first when the layout allows it"""
+    if has_calendar_columns(lf):
+        lf = lf.filter(calendar_predicate(year_filter, month_filter, store_filter))
+    return lf.join(filtered_sets.select("TRANSACTION_SET_ID"), on="TRANSACTION_SET_ID", how="semi")
+
+
+def scan_filtered(data, year_filter, month_filter, store_filter=None):
+    """
+    Lazy daily, sets and items filtered to the selected period
+    Items are restricted with a semi join against the filtered sets so only matching rows are materialized
+    """
+    filtered_daily = filter_daily(data["daily"], year_filter, month_filter, store_filter)
+    filtered_sets = filter_sets(data["sets"], year_filter, month_filter, store_filter)
+    filtered_items = filter_items(data["items"], filtered_sets, year_filter, month_filter, store_filter)
+    return filtered_daily, filtered_sets, filtered_items
+
+
+def row_count(lf):
+    """Row count of a LazyFrame, answered from parquet metadata when no filter is applied"""
+    return lf.select(pl.len()).collect().item()
+
+
+def compaction_report(names=('gtin', 'stores', 'daily', 'sets', 'items')):
+    """Per-table estimated_size before and after normalize, one table in memory at a time"""
+    columns = {'daily': DAILY_COLUMNS, 'sets': SETS_COLUMNS, 'items': ITEMS_COLUMNS}
+    rows = []
+    for name in names:
+        if not source_files(name):
+            continue
+        raw = scan_table(name, columns.get(name)).collect()
+        before = raw.estimated_size()
+        after = normalize(raw.lazy()).collect().estimated_size()
+        rows.append({'table': name, 'rows': len(raw), 'before_mb': before / 2**20, 'after_mb': after / 2**20})
+        del raw
+    return pl.DataFrame(rows, schema={'table': pl.Utf8, 'rows': pl.Int64, 'before_mb': pl.Float64, 'after_mb': pl.Float64})
+
+
+def main():
+    report = compaction_report()
+    for table, rows, before_mb, after_mb in report.iter_rows():
+        saved = 1 - after_mb / before_mb if before_mb else 0
+        print(f"{table:<8} {rows:>12,} rows  {before_mb:>10,.1f} MB -> {after_mb:>10,.1f} MB  ({saved:.0%} smaller)")
+
+
+if __name__ == "__main__":
+    main()
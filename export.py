@@ -0,0 +1,149 @@
+"""
+Streaming export of the detailed records behind the current filters.
+The records are never collected: the filtered scan is sunk with Polars' streaming engine straight to a CSV or
+Parquet file, written in chunks of CSTORE_EXPORT_CHUNK_ROWS rows (CSV batches, Parquet row groups), so memory
+stays at a few chunks whatever the size of the export.
+
+    daily          daily aggregate rows of the selected period and stores
+    transactions   transaction sets of the selected period and stores
+    items          their transaction items with the set's store, time and payment type and the GTIN's descriptions
+
+The app writes exports under static/exports next to the app, named after the selection and the dataset version
+(result_cache.dataset_version), so the same export asked for twice is written once. Streamlit serves that folder
+from app/static/exports (server.enableStaticServing in .streamlit/config.toml), so a download is streamed from
+disk rather than read into the server's memory. The newest KEEP_EXPORTS files are kept, plus any file handed out
+in the last EXPORT_GRACE_SECONDS. Batch exports:
+
+    python export.py items --year 2024 --months 1 2 3 --stores 101 102 --output items.parquet
+    python export.py transactions --format csv --output transactions.csv
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+
+from data_layer import (
+    DAILY_COLUMNS, ITEMS_COLUMNS, SETS_COLUMNS, calendar_predicate, filter_daily, filter_sets, has_calendar_columns
+)
+
+# NOTE: Streamlit only serves the static folder next to the main script, the exports have to live under it.
+EXPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "exports")
+EXPORT_URL = "app/static/exports"
+CHUNK_ROWS = int(os.environ.get("CSTORE_EXPORT_CHUNK_ROWS", "50000"))
+KEEP_EXPORTS = 8
+# NOTE: A file another session linked a moment ago may not be downloaded yet, pruning leaves it alone for this long.
+EXPORT_GRACE_SECONDS = 600
+# NOTE: Streamlit's static route refuses larger files, those are left to the export.py command line.
+MAX_DOWNLOAD_MB = 200
+
+EXPORT_TABLES = {
+    'daily': "Daily Sales",
+    'transactions': "Transactions",
+    'items': "Transaction Items",
+}
+FORMATS = ["csv", "parquet"]
+MIME_TYPES = {'csv': "text/csv", 'parquet': "application/vnd.apache.parquet"}
+
+SET_CONTEXT = ["TRANSACTION_SET_ID", "STORE_ID", "DATE_TIME", "PAYMENT_TYPE"]
+PRODUCT_CONTEXT = ["GTIN", "SKUPOS_DESCRIPTION", "BRAND", "CATEGORY", "SUBCATEGORY"]
+
+
+def export_frame(data, table, year_filter, month_filter, store_filter=None):
+    """Lazy detail rows of one export table for the selection, the period and store filters are pushed into the scans"""
+    if table == 'daily':
+        return filter_daily(data["daily"], year_filter, month_filter, store_filter).select(DAILY_COLUMNS)
+    sets = filter_sets(data["sets"], year_filter, month_filter, store_filter)
+    if table == 'transactions':
+        return sets.select(SETS_COLUMNS)
+
+    items = data["items"]
+    if has_calendar_columns(items):
+        items = items.filter(calendar_predicate(year_filter, month_filter, store_filter))
+    # NOTE: No sort, the streaming engine writes rows as the joins produce them instead of buffering the whole export.
+    return (
+        items
+        .select(ITEMS_COLUMNS)
+        .join(sets.select(SET_CONTEXT), on="TRANSACTION_SET_ID", how="inner")
+        .join(data["gtin"].select(PRODUCT_CONTEXT), on="GTIN", how="left")
+    )
+
+
+def write_export(lf, path, fmt, chunk_rows=CHUNK_ROWS):
+    """Stream a LazyFrame to CSV or Parquet in chunks of chunk_rows rows and swap the file into place"""
+    # NOTE: Two sessions asking for the same export at once each write their own temporary file, the last rename wins.
+    tmp = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    if fmt == "csv":
+        lf.sink_csv(tmp, batch_size=chunk_rows)
+    else:
+        lf.sink_parquet(tmp, row_group_size=chunk_rows, statistics=True)
+    os.replace(tmp, path)
+    return path
+
+
+def export_name(table, fmt, version, year_filter, month_filter, store_filter=None):
+    """File name of an export: the table and a hash of the selection and the dataset version it was written from"""
+    key = [table, year_filter, sorted(month_filter), sorted(store_filter) if store_filter else None, version]
+    digest = hashlib.sha256(json.dumps(key).encode()).hexdigest()[:12]
+    return f"{table}-{digest}.{fmt}"
+
+
+def prune_exports(export_dir, keep, current, grace=EXPORT_GRACE_SECONDS):
+    """Remove exports past the newest keep that are older than the current one by more than grace seconds"""
+    cutoff = os.stat(current).st_mtime - grace
+    exports = []
+    for entry in os.scandir(export_dir):
+        if entry.is_file() and not entry.name.endswith(".tmp"):
+            try:
+                exports.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                continue
+    for mtime, path in sorted(exports, reverse=True)[keep:]:
+        if mtime < cutoff and path != current:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def export_file(
+    data, version, table, fmt, year_filter, month_filter, store_filter=None, export_dir=EXPORT_DIR, keep=KEEP_EXPORTS
+):
+    """Path of the export for a selection under export_dir, written first unless the same export is already there"""
+    os.makedirs(export_dir, exist_ok=True)
+    path = os.path.join(export_dir, export_name(table, fmt, version, year_filter, month_filter, store_filter))
+    if os.path.exists(path):
+        # NOTE: Handing a file out makes it the newest, so the sessions pruning after this one leave it alone.
+        os.utime(path)
+    else:
+        write_export(export_frame(data, table, year_filter, month_filter, store_filter), path, fmt)
+    prune_exports(export_dir, keep, path)
+    return path
+
+
+def export_url(path):
+    """URL Streamlit's static file serving answers for an export under EXPORT_DIR"""
+    return f"{EXPORT_URL}/{os.path.basename(path)}"
+
+
+def main():
+    from backends import get_backend
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("table", choices=list(EXPORT_TABLES))
+    parser.add_argument("--output", required=True, help="file to write")
+    parser.add_argument("--format", choices=FORMATS, help="default from the output's extension, else parquet")
+    parser.add_argument("--year", type=int, help="default every year")
+    parser.add_argument("--months", type=int, nargs="+", default=list(range(1, 13)))
+    parser.add_argument("--stores", type=int, nargs="+", help="STORE_IDs, default every store")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="rows per chunk (default %(default)s)")
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.output.endswith(".csv") else "parquet")
+    lf = export_frame(get_backend().tables(), args.table, args.year, args.months, args.stores)
+    write_export(lf, args.output, fmt, args.chunk_rows)
+    print(f"{args.table}: {os.path.getsize(args.output) / 2**20:,.1f} MB of {fmt} in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Incremental filter engine for the global year/month/store filters.
+The (year, month) periods present in the data are indexed once, each period's daily, sets and
+items rows are loaded the first time a selection needs them, and a selection is answered by
+stitching those partitions together. Recent selections are kept in a bounded LRU, and appending
+rows to a period (ingest.py) only invalidates that period's partition and the selections covering it.
+When memory-mapped snapshots (snapshots.py) are passed in, every period is a contiguous row range of
+the snapshot and a partition is a zero-copy slice of it instead of a parquet scan.
+
+Rows are ordered by STORE_ID within each period (the snapshots are sorted that way, loaded partitions
+are sorted once), and a STORE_ID -> (offset, length) index over those runs lets a store selection slice
+its stores' rows out of each period instead of scanning the period.
+
+The lock only guards the caches: a selection or partition that isn't cached yet is built outside it, and a
+session asking for the same one meanwhile waits on the first session's build instead of building it again.
+"""
+from collections import OrderedDict
+from concurrent.futures import Future
+import threading
+
+import polars as pl
+
+from data_layer import filter_daily, filter_items, filter_sets, scan_filtered
+
+TABLES = ("daily", "sets", "items")
+
+
+class FilterEngine:
+    """Per-(year, month) partitions of daily, sets and items, a per-store row index and an LRU of recent selections"""
+
+    def __init__(self, data, max_selections=16, snapshots=None):
+        self._data = data
+        self._snapshots = snapshots
+        self._partitions = {}
+        self._selections = OrderedDict()
+        self._lock = threading.Lock()
+        # NOTE: In-flight builds by cache and key, and a generation invalidate() bumps so a build it overtook isn't cached.
+        self._building = {'partitions': {}, 'selections': {}}
+        self._generation = 0
+        self.max_selections = max_selections
+        if snapshots is None:
+            self.periods = self._build_period_index()
+        else:
+            self._index_snapshots(snapshots)
+
+    def _index_snapshots(self, snapshots):
+        """Row ranges of every (year, month, store) and every period in the snapshots"""
+        ranges = {
+            name: self._row_ranges(df, ["CALENDAR_YEAR", "CALENDAR_MONTH", "STORE_ID"])
+            for name, df in snapshots.items()
+        }
+        period_ranges = {name: self._merge_runs(table_ranges) for name, table_ranges in ranges.items()}
+        # NOTE: Swapped as one tuple, a build running outside the lock reads matching snapshots and ranges.
+        self._snapshot_index = (snapshots, ranges, period_ranges)
+        self._snapshots = snapshots
+        self.periods = sorted(set(period_ranges["daily"]) | set(period_ranges["sets"]))
+
+    @staticmethod
+    def _row_ranges(df, keys):
+        """(offset, length) of every run of equal keys in a frame sorted by keys"""
+        # NOTE: The frame is already sorted, so a run starts wherever a key differs from the row above, no hashing needed.
+        starts = (
+            df.select(keys)
+            .with_row_index("offset")
+            .filter(pl.any_horizontal([pl.col(k).ne_missing(pl.col(k).shift(1)) for k in keys]))
+            .with_columns((pl.col("offset").shift(-1).fill_null(len(df)) - pl.col("offset")).alias("len"))
+        )
+        return {tuple(row[1:-1]): (row[0], row[-1]) for row in starts.iter_rows()}
+
+    @staticmethod
+    def _merge_runs(ranges):
+        """(year, month) -> (offset, length) from the contiguous (year, month, store) runs of a snapshot"""
+        periods = {}
+        for (year, month, _store), (offset, length) in ranges.items():
+            key = (int(year), int(month))
+            start, total = periods.get(key, (offset, 0))
+            periods[key] = (min(start, offset), total + length)
+        return periods
+
+    def _build_period_index(self):
+        """Sorted list of every (year, month) present in either daily or sets"""
+        daily_periods = (
+            self._data["daily"]
+            .select([
+                pl.col("CALENDAR_YEAR").cast(pl.Int32).alias("year"),
+                pl.col("CALENDAR_MONTH").cast(pl.Int32).alias("month")
+            ])
+            .unique()
+        )
+        sets_periods = (
+            self._data["sets"]
+            .select([
+                pl.col("DATE_TIME").dt.year().cast(pl.Int32).alias("year"),
+                pl.col("DATE_TIME").dt.month().cast(pl.Int32).alias("month")
+            ])
+            .unique()
+        )
+        periods = pl.concat([daily_periods, sets_periods]).unique().sort(["year", "month"]).collect()
+        return [(int(y), int(m)) for y, m in periods.iter_rows()]
+
+    def _load_partition(self, year, month):
+        """Collect one period's daily, sets and items rows ordered by store, with each store's row range"""
+        daily = filter_daily(self._data["daily"], year, [month])
+        sets = filter_sets(self._data["sets"], year, [month])
+        items = filter_items(self._data["items"], sets, year, [month])
+        daily, sets, items = pl.collect_all([daily, sets, items])
+        if "STORE_ID" not in items.columns:
+            # NOTE: Items only have a store through their transaction set.
+            items = items.join(sets.select(["TRANSACTION_SET_ID", "STORE_ID"]), on="TRANSACTION_SET_ID", how="left")
+        frames = tuple(df.sort("STORE_ID", maintain_order=True) for df in (daily, sets, items))
+        return frames, tuple(self._row_ranges(df, ["STORE_ID"]) for df in frames)
+
+    def _partition(self, year, month, stores=None):
+        """One period's daily, sets and items as lists of frames, only the selected stores' row ranges when stores is set"""
+        if self._snapshots is not None:
+            snapshots, ranges, period_ranges = self._snapshot_index
+            if stores is None:
+                return tuple(
+                    [snapshots[name].slice(*period_ranges[name].get((year, month), (0, 0)))]
+                    for name in TABLES
+                )
+            return tuple(
+                [snapshots[name].slice(*ranges[name][(year, month, store)])
+                 for store in stores if (year, month, store) in ranges[name]]
+                for name in TABLES
+            )
+
+        frames, ranges = self._cached('partitions', (year, month), lambda: self._load_partition(year, month))
+        if stores is None:
+            return tuple([df] for df in frames)
+        return tuple(
+            [df.slice(*table_ranges[(store,)]) for store in stores if (store,) in table_ranges]
+            for df, table_ranges in zip(frames, ranges)
+        )
+
+    def _partition_schema(self, table):
+        """Columns and dtypes of a loaded partition of table, the same projection _load_partition collects"""
+        lazy = dict(zip(TABLES, scan_filtered(self._data, None, [1])))
+        schema = dict(lazy[table].collect_schema())
+        if table == "items" and "STORE_ID" not in schema:
+            schema["STORE_ID"] = lazy["sets"].collect_schema()["STORE_ID"]
+        return schema
+
+    def _stitch(self, frames, table):
+        """Concatenate partitions without copying, or an empty frame with a partition's schema"""
+        if not frames:
+            if self._snapshots is not None:
+                return self._snapshots[table].clear()
+            return pl.DataFrame(schema=self._partition_schema(table))
+        return pl.concat(frames, rechunk=False)
+
+    def _build_selection(self, year_filter, month_filter, store_filter=None):
+        keys = [
+            (y, m) for y, m in self.periods
+            if m in month_filter and (year_filter is None or y == year_filter)
+        ]
+        stores = sorted(store_filter) if store_filter else None
+        parts = [self._partition(y, m, stores) for y, m in keys]
+        filtered_daily = self._stitch([f for p in parts for f in p[0]], "daily")
+        filtered_sets = self._stitch([f for p in parts for f in p[1]], "sets")
+        filtered_items = self._stitch([f for p in parts for f in p[2]], "items")
+
+        metrics = filtered_sets.select([
+            pl.col("GRAND_TOTAL_AMOUNT").sum().alias("total_revenue"),
+            pl.len().alias("total_transactions"),
+            pl.col("STORE_ID").n_unique().alias("unique_stores")
+        ])
+        return {
+            'filtered_daily': filtered_daily,
+            'filtered_sets': filtered_sets,
+            'filtered_items': filtered_items,
+            'total_revenue': metrics["total_revenue"].item() or 0,
+            'total_transactions': metrics["total_transactions"].item(),
+            'unique_stores': metrics["unique_stores"].item() or 0
+        }
+
+    def _cached(self, cache, key, build):
+        """
+        Value of key in one of the caches, built by build() outside the lock when missing
+        Concurrent callers for the same key wait for the first one's build, callers for other keys aren't held up
+        """
+        with self._lock:
+            values = self._partitions if cache == 'partitions' else self._selections
+            if key in values:
+                if cache == 'selections':
+                    self._selections.move_to_end(key)
+                return values[key]
+            future = self._building[cache].get(key)
+            if future is None:
+                future = self._building[cache][key] = Future()
+                generation = self._generation
+            else:
+                generation = None
+        if generation is None:
+            return future.result()
+
+        try:
+            value = build()
+        except BaseException as e:
+            with self._lock:
+                if self._building[cache].get(key) is future:
+                    del self._building[cache][key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            if self._building[cache].get(key) is future:
+                del self._building[cache][key]
+            if generation == self._generation:
+                values[key] = value
+                if cache == 'selections' and len(self._selections) > self.max_selections:
+                    self._selections.popitem(last=False)
+        future.set_result(value)
+        return value
+
+    @property
+    def uses_snapshots(self):
+        return self._snapshots is not None
+
+    def invalidate(self, periods, data, snapshots=None):
+        """
+        Drop the cached partitions and selections that cover any of periods, e.g. after ingest.py appended rows to them
+        data replaces the scans (and snapshots the snapshots) the engine loads from, selections of the other periods stay cached
+        """
+        periods = {(int(y), int(m)) for y, m in periods}
+        with self._lock:
+            # NOTE: Builds that started before this keep running for their callers, their results just aren't cached.
+            self._generation += 1
+            self._building = {'partitions': {}, 'selections': {}}
+            self._data = data
+            if snapshots is not None:
+                # NOTE: Cached selections of untouched periods keep slicing the old snapshots, whose rows for them are unchanged.
+                self._index_snapshots(snapshots)
+            else:
+                for key in periods:
+                    self._partitions.pop(key, None)
+                self.periods = sorted(set(self.periods) | periods)
+            for key in list(self._selections):
+                year_filter, months, _stores = key
+                if any(m in months and (year_filter is None or y == year_filter) for y, m in periods):
+                    del self._selections[key]
+
+    def select(self, year_filter, month_filter, store_filter=None):
+        """
+        Filtered daily/sets/items and metrics for a selection, served from the LRU when possible
+        store_filter is a collection of STORE_IDs, None or empty for every store
+        """
+        key = (year_filter, frozenset(month_filter), frozenset(store_filter) if store_filter else None)
+        return self._cached('selections', key, lambda: self._build_selection(year_filter, month_filter, store_filter))
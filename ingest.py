@@ -0,0 +1,267 @@
+"""
+Append-only ingestion of new transaction days.
+A batch of daily, sets and/or items parquet files is validated against the schema of the tables already on disk
+and written as new files into the Hive layout of partition_data.py (part-b<batch>.parquet next to the existing
+part files), so nothing that is already there is reread or rewritten. A partition that reaches more than
+CSTORE_MAX_PARTITION_FILES files (default 4) is compacted back into one. The rollups that were current before the
+batch (weekly product cube, payment facts and product counts, store totals) get the batch's own rollup merged in,
+those that were stale are rebuilt, and the batch is recorded in data/ingest/batches.jsonl with the (year, month)
+periods it touched. A running app picks the log up on its next rerun and invalidates only the cached partitions
+and selections of those periods.
+
+Ingestion writes the parquet layout, a DuckDB database (CSTORE_BACKEND=duckdb) is reloaded with backends.py.
+
+    python ingest.py --daily new/daily.parquet --sets new/sets.parquet --items "new/items-*.parquet"
+"""
+import argparse
+from datetime import datetime, timezone
+import json
+import os
+
+import polars as pl
+
+from data_layer import (
+    DATA_DIR, HIVE_SCHEMA, PARTITION_COLUMNS, PARTITIONED_DIR, PARTITIONED_TABLES,
+    is_partitioned, normalize, scan_all, scan_table, source_files
+)
+from partition_data import SORT_COLUMNS, compact_partition, partition_table, write_partitions
+from rollups import (
+    PAYMENT_FACTS, PAYMENT_PRODUCTS, STORE_TOTALS, WEEKLY_PRODUCT_CUBE, append_to_rollup, build_payment_facts,
+    build_payment_product_counts, build_store_totals, build_weekly_product_cube, is_stale, load_payment_facts,
+    load_payment_product_counts, load_store_totals, load_weekly_product_cube
+)
+from snapshots import build_lock
+
+INGEST_DIR = f"{DATA_DIR}/ingest"
+BATCH_LOG = f"{INGEST_DIR}/batches.jsonl"
+# NOTE: A partition directory is compacted back into one file once a batch brings it past this many files.
+MAX_PARTITION_FILES = int(os.environ.get("CSTORE_MAX_PARTITION_FILES", "4"))
+
+# NOTE: Partition columns a raw table carries itself, the rest are derived (sets from DATE_TIME, items from their set).
+RAW_PARTITION_COLUMNS = {
+    'daily': PARTITION_COLUMNS,
+    'sets': ["STORE_ID"],
+    'items': [],
+}
+KEY_COLUMNS = {
+    'daily': PARTITION_COLUMNS,
+    'sets': ["TRANSACTION_SET_ID", "STORE_ID", "DATE_TIME"],
+    'items': ["TRANSACTION_SET_ID"],
+}
+
+# NOTE: Source tables of each rollup a batch is merged into, same as the load_* functions in rollups.py.
+ROLLUP_SOURCES = {
+    WEEKLY_PRODUCT_CUBE: ['daily'],
+    STORE_TOTALS: ['daily'],
+    PAYMENT_FACTS: ['sets', 'items'],
+    PAYMENT_PRODUCTS: ['sets', 'items', 'gtin'],
+}
+ROLLUP_LOADERS = {
+    WEEKLY_PRODUCT_CUBE: load_weekly_product_cube,
+    STORE_TOTALS: load_store_totals,
+    PAYMENT_FACTS: load_payment_facts,
+    PAYMENT_PRODUCTS: load_payment_product_counts,
+}
+
+_log_cache = {}
+
+
+def read_batches(path=BATCH_LOG):
+    """Every ingested batch in order, re-read only when the log changed"""
+    if not os.path.exists(path):
+        return []
+    mtime = os.stat(path).st_mtime_ns
+    if _log_cache.get('key') != (path, mtime):
+        with open(path) as f:
+            batches = [json.loads(line) for line in f if line.strip()]
+        _log_cache.update(key=(path, mtime), batches=batches)
+    return _log_cache['batches']
+
+
+def data_version(path=BATCH_LOG):
+    """Number of the last ingested batch, 0 before the first one"""
+    batches = read_batches(path)
+    return batches[-1]['batch'] if batches else 0
+
+
+def batches_since(version, path=BATCH_LOG):
+    """Batches ingested after the given data_version()"""
+    return [batch for batch in read_batches(path) if batch['batch'] > version]
+
+
+def period_version(year_filter, month_filter, path=BATCH_LOG):
+    """Number of the last batch that touched the selected period, 0 when none did"""
+    touched = [
+        batch['batch'] for batch in read_batches(path)
+        if any(m in month_filter and (year_filter is None or y == year_filter) for y, m in batch['periods'])
+    ]
+    return max(touched, default=0)
+
+
+def table_schema(name):
+    """Schema of the files of a partitioned table, the partition columns only live in the path"""
+    files = source_files(name)
+    if not files:
+        raise ValueError(f"{name}: no stored files to validate the batch against, load the table into {DATA_DIR} first")
+    return pl.read_parquet_schema(files[0])
+
+
+def validate(name, df):
+    """The batch table cast to the stored schema, ValueError when a column is missing, extra, null or doesn't cast"""
+    schema = table_schema(name)
+    required = list(schema) + [c for c in RAW_PARTITION_COLUMNS[name] if c not in schema]
+    allowed = set(required) | set(PARTITION_COLUMNS)
+    missing = [c for c in required if c not in df.columns]
+    extra = [c for c in df.columns if c not in allowed]
+    if missing or extra:
+        raise ValueError(f"{name}: missing columns {missing}, unexpected columns {extra}")
+    try:
+        df = df.select(required).cast({c: dtype for c, dtype in schema.items()})
+    except pl.exceptions.PolarsError as e:
+        raise ValueError(f"{name}: batch doesn't fit the stored schema: {e}") from None
+    nulls = [c for c in KEY_COLUMNS[name] if df[c].null_count()]
+    if nulls:
+        raise ValueError(f"{name}: null values in key columns {nulls}")
+    return df
+
+
+def with_partition_columns(name, df, sets):
+    """Batch table with CALENDAR_YEAR/CALENDAR_MONTH/STORE_ID cast to the Hive schema, as partition_data.py does"""
+    if name == 'sets':
+        df = df.with_columns([
+            pl.col("DATE_TIME").dt.year().alias("CALENDAR_YEAR"),
+            pl.col("DATE_TIME").dt.month().alias("CALENDAR_MONTH")
+        ])
+    elif name == 'items':
+        df = df.join(sets.select(["TRANSACTION_SET_ID"] + PARTITION_COLUMNS), on="TRANSACTION_SET_ID", how="inner")
+    return df.with_columns([pl.col(c).cast(dtype) for c, dtype in HIVE_SCHEMA.items()])
+
+
+def check_transactions(sets, items):
+    """ValueError when a batch transaction is already stored or duplicated, or an item has no transaction in the batch"""
+    # NOTE: Daily rows have no key of their own, a daily file ingested twice is counted twice.
+    if sets is not None:
+        if sets["TRANSACTION_SET_ID"].is_duplicated().any():
+            raise ValueError("sets: duplicate TRANSACTION_SET_ID in the batch")
+        stored = (
+            scan_table('sets', ["TRANSACTION_SET_ID"])
+            .join(sets.lazy().select("TRANSACTION_SET_ID"), on="TRANSACTION_SET_ID", how="semi")
+            .select(pl.len())
+            .collect()
+            .item()
+        )
+        if stored:
+            raise ValueError(f"sets: {stored:,} transactions of the batch are already ingested")
+    if items is not None:
+        # NOTE: Items only get their period and store through their set, so they have to come with it.
+        if sets is None:
+            raise ValueError("items: a batch with items needs their transaction sets")
+        orphans = items.join(sets.select("TRANSACTION_SET_ID"), on="TRANSACTION_SET_ID", how="anti").height
+        if orphans:
+            raise ValueError(f"items: {orphans:,} items have no transaction set in the batch")
+
+
+def read_batch(paths):
+    """The batch files of each table as one DataFrame, tables without files are None"""
+    return {name: pl.read_parquet(files) if files else None for name, files in paths.items()}
+
+
+def ingest(daily=None, sets=None, items=None):
+    """
+    Append one batch of parquet files (paths or globs per table) and maintain the rollups
+    Returns the batch record written to the log: number, time, rows per table, files added, touched periods and the
+    rollups the batch was merged into or that were rebuilt
+    """
+    paths = {'daily': daily or [], 'sets': sets or [], 'items': items or []}
+    if not any(paths.values()):
+        raise ValueError("nothing to ingest")
+    with build_lock(INGEST_DIR):
+        # NOTE: Appending needs the Hive layout, a table still in its original files is partitioned once first.
+        for name in PARTITIONED_TABLES:
+            if not is_partitioned(name) and source_files(name):
+                partition_table(name)
+        # NOTE: Only rollups that are current now can be merged into, the others are rebuilt once the batch is written.
+        current = [path for path, tables in ROLLUP_SOURCES.items() if os.path.exists(path) and not is_stale(path, tables)]
+
+        batch = {name: validate(name, df) if df is not None else None for name, df in read_batch(paths).items()}
+        check_transactions(batch['sets'], batch['items'])
+        frames = {}
+        for name, df in batch.items():
+            if df is not None:
+                frames[name] = with_partition_columns(name, df, frames.get('sets'))
+
+        number = data_version() + 1
+        file_name = f"part-b{number:05d}.parquet"
+        written = {}
+        for name, df in frames.items():
+            written[name] = write_partitions(
+                df, f"{PARTITIONED_DIR}/{name}", SORT_COLUMNS[name], file_name=f"{file_name}.tmp"
+            )
+        # NOTE: The scans only match *.parquet, a batch becomes visible once all of its files are complete.
+        for path in (p for paths in written.values() for p in paths):
+            os.replace(path, path[:-len(".tmp")])
+        # NOTE: Every batch adds a file to each partition it touches, compaction keeps the file count (and every glob) bounded.
+        compacted = 0
+        for name, paths in written.items():
+            for part_dir in {os.path.dirname(p) for p in paths}:
+                if len(os.listdir(part_dir)) > MAX_PARTITION_FILES:
+                    compacted += compact_partition(part_dir, SORT_COLUMNS[name])
+
+        merged = {}
+        data = scan_all()
+        lazy = {name: normalize(df.lazy()) for name, df in frames.items()}
+        deltas = {}
+        if 'daily' in lazy:
+            deltas[WEEKLY_PRODUCT_CUBE] = lambda: build_weekly_product_cube(lazy['daily'])
+            deltas[STORE_TOTALS] = lambda: build_store_totals(lazy['daily'])
+        if 'sets' in lazy and 'items' in lazy:
+            deltas[PAYMENT_FACTS] = lambda: build_payment_facts(lazy['sets'], lazy['items'])
+            deltas[PAYMENT_PRODUCTS] = lambda: build_payment_product_counts(lazy['sets'], lazy['items'], data["gtin"])
+        for path, delta in deltas.items():
+            if path in current:
+                merged[path] = append_to_rollup(path, delta().collect())
+        # NOTE: A rollup that was stale before the batch (e.g. the first ingest partitions the tables) is rebuilt with the batch in it.
+        rebuilt = {
+            path: len(load(data)) for path, load in ROLLUP_LOADERS.items()
+            if path not in current and os.path.exists(path)
+        }
+
+        periods = sorted({
+            (int(y), int(m)) for df in frames.values()
+            for y, m in df.select(["CALENDAR_YEAR", "CALENDAR_MONTH"]).unique().iter_rows()
+        })
+        record = {
+            'batch': number,
+            'ingested_at': datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            'rows': {name: len(df) for name, df in frames.items()},
+            'files': sum(len(paths) for paths in written.values()),
+            'compacted': compacted,
+            'periods': [list(p) for p in periods],
+            'merged': merged,
+            'rebuilt': rebuilt
+        }
+        with open(BATCH_LOG, "a") as f:
+            f.write(json.dumps(record) + "\n")
+    return record
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    for name in PARTITIONED_TABLES:
+        parser.add_argument(f"--{name}", nargs="+", default=[], help=f"parquet files (or globs) of new {name} rows")
+    args = parser.parse_args()
+    record = ingest(args.daily, args.sets, args.items)
+    print(
+        f"batch {record['batch']}: {record['files']:,} partition files for {len(record['periods'])} periods, "
+        f"{record['compacted']:,} files compacted away"
+    )
+    for name, rows in record['rows'].items():
+        print(f"  {name}: {rows:,} rows")
+    for path, rows in record['merged'].items():
+        print(f"  merged into {path}: {rows:,} rows")
+    for path, rows in record['rebuilt'].items():
+        print(f"  rebuilt {path}: {rows:,} rows")
+
+
+if __name__ == "__main__":
+    main()
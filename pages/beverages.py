@@ -0,0 +1,173 @@
+"""Packaged Beverages page: drop candidates and the basket revenue that goes with them"""
+import plotly.express as px
+import polars as pl
+import streamlit as st
+
+from app_data import get_basket_affinity, get_beverage_performance, get_unified_data, load_data, selected_filters
+from render import chart_data, show_chart, show_export, show_table
+
+data = load_data()
+year, months, stores = selected_filters()
+filtered_daily = get_unified_data(data, year, months, stores)['filtered_daily']
+
+st.markdown("""
+<h1 style='text-align: center; color: #2E86AB; font-family: Arial, sans-serif;'>
+    Packaged Beverages: Product Drop Recommendations Based off of Low Units Sold
+</h1>
+<p style='text-align: center; color: #6B7280; font-size: 14px;'>
+    Years 2022 - 2024
+</p>
+""", unsafe_allow_html=True)
+
+with st.expander("Available Categories"):
+    available_categories = filtered_daily.select("CATEGORY").unique().sort("CATEGORY").collect().to_series().to_list()
+    st.write(f"Found {len(available_categories)} categories in filtered data")
+    st.write(available_categories[:20])  # Show first 20
+
+col1, col2 = st.columns([2, 1])
+with col1:
+    min_transactions = st.slider("Minimum Transaction Count", 0, 1000, 18)
+with col2:
+    show_threshold = st.checkbox("Show Revenue Threshold Line", value=True)
+    if show_threshold:
+        revenue_threshold = st.number_input("Revenue Threshold ($)", min_value=0, value=10000, step=1000)
+
+
+
+bev_perf = get_beverage_performance(data, year, months, stores, min_transactions)
+
+
+# NOTE: Safety Check to ensure that there is data to work with.
+if len(bev_perf) == 0:
+    st.warning("No packaged beverage data available, I would try adjusting the filter (ie, lower or increase the minimum transaction count).")
+    st.stop()
+
+# NOTE: KPIs - Layout Container #2: columns
+st.subheader("Beverage Category KPIs")
+col1, col2, col3, col4 = st.columns(4)
+
+with col1:
+    total_brands = len(bev_perf)
+    st.metric("Total Brands", f"{total_brands}")
+with col2:
+    total_bev_revenue = bev_perf.select(pl.col("revenue").sum()).item()
+    st.metric("Total Revenue", f"${total_bev_revenue:,.2f}")
+with col3:
+    avg_rev_per_brand = bev_perf.select(pl.col("revenue").mean()).item()
+    avg_rev_per_brand = avg_rev_per_brand if avg_rev_per_brand is not None else 0
+    st.metric("Avg Revenue/Brand", f"${avg_rev_per_brand:,.2f}")
+with col4:
+    low_performers = bev_perf.filter(pl.col("revenue") < revenue_threshold if show_threshold else pl.col("revenue") < 10000)
+    st.metric("Brands Below Threshold", f"{len(low_performers)}", delta=f"-{len(low_performers)}", delta_color="inverse")
+
+st.divider()
+
+# NOTE: Great Tables - Bottom performers of the top 10 brands by revenue to consider for product drops.
+st.subheader("Recommended Products to Drop Based off of Low Units Sold as a Total Unit Analysis")
+bottom_10 = bev_perf.limit(10)
+
+gt_df = (
+    bottom_10
+    .select([
+        pl.col("BRAND").alias("Brand"),
+        pl.col("revenue").round(2).alias("Revenue"),
+        pl.col("units").alias("Units Sold"),
+        pl.col("transactions").alias("Transactions"),
+        pl.col("rev_per_unit").round(2).alias("$/Unit"),
+        pl.col("rev_per_transaction").round(2).alias("$/Transaction")
+    ])
+)
+
+show_table(
+    gt_df,
+    title="Bottom 10 Beverage Brands",
+    subtitle="Candidates for removal based on low revenue",
+    currency=["Revenue", "$/Unit", "$/Transaction"],
+    numbers=["Units Sold", "Transactions"]
+)
+
+# NOTE: A brand with low sales of its own can still anchor baskets, so the drop candidates are checked against what else their shoppers buy.
+st.subheader("Basket Affinity: Revenue at Risk if Dropped")
+affinity = get_basket_affinity(data, year, months, stores)
+at_risk = bottom_10.select("BRAND").join(affinity['revenue_at_risk'], on="BRAND", how="left")
+
+show_table(
+    at_risk.select([
+        pl.col("BRAND").alias("Brand"),
+        pl.col("baskets").alias("Baskets"),
+        pl.col("own_revenue").round(2).alias("Own Revenue"),
+        pl.col("halo_revenue").round(2).alias("Co-Purchased Revenue"),
+        pl.col("revenue_at_risk").round(2).alias("Revenue at Risk"),
+        pl.col("top_partner").alias("Top Partner Brand"),
+        pl.col("top_partner_lift").round(2).alias("Lift")
+    ]),
+    title="Revenue at Risk for the Bottom 10 Brands",
+    subtitle="Own item revenue plus everything else bought in the same baskets (worst case if shoppers leave)",
+    currency=["Own Revenue", "Co-Purchased Revenue", "Revenue at Risk"],
+    numbers=["Baskets"],
+    missing_text="-"
+)
+
+category_lift = affinity['category_pairs'].join(bottom_10.select("BRAND"), on="BRAND", how="semi")
+if len(category_lift) > 0:
+    lift_matrix = (
+        category_lift
+        .with_columns([pl.col("BRAND").cast(pl.Utf8), pl.col("CATEGORY").cast(pl.Utf8)])
+        .pivot(on="CATEGORY", index="BRAND", values="lift")
+        .sort("BRAND")
+    )
+    fig_lift = px.imshow(
+        lift_matrix.drop("BRAND").to_numpy(),
+        x=lift_matrix.columns[1:],
+        y=lift_matrix["BRAND"].to_list(),
+        color_continuous_scale="RdBu",
+        color_continuous_midpoint=1.0,
+        aspect="auto",
+        title="Category Lift in Baskets with Each Brand (1.0 = no affinity)",
+        labels={'color': 'Lift'}
+    )
+    show_chart(fig_lift)
+
+st.divider()
+# NOTE: Chart #1: Scatter plot with threshold line
+st.subheader("Performance Summary: Revenue vs Transactions")
+
+fig_scatter = px.scatter(
+    chart_data(bev_perf),
+    x="transactions",
+    y="revenue",
+    size="units",
+    hover_name="BRAND",
+    hover_data={"rev_per_unit": ':.2f', "transactions": True, "revenue": ':,.2f'},
+    title="Beverage Brand Performance",
+    labels={'transactions': 'Number of Transactions', 'revenue': 'Total Revenue ($)'},
+    render_mode="webgl"
+)
+
+# NOTE: Logic for the threshold line, replicated amongst the other tabs, as this was the best way to streamline this process. 
+if show_threshold:
+    fig_scatter.add_hline(
+        y=revenue_threshold,
+        line_dash="dash",
+        line_color="red",
+        annotation_text=f"Drop Threshold: ${revenue_threshold:,.0f}",
+        annotation_position="right"
+    )
+
+show_chart(fig_scatter)
+st.subheader("Lowest Performing of a 10 Brand Spread by Revenue")
+
+fig_bar = px.bar(
+    chart_data(bottom_10),
+    x="BRAND",
+    y="revenue",
+    title="Lowest Revenue Brands",
+    labels={'BRAND': 'Brand', 'revenue': 'Total Revenue ($)'},
+    color="revenue",
+    color_continuous_scale="Reds"
+)
+fig_bar.update_layout(xaxis_tickangle=-45, showlegend=False)
+show_chart(fig_bar)
+
+# NOTE: Detailed records behind the current filters, streamed to a file in chunks when the owner asks for them.
+show_export(data, year, months, stores, ['daily', 'items'])
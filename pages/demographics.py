@@ -0,0 +1,428 @@
+"""Store demographics page: Census tract, county and trade-area demographics joined to store sales"""
+import plotly.express as px
+import polars as pl
+import streamlit as st
+
+from app_data import load_backend, load_data, load_sidebar_metadata, load_store_total_table, selected_filters
+from artifacts import artifact_table
+from census import (
+    ACS_LABELS, ACS_VARS, fetch_county_acs, fetch_tract_acs, geocode_stores, pending_stores, read_geocoded
+)
+from queries import enrich_stores, state_demographics_summary, stores_with_demographics
+from render import chart_data, show_chart, show_export, show_table
+from rollups import store_totals
+from spatial import TRACT_BOUNDARIES_FILE, assign_store_tracts, has_tract_boundaries, load_tract_index
+from trade_area import (
+    MAX_RADIUS_MILES, TRADE_AREA_ACS_FILE, load_centroid_index, trade_area_demographics, trade_area_tracts
+)
+
+data = load_data()
+year, months, stores = selected_filters()
+stores_master = load_sidebar_metadata(data)[2]
+
+st.markdown("""
+<h1 style='text-align: center; color: #2E86AB; font-family: Arial, sans-serif;'>
+    Store Demographics Analysis (Census Data)
+</h1>
+<p style='text-align: center; color: #6B7280; font-size: 14px;'>
+    Years 2022 - 2024
+</p>
+""", unsafe_allow_html=True)
+
+
+@st.cache_resource
+def load_tract_index_cached():
+    """Build the offline tract index once per process"""
+    return load_tract_index()
+
+@st.cache_resource
+def load_centroid_index_cached():
+    """Build the tract centroid index once per process"""
+    return load_centroid_index()
+
+@st.cache_data(ttl=7200)
+def load_county_acs():
+    """Fetch ACS data for all counties"""
+    try:
+        return fetch_county_acs()
+    except Exception as e:
+        st.error(f"Failed to fetch county ACS data: {str(e)}")
+        return None
+    
+st.subheader("Geocoding Stores")
+
+# NOTE: STORE_ID is already the canonical Int64 key from the data layer, the Census tables are joined on it as is.
+stores_df = stores_master.select(["STORE_ID", "LATITUDE", "LONGITUDE", "STATE", "CITY"])
+
+tract_cache_file = "data/census_tract_geocoded.parquet"
+
+# NOTE: Tries to load from cache first
+if 'tract_geocoded' not in st.session_state:
+    try:
+        import os
+        if os.path.exists(tract_cache_file):
+            st.session_state.tract_df = read_geocoded(tract_cache_file)
+            st.session_state.tract_geocoded = True
+            st.success(f"Loaded {len(st.session_state.tract_df)} geocoded stores from cache!")
+        elif has_tract_boundaries():
+            # NOTE: Default path - point-in-polygon against the local tract boundaries, no geocoder calls needed.
+            st.session_state.tract_df = assign_store_tracts(stores_df, load_tract_index_cached(), cache_file=tract_cache_file)
+            st.session_state.tract_geocoded = True
+            st.success(f"Assigned {len(st.session_state.tract_df)} stores to tracts offline from {TRACT_BOUNDARIES_FILE}!")
+        else:
+            st.session_state.tract_geocoded = False
+    except:
+        st.session_state.tract_geocoded = False
+
+# NOTE: Stores missing from the cache (or whose lookup failed last time) are the only ones sent to the geocoder.
+pending = pending_stores(stores_df, st.session_state.tract_df) if st.session_state.tract_geocoded else stores_df
+
+col1, col2 = st.columns([3, 1])
+with col1:
+    if st.session_state.tract_geocoded and len(pending) == 0:
+        st.info(f"{len(stores_df)} stores already geocoded. Data cached in {tract_cache_file}")
+    else:
+        st.info(f"Found {len(pending)} of {len(stores_df)} stores left to geocode. Lookups run in parallel and resume from {tract_cache_file} if interrupted.")
+with col2:
+    if st.button("Geocode Stores", disabled=len(pending) == 0):
+        with st.spinner("Geocoding stores..."):
+            progress_bar = st.progress(0)
+            tract_df, failed = geocode_stores(
+                stores_df,
+                cache_file=tract_cache_file,
+                progress=lambda done, total: progress_bar.progress(done / total)
+            )
+            
+            st.session_state.tract_df = tract_df
+            st.session_state.tract_geocoded = True
+            geocoded_count = tract_df.filter(pl.col("TRACT").is_not_null()).height
+            st.success(f"Geocoded {geocoded_count} stores and saved to {tract_cache_file}!")
+            if failed:
+                st.warning(f"Geocoding failed for {failed} stores, click the button again to retry them.")
+
+if st.session_state.tract_geocoded and 'tract_df' in st.session_state:
+    st.divider()
+    st.subheader("Fetch Tract-Level ACS Data")
+    
+    tract_df = st.session_state.tract_df
+    unique_tracts = (
+        tract_df
+        .filter(
+            (pl.col("STATEFP").is_not_null()) &
+            (pl.col("COUNTYFP").is_not_null()) &
+            (pl.col("TRACT").is_not_null())
+        )
+        .select(["STATEFP", "COUNTYFP", "TRACT"])
+        .unique()
+    )
+    
+    tract_acs_cache_file = "data/census_tract_acs.parquet"
+    
+    if 'acs_tract_fetched' not in st.session_state:
+        try:
+            import os
+            if os.path.exists(tract_acs_cache_file):
+                st.session_state.acs_tract_df = pl.read_parquet(tract_acs_cache_file)
+                st.session_state.acs_tract_fetched = True
+                st.success(f"Loaded tract ACS data from cache ({len(st.session_state.acs_tract_df)} tracts)!")
+            else:
+                st.session_state.acs_tract_fetched = False
+        except:
+            st.session_state.acs_tract_fetched = False
+    
+    if st.session_state.acs_tract_fetched:
+        st.write(f"ACS data for {len(unique_tracts)} unique tracts already cached.")
+    else:
+        st.write(f"Found {len(unique_tracts)} unique tracts to fetch")
+    
+    if st.button("Fetch Tract ACS Data", disabled=st.session_state.acs_tract_fetched):
+        with st.spinner("Fetching ACS data for tracts..."):
+            progress_bar = st.progress(0)
+            
+            # NOTE: One ACS request per county returns every tract in it, the needed tracts are then filtered locally.
+            acs_tract_df, failed_counties = fetch_tract_acs(
+                unique_tracts,
+                cache_file=tract_acs_cache_file,
+                progress=lambda done, total: progress_bar.progress(done / total)
+            )
+            
+            st.session_state.acs_tract_df = acs_tract_df
+            st.session_state.acs_tract_fetched = True
+            st.success(f"Fetched ACS data for {len(acs_tract_df)} tracts and saved to {tract_acs_cache_file}!")
+            if failed_counties:
+                st.warning(f"ACS fetch failed for counties: {', '.join(failed_counties)}")
+
+if st.session_state.get('acs_tract_fetched', False):
+    st.divider()
+    st.subheader("Fetch County-Level ACS Data")
+    
+    county_acs_cache_file = "data/census_county_acs.parquet"
+    
+    if 'county_acs_fetched' not in st.session_state:
+        try:
+            import os
+            if os.path.exists(county_acs_cache_file):
+                st.session_state.county_acs_df = pl.read_parquet(county_acs_cache_file)
+                st.session_state.county_acs_fetched = True
+                st.success(f"Loaded county ACS data from cache ({len(st.session_state.county_acs_df)} counties)!")
+            else:
+                st.session_state.county_acs_fetched = False
+        except:
+            st.session_state.county_acs_fetched = False
+    
+    if st.button("Fetch County ACS Data", disabled=st.session_state.county_acs_fetched):
+        with st.spinner("Fetching county ACS data..."):
+            county_df = load_county_acs()
+            
+            if county_df is not None:
+                st.session_state.county_acs_df = county_df
+                st.session_state.county_acs_df.write_parquet(county_acs_cache_file)
+                st.session_state.county_acs_fetched = True
+                st.success(f"Fetched ACS data for {len(county_df)} counties and saved to {county_acs_cache_file}!")
+    
+    # NOTE: Joins stores with tract data, tract-level ACS and county-level ACS
+    # NOTE: The build artifact holds this join while the stores table and the Census cache files are the ones it was built from.
+    stores_enriched = artifact_table('stores_enriched', load_backend())
+    if stores_enriched is None:
+        stores_enriched = enrich_stores(
+            stores_df,
+            st.session_state.tract_df,
+            st.session_state.acs_tract_df,
+            st.session_state.county_acs_df
+        )
+    
+    # NOTE: Geocoding and ACS fetches cover every store, the analysis below only the ones picked in the sidebar.
+    if stores:
+        stores_enriched = stores_enriched.filter(pl.col("STORE_ID").is_in(stores))
+
+    store_perf = store_totals(load_store_total_table(), year, months, stores)
+
+    st.divider()
+    
+    valid_stores = stores_with_demographics(stores_enriched, store_perf)
+    
+    if len(valid_stores) > 0:
+
+        st.subheader("Demographics Summary (Idaho Stores)")
+        
+        state_summary = state_demographics_summary(valid_stores)
+
+        gt_df = (
+            state_summary
+            .select([
+                pl.col("STATE").alias("State"),
+                pl.col("store_count").alias("Stores"),
+                pl.col("avg_tract_pop").round(0).alias("Avg Tract Pop"),
+                pl.col("avg_income").round(0).alias("Avg Median Income"),
+                pl.col("avg_poverty").round(0).alias("Avg Below Poverty"),
+                pl.col("avg_home_value").round(0).alias("Avg Home Value")
+            ])
+        )
+        
+        show_table(
+            gt_df,
+            title="Demographics Summary by State",
+            subtitle="Census Tract-Level Averages",
+            currency=["Avg Median Income", "Avg Home Value"],
+            numbers=["Stores", "Avg Tract Pop", "Avg Below Poverty"]
+        )
+        
+        st.divider()
+
+        col1, col2 = st.columns(2)
+        
+        with col1:
+ 
+            plot_df = valid_stores.select([
+                "STORE_ID",
+                "STATE",
+                "CITY",
+                pl.col("B01003_001E").cast(pl.Float64).alias("population"),
+                pl.col("B19019_001E").cast(pl.Float64).alias("income"),
+                pl.col("B17001_002E").cast(pl.Float64).alias("poverty")
+            ]).pipe(chart_data)
+            
+            fig1 = px.scatter(
+                plot_df,
+                x="population",
+                y="income",
+                color="STATE",
+                hover_data=["STORE_ID", "CITY", "poverty"],
+                title="Median Income vs Tract Population",
+                labels={"population": "Tract Population", "income": "Median Household Income ($)"},
+                render_mode="webgl"
+            )
+            show_chart(fig1)
+        
+        with col2:
+            fig2 = px.scatter(
+                plot_df,
+                x="poverty",
+                y="income",
+                color="STATE",
+                hover_data=["STORE_ID", "CITY", "population"],
+                title="Median Income vs Poverty Level",
+                labels={"poverty": "Population Below Poverty", "income": "Median Household Income ($)"},
+                render_mode="webgl"
+            )
+            show_chart(fig2)
+        
+        st.divider()
+        st.subheader("Home Values and Income Distribution")
+        
+        col3, col4 = st.columns(2)
+        
+        with col3:
+            # NOTE: Home value vs income
+            plot_df2 = valid_stores.select([
+                "STORE_ID",
+                "STATE",
+                pl.col("B19019_001E").cast(pl.Float64).alias("income"),
+                pl.col("B25077_001E").cast(pl.Float64).alias("home_value")
+            ]).pipe(chart_data)
+            
+            fig3 = px.scatter(
+                plot_df2,
+                x="income",
+                y="home_value",
+                color="STATE",
+                hover_data=["STORE_ID"],
+                title="Home Value vs Median Income",
+                labels={"income": "Median Household Income ($)", "home_value": "Median Home Value ($)"},
+                render_mode="webgl"
+            )
+            show_chart(fig3)
+        
+        with col4:
+            # NOTE: Income distribution by state (I hadn't figured out that there was only 1 state for this distribution of the dataset, but leaving it in for future use cases)
+            fig4 = px.box(
+                plot_df,
+                x="STATE",
+                y="income",
+                color="STATE",
+                title="Income Distribution by State",
+                labels={"income": "Median Household Income ($)", "STATE": "State"}
+            )
+            show_chart(fig4)
+    else:
+        st.warning("No stores with complete demographic data available.")
+    
+    # NOTE: Trade area mode - aggregates every tract whose centroid falls within the chosen radius of the store, not just the store's own tract.
+    st.divider()
+    st.subheader("Trade Area Demographics (Radius Around Store)")
+    
+    if not has_tract_boundaries():
+        st.info(f"Add tract boundaries at {TRACT_BOUNDARIES_FILE} to enable radius-based trade areas.")
+    else:
+        import os
+        centroid_index = load_centroid_index_cached()
+        
+        if 'trade_area_acs_df' not in st.session_state and os.path.exists(TRADE_AREA_ACS_FILE):
+            st.session_state.trade_area_acs_df = pl.read_parquet(TRADE_AREA_ACS_FILE)
+        
+        if 'trade_area_acs_df' not in st.session_state:
+            needed_tracts = trade_area_tracts(stores_df, centroid_index, MAX_RADIUS_MILES)
+            st.write(f"Found {len(needed_tracts)} tracts within {MAX_RADIUS_MILES} miles of a store.")
+            if st.button("Fetch Trade Area ACS Data"):
+                with st.spinner("Fetching ACS data for trade area tracts..."):
+                    progress_bar = st.progress(0)
+                    trade_area_acs_df, failed_counties = fetch_tract_acs(
+                        needed_tracts,
+                        cache_file=TRADE_AREA_ACS_FILE,
+                        progress=lambda done, total: progress_bar.progress(done / total)
+                    )
+                    st.session_state.trade_area_acs_df = trade_area_acs_df
+                    st.success(f"Fetched ACS data for {len(trade_area_acs_df)} tracts and saved to {TRADE_AREA_ACS_FILE}!")
+                    if failed_counties:
+                        st.warning(f"ACS fetch failed for counties: {', '.join(failed_counties)}")
+        
+        if 'trade_area_acs_df' in st.session_state:
+            col1, col2 = st.columns([1, 2])
+            with col1:
+                radius = st.slider("Trade Area Radius (miles)", 1, MAX_RADIUS_MILES, 3)
+            with col2:
+                # NOTE: Labels are looked up in one dict, filtering the store table per option is quadratic in stores.
+                store_labels = dict(zip(stores_df["STORE_ID"], stores_df["CITY"]))
+                store_choice = st.selectbox(
+                    "Store",
+                    list(stores) if stores else sorted(store_labels),
+                    format_func=lambda sid: f"{sid} - {store_labels[sid]}"
+                )
+            
+            # NOTE: Only the displayed store is queried, one radius lookup instead of a loop over every store per rerun.
+            store_area = trade_area_demographics(
+                stores_df.filter(pl.col("STORE_ID") == store_choice), centroid_index,
+                st.session_state.trade_area_acs_df, radius
+            )
+            store_home = stores_enriched.filter(pl.col("STORE_ID") == store_choice)
+            
+            if len(store_area) == 0:
+                st.warning(f"No tracts with ACS data within {radius} miles of store {store_choice}.")
+            else:
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Tracts in Trade Area", f"{store_area['tract_count'].item():,}")
+                with col2:
+                    st.metric("Trade Area Population", f"{store_area['B01003_001E'].item() or 0:,.0f}")
+                with col3:
+                    area_income = store_area['B19019_001E'].item()
+                    st.metric("Weighted Median Income", f"${area_income:,.0f}" if area_income is not None else "N/A")
+                
+                def as_float(frame, column):
+                    value = frame[column].cast(pl.Float64, strict=False).item() if len(frame) > 0 else None
+                    return value if value is not None and value >= 0 else None
+                
+                comparison_df = pl.DataFrame({
+                    "Variable": [ACS_LABELS[var] for var in ACS_VARS],
+                    "Home Tract": [as_float(store_home, var) for var in ACS_VARS],
+                    f"{radius}-Mile Trade Area": [as_float(store_area, var) for var in ACS_VARS],
+                    "County": [as_float(store_home, f"county_{var}") for var in ACS_VARS]
+                }, schema_overrides={"Home Tract": pl.Float64, f"{radius}-Mile Trade Area": pl.Float64, "County": pl.Float64})
+                
+                show_table(
+                    comparison_df,
+                    title=f"Store {store_choice}: Trade Area vs Home Tract vs County",
+                    subtitle="Counts are summed across tracts, medians are population-weighted",
+                    numbers=["Home Tract", f"{radius}-Mile Trade Area", "County"]
+                )
+
+else:
+    st.info("Click the buttons above to start the geocoding and data fetching process.")
+
+# NOTE: If the API needs to be re-queried for any reason, as I had a couple of instances where not all of the data was populated, as such I added a way to clear the cache entirely and overwrite it.
+# NOTE: This was a recommended addition based on issues that I kept having with geocoder timing out within streamlit sessions.
+st.divider()
+with st.expander("Cache Management"):
+    st.write("Census data is cached in parquet files to avoid re-fetching:")
+    st.write("- `data/census_tract_geocoded.parquet` - Geocoded store locations")
+    st.write("- `data/census_tract_acs.parquet` - Tract-level demographics")
+    st.write("- `data/census_county_acs.parquet` - County-level demographics")
+    st.write("- `data/census_trade_area_acs.parquet` - Trade area tract demographics")
+    
+    if st.button("Clear Census Cache"):
+        import os
+        files_to_delete = [
+            "data/census_tract_geocoded.parquet",
+            "data/census_tract_acs.parquet",
+            "data/census_county_acs.parquet",
+            TRADE_AREA_ACS_FILE
+        ]
+        
+        deleted = []
+        for file in files_to_delete:
+            if os.path.exists(file):
+                os.remove(file)
+                deleted.append(file)
+        
+        # NOTE: This session_state will clear the entire session set and apply a master reset.
+        for key in ['tract_geocoded', 'tract_df', 'acs_tract_fetched', 'acs_tract_df', 'county_acs_fetched', 'county_acs_df', 'trade_area_acs_df']:
+            if key in st.session_state:
+                del st.session_state[key]
+        
+        if deleted:
+            st.success(f"Deleted {len(deleted)} cache file(s). Refresh the page to re-fetch data from geocoder.")
+        else:
+            st.info("No cache files found to delete from the data directory.")
+
+# NOTE: Detailed records behind the current filters, streamed to a file in chunks when the owner asks for them.
+show_export(data, year, months, stores, ['transactions', 'daily'])
@@ -0,0 +1,78 @@
+"""Home page: dataset overview and headline totals for the selected period"""
+import polars as pl
+import streamlit as st
+
+from app_data import get_unified_data, load_data, load_table_counts, selected_filters
+from render import show_export
+
+data = load_data()
+year, months, stores = selected_filters()
+table_counts = load_table_counts(data)
+unified = get_unified_data(data, year, months, stores)
+filtered_daily = unified['filtered_daily']
+
+st.markdown("""
+<h1 style='text-align: center; color: #2E86AB; font-family: Arial, sans-serif;'>
+    C-Store Dashboard Overview
+</h1>
+<p style='text-align: center; color: #6B7280; font-size: 14px;'>
+    Years 2022 - 2024
+</p>
+""", unsafe_allow_html=True)
+
+st.markdown("""
+This dashboard provides comprehensive analytics for convenience store operations.
+Use the sidebar to navigate between different analyses.
+
+### Available Pages:
+- **Top 5 Products Weekly Sales**: Identify best-selling products (excluding fuels)
+- **Packaged Beverages**: Recommendations for product drops
+- **Cash vs Credit**: Payment method comparison and customer behavior
+- **Demographics**: Store-level shopper demographics using Census data
+""")
+
+st.divider()
+
+# NOTE: Layout Container #1: columns
+st.subheader("Overview of Summary Statistics")
+stores_in_stores_table = table_counts['stores']
+stores_in_daily = table_counts['stores_in_daily']
+stores_in_filtered_daily = filtered_daily.select(pl.col("STORE_ID").n_unique()).collect().item()
+
+with st.expander("Store Count Analysis"):
+    st.write(f"**Stores in 'stores' table:** {stores_in_stores_table:,}")
+    st.write(f"**Stores with transaction data (all years):** {stores_in_daily:,}")
+    st.write(f"**Stores with transaction data (filtered year/month):** {stores_in_filtered_daily:,}")
+    st.info("The 'Total Stores' metric shows stores from the master stores table. Some stores may not have transactions in the selected time period.")
+
+col1, col2, col3, col4 = st.columns(4)
+
+with col1:
+    st.metric("Total Stores", f"{stores_in_stores_table:,}", 
+              delta=f"{stores_in_filtered_daily:,} active",
+              help=f"{stores_in_stores_table} stores in master table, {stores_in_filtered_daily} with transactions in selected period")
+with col2:
+    st.metric("Total Products", f"{table_counts['gtin']:,}")
+with col3:
+    st.metric("Total Revenue", f"${unified['total_revenue']:,.2f}",
+              help="Based on actual transaction sets")
+with col4:
+    st.metric("Total Transactions", f"{unified['total_transactions']:,.0f}",
+              help="Based on actual transaction sets")
+
+st.divider()
+
+# NOTE: Layout Container #2: expander to view the data dictionary.
+with st.expander("View Data Dictionary"):
+    st.markdown("""
+    **Available Datasets:**
+    - `GTIN`: Product master data (80k+ products)
+    - `Stores`: Store location and chain information (24k+ stores)
+    - `Daily Transactions`: Aggregated daily sales data
+    - `Payments`: Payment transaction details
+    - `Shoppers`: Customer identification data
+    - `Discounts`: Discount and promotion data
+    """)
+
+# NOTE: Detailed records behind the current filters, streamed to a file in chunks when the owner asks for them.
+show_export(data, year, months, stores, ['daily', 'transactions', 'items'])
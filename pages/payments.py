@@ -0,0 +1,127 @@
+"""Cash Versus Credit page, read from the precomputed payment tables"""
+import plotly.express as px
+import polars as pl
+import streamlit as st
+
+from app_data import get_payment_tables, load_data, selected_filters
+from render import chart_data, show_chart, show_export, show_table
+from rollups import PAYMENT_TYPES, rank_products_by_payment, summarize_payments
+
+data = load_data()
+year, months, stores = selected_filters()
+
+st.markdown("""
+<h1 style='text-align: center; color: #2E86AB; font-family: Arial, sans-serif;'>
+    Cash vs Credit Customer Analysis
+</h1>
+<p style='text-align: center; color: #6B7280; font-size: 14px;'>
+    Years 2022 - 2024
+</p>
+""", unsafe_allow_html=True)
+
+# NOTE: Layout Container #1: columns for filters
+col1, col2 = st.columns([2, 1])
+with col1:
+    payment_types = st.multiselect("Payment Types", PAYMENT_TYPES, default=["CASH", "CREDIT"])
+with col2:
+    show_avg_line = st.checkbox("Show Average Purchase Line", value=True)
+
+# NOTE: Payment facts and product counts are precomputed per transaction, so there is no sets/items/GTIN join on rerun.
+# NOTE: With stores selected the facts are filtered and the product counts rebuilt from the stores' slices.
+payment_facts, payment_products = get_payment_tables(data, year, months, stores)
+
+# NOTE: Summary by payment type (CARD vserus CASH)
+payment_summary = summarize_payments(payment_facts, year, months, payment_types)
+
+# NOTE: Top products by payment type (card versus CASH)
+top_products_by_payment = rank_products_by_payment(payment_products, year, months, payment_types)
+st.subheader("Payment Method Comparison")
+
+if len(payment_types) >= 2:
+    cols = st.columns(len(payment_types))
+    for idx, ptype in enumerate(payment_types):
+        with cols[idx]:
+            ptype_data = payment_summary.filter(pl.col("PAYMENT_TYPE") == ptype)
+            if len(ptype_data) > 0:
+                st.markdown(f"### {ptype}")
+                num_txn = ptype_data.select("num_transactions").item()
+                total = ptype_data.select("total_spend").item()
+                avg_ticket = ptype_data.select("avg_ticket").item()
+                avg_items = ptype_data.select("avg_items_per_txn").item()
+                
+                st.metric("Transactions", f"{num_txn:,}")
+                st.metric("Total Spend", f"${total:,.2f}")
+                st.metric("Avg Ticket", f"${avg_ticket:.2f}")
+                st.metric("Avg Items/Transaction", f"{avg_items:.1f}")
+
+st.divider()
+st.subheader("Top 5 Products by Payment Type (ie, cash vs credit card)")
+
+for ptype in payment_types:
+    with st.expander(f"Top Products for {ptype} Customers"):
+        ptype_products = top_products_by_payment.filter(pl.col("PAYMENT_TYPE") == ptype)
+        
+        gt_df = (
+            ptype_products
+            .select([
+                pl.col("SKUPOS_DESCRIPTION").alias("Product"),
+                pl.col("CATEGORY").alias("Category"),
+                pl.col("purchase_count").alias("Purchase Count"),
+                pl.col("revenue").round(2).alias("Revenue")
+            ])
+        )
+        
+        show_table(
+            gt_df,
+            title=f"Top 5 Products - {ptype}",
+            subtitle="Most frequently purchased items",
+            currency=["Revenue"],
+            numbers=["Purchase Count"]
+        )
+
+st.divider()
+
+# NOTE: Chart #1: Transaction amount comparison with average line incorporated to showcase the overall average ticket size.
+st.subheader("Average Transaction Amount Comparison")
+
+avg_ticket_value = payment_summary.select(pl.col("avg_ticket").mean()).item()
+
+fig_bar = px.bar(
+    chart_data(payment_summary),
+    x="PAYMENT_TYPE",
+    y="avg_ticket",
+    title="Average Ticket Size by Payment Type",
+    labels={'PAYMENT_TYPE': 'Payment Type', 'avg_ticket': 'Average Ticket ($)'},
+    color="PAYMENT_TYPE",
+    text="avg_ticket"
+)
+fig_bar.update_traces(texttemplate='$%{text:.2f}', textposition='outside')
+
+if show_avg_line:
+    fig_bar.add_hline(
+        y=avg_ticket_value,
+        line_dash="dash",
+        line_color="green",
+        annotation_text=f"Overall Avg: ${avg_ticket_value:.2f}",
+        annotation_position="right"
+    )
+
+show_chart(fig_bar)
+
+# NOTE: 2nd Chart - Items versus the total transaction as a comparison to evaluate customer behavior in credit cards versus carash payments - overall historical assessment. 
+st.subheader("Items per Transaction Comparison")
+
+fig_items = px.bar(
+    chart_data(payment_summary),
+    x="PAYMENT_TYPE",
+    y="avg_items_per_txn",
+    title="Average Items per Transaction by Payment Type",
+    labels={'PAYMENT_TYPE': 'Payment Type', 'avg_items_per_txn': 'Avg Items per Transaction'},
+    color="PAYMENT_TYPE",
+    text="avg_items_per_txn"
+)
+fig_items.update_traces(texttemplate='%{text:.1f}', textposition='outside')
+show_chart(fig_items)
+
+# NOTE: Detailed records behind the current filters, streamed to a file in chunks when the owner asks for them.
+show_export(data, year, months, stores, ['transactions', 'items'])
@@ -0,0 +1,122 @@
+"""Top 5 Products Weekly Sales page, read from the weekly product rollup cube"""
+import plotly.express as px
+import polars as pl
+import streamlit as st
+
+from app_data import get_product_cube, load_classes, load_data, selected_filters
+from product_classes import flagged
+from render import chart_data, series_data, show_chart, show_export, show_table
+from rollups import non_fuel_period, top_products
+
+data = load_data()
+year, months, stores = selected_filters()
+
+st.markdown("""
+    <h1 style='text-align: center; color: #2E86AB; font-family: Arial, sans-serif;'>
+        Top 5 Products Weekly Sales
+    </h1>
+    <p style='text-align: center; color: #6B7280; font-size: 14px;'>
+        Years 2022 - 2024
+    </p>
+""", unsafe_allow_html=True)
+st.markdown("*Excluding fuel products*")
+
+# NOTE: This page reads the precomputed weekly product cube instead of grouping the daily table on every rerun.
+# NOTE: With stores selected the cube is built from their slice of the daily table instead.
+product_cube = get_product_cube(data, year, months, stores)
+fuel_categories = flagged(load_classes(), "is_fuel", ["CATEGORY"])["CATEGORY"]
+period_cube = non_fuel_period(product_cube, year, months, fuel_categories)
+
+# Layout Container #1: columns for filters
+col1, col2 = st.columns([2, 1])
+with col1:
+    categories = period_cube.select("CATEGORY").unique().sort("CATEGORY").to_series().to_list()
+    selected_categories = st.multiselect("Filter by Category (Fuel Excluded)", categories, default=categories)
+
+# NOTE: Calculates top 5 products overall and their weekly breakdown, fuel is always excluded.
+top5_overall, weekly_top5 = top_products(period_cube, selected_categories, n=5)
+
+# NOTE: Safety Check to ensure that there is data to work with.
+if len(top5_overall) == 0:
+    st.warning("No data available for the selected filter. Looks like you may need to try again.")
+    st.stop()
+
+# NOTE: KPIs - Layout Container #2: columns
+st.subheader("Key Performance Indicators")
+col1, col2, col3, col4 = st.columns(4)
+
+with col1:
+    total_rev = top5_overall.select(pl.col("total_revenue").sum()).item()
+    st.metric("Total Revenue (Top 5)", f"${total_rev:,.2f}")
+with col2:
+    total_units = top5_overall.select(pl.col("total_units").sum()).item()
+    st.metric("Total Units Sold", f"{total_units:,.0f}")
+with col3:
+    avg_weekly_rev = weekly_top5.select(pl.col("weekly_revenue").mean()).item()
+    st.metric("Avg Weekly Revenue", f"${avg_weekly_rev:,.2f}")
+with col4:
+    num_weeks = weekly_top5.select(pl.col("WEEk").n_unique()).item()
+    st.metric("Number of Weeks", f"{num_weeks}")
+
+st.divider()
+
+# NOTE: Great Tables summary of the Top 5 Products when they are explicity listed or selected.
+st.subheader("Top 5 Products Summary")
+gt_df = (
+    top5_overall
+    .select([
+        pl.col("SKUPOS_DESCRIPTION").alias("Product"),
+        pl.col("BRAND").alias("Brand"),
+        pl.col("CATEGORY").alias("Category"),
+        pl.col("total_revenue").round(2).alias("Revenue"),
+        pl.col("total_units").alias("Units"),
+        pl.col("avg_price").round(2).alias("Avg Price"),
+        pl.col("total_transactions").alias("Transactions")
+    ])
+)
+
+show_table(
+    gt_df,
+    title="Top 5 Products by Revenue",
+    subtitle=f"Months: {', '.join(map(str, months))}",
+    currency=["Revenue", "Avg Price"],
+    numbers=["Units", "Transactions"]
+)
+
+st.divider()
+
+# NOTE: Chart #1: Weekly trend line chart with optional target line that was included with a checkbox to disable if desired. 
+st.subheader("Weekly Revenue Trend")
+
+fig_line = px.line(
+    series_data(weekly_top5, 'WEEk', 'weekly_revenue', 'SKUPOS_DESCRIPTION'),
+    x='WEEk',
+    y='weekly_revenue',
+    color='SKUPOS_DESCRIPTION',
+    title='Weekly Revenue Trend for Top 5 Products',
+    labels={'WEEk': 'Week Number', 'weekly_revenue': 'Revenue ($)', 'SKUPOS_DESCRIPTION': 'Product'},
+    markers=True
+)
+
+
+fig_line.update_layout(hovermode='x unified')
+show_chart(fig_line)
+
+# NOTE: Chart #2: Bar chart comparing products by revenue, with labels to showcase this on the x and y axis.
+st.subheader("Revenue Comparison")
+
+fig_bar = px.bar(
+    chart_data(top5_overall),
+    x='SKUPOS_DESCRIPTION',
+    y='total_revenue',
+    color='CATEGORY',
+    title='Top 5 Products by Total Revenue',
+    labels={'SKUPOS_DESCRIPTION': 'Product', 'total_revenue': 'Total Revenue ($)'},
+    text='total_revenue'
+)
+fig_bar.update_traces(texttemplate='$%{text:,.0f}', textposition='outside')
+fig_bar.update_layout(xaxis_tickangle=-45)
+show_chart(fig_bar)
+
+# NOTE: Detailed records behind the current filters, streamed to a file in chunks when the owner asks for them.
+show_export(data, year, months, stores, ['daily', 'items'])
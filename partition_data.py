@@ -0,0 +1,102 @@
+"""
+Offline build step that rewrites the transaction tables into a Hive-partitioned layout:
+
+    data/partitioned/<table>/CALENDAR_YEAR=<y>/CALENDAR_MONTH=<m>/STORE_ID=<id>/part-0.parquet
+
+data_layer.py reads this layout automatically when it exists, so month and store filters skip
+whole files instead of scanning everything. Run it whenever the raw parquet in data/ is replaced,
+new transaction days are appended to the layout with ingest.py instead:
+
+    python partition_data.py
+"""
+import glob
+import os
+import shutil
+
+import polars as pl
+
+from data_layer import PARTITION_COLUMNS, PARTITIONED_DIR, TABLE_PATHS, HIVE_SCHEMA
+
+# NOTE: Sort order inside each file, so row-group statistics on these columns are tight.
+SORT_COLUMNS = {
+    'daily': ["CATEGORY", "BRAND", "SKUPOS_DESCRIPTION"],
+    'sets': ["DATE_TIME", "TRANSACTION_SET_ID"],
+    'items': ["TRANSACTION_SET_ID"],
+}
+ROW_GROUP_SIZE = 64_000
+
+
+def with_partition_columns(name):
+    """Lazy source table with CALENDAR_YEAR/CALENDAR_MONTH/STORE_ID attached and cast to the Hive schema"""
+    if name == 'daily':
+        lf = pl.scan_parquet(TABLE_PATHS['daily'])
+    elif name == 'sets':
+        lf = pl.scan_parquet(TABLE_PATHS['sets']).with_columns([
+            pl.col("DATE_TIME").dt.year().alias("CALENDAR_YEAR"),
+            pl.col("DATE_TIME").dt.month().alias("CALENDAR_MONTH")
+        ])
+    else:
+        # NOTE: Items carry no date or store of their own, they inherit both from their transaction set.
+        set_keys = with_partition_columns('sets').select(["TRANSACTION_SET_ID"] + PARTITION_COLUMNS)
+        lf = pl.scan_parquet(TABLE_PATHS['items']).join(set_keys, on="TRANSACTION_SET_ID", how="inner")
+    return lf.with_columns([pl.col(c).cast(dtype) for c, dtype in HIVE_SCHEMA.items()])
+
+
+def write_partitions(df, table_dir, sort_columns, file_name="part-0.parquet"):
+    """Write one file per (year, month, store) key, partition columns live in the path only, returns the paths written"""
+    written = []
+    for key, part in df.partition_by(PARTITION_COLUMNS, as_dict=True, include_key=False).items():
+        part_dir = os.path.join(table_dir, *[f"{col}={value}" for col, value in zip(PARTITION_COLUMNS, key)])
+        os.makedirs(part_dir, exist_ok=True)
+        path = os.path.join(part_dir, file_name)
+        part.sort(sort_columns).write_parquet(path, statistics=True, row_group_size=ROW_GROUP_SIZE)
+        written.append(path)
+    return written
+
+
+def compact_partition(part_dir, sort_columns):
+    """Rewrite every file of one partition directory as a single part-0.parquet, returns the number of files removed"""
+    files = sorted(glob.glob(os.path.join(part_dir, "*.parquet")))
+    if len(files) < 2:
+        return 0
+    target = os.path.join(part_dir, "part-0.parquet")
+    pl.read_parquet(files).sort(sort_columns).write_parquet(
+        f"{target}.tmp", statistics=True, row_group_size=ROW_GROUP_SIZE
+    )
+    # NOTE: The old files go before the new one replaces part-0, a scan in between misses rows rather than counting them twice.
+    for path in files:
+        if path != target:
+            os.remove(path)
+    os.replace(f"{target}.tmp", target)
+    return len(files) - 1
+
+
+def partition_table(name, output_dir=PARTITIONED_DIR):
+    """Rewrite one table year by year into a staging directory, then swap it into place"""
+    table_dir = os.path.join(output_dir, name)
+    staging_dir = f"{table_dir}.tmp"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+    lf = with_partition_columns(name)
+    years = lf.select(pl.col("CALENDAR_YEAR").drop_nulls().unique().sort()).collect().to_series().to_list()
+
+    # NOTE: One year at a time keeps the peak memory of the build to a single year of the table.
+    files = 0
+    for year in years:
+        year_df = lf.filter(pl.col("CALENDAR_YEAR") == year).collect()
+        files += len(write_partitions(year_df, staging_dir, SORT_COLUMNS[name]))
+
+    shutil.rmtree(table_dir, ignore_errors=True)
+    os.makedirs(output_dir, exist_ok=True)
+    os.rename(staging_dir, table_dir)
+    return files
+
+
+def main():
+    for name in ['daily', 'sets', 'items']:
+        files = partition_table(name)
+        print(f"{name}: wrote {files:,} partition files to {PARTITIONED_DIR}/{name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Product classification flags.
+Every (CATEGORY, SUBCATEGORY) pair in the product master and the daily aggregate is classified once against a set of rules
+(is_fuel, is_packaged_beverage, ...) and the result is persisted next to the rollups. Pages filter on
+these flags with a join on the category dictionary codes instead of running regexes over every row.
+
+Rules map a flag to {column: regex}, a pair gets the flag when any of its columns matches. Extra or
+changed rules go in data/product_rules.json (or the file named by CSTORE_PRODUCT_RULES), e.g.
+
+    {"is_energy_drink": {"SUBCATEGORY": "(?i)ENERGY"}}
+
+and the table is rebuilt automatically the next time it is loaded. Build it offline with:
+
+    python product_classes.py
+"""
+import json
+import os
+
+import polars as pl
+
+from data_layer import DATA_DIR, scan_all
+from rollups import ROLLUP_DIR, is_stale, schema_changed
+
+PRODUCT_CLASSES = f"{ROLLUP_DIR}/product_classes.parquet"
+RULES_FILE = os.environ.get("CSTORE_PRODUCT_RULES", f"{DATA_DIR}/product_rules.json")
+CLASS_KEYS = ["CATEGORY", "SUBCATEGORY"]
+
+DEFAULT_RULES = {
+    'is_fuel': {"CATEGORY": "^FUEL$"},
+    'is_packaged_beverage': {"CATEGORY": "(?i)BEVERAGE|DRINK", "SUBCATEGORY": "(?i)BEVERAGE|DRINK"},
+    'is_tobacco': {"CATEGORY": "(?i)TOBACCO|CIGAR|VAPOR"},
+    'is_alcohol': {"CATEGORY": "(?i)BEER|WINE|LIQUOR|SPIRIT"},
+}
+
+
+def load_rules(path=RULES_FILE):
+    """Default rules updated with the rules file, when there is one"""
+    rules = dict(DEFAULT_RULES)
+    if os.path.exists(path):
+        with open(path) as f:
+            rules.update(json.load(f))
+    return rules
+
+
+def rule_expr(patterns):
+    """True when any of the rule's columns matches its regex, null columns never match"""
+    return pl.any_horizontal([
+        pl.col(column).cast(pl.Utf8).str.contains(pattern).fill_null(False) for column, pattern in patterns.items()
+    ])
+
+
+def build_product_classes(gtin, daily, rules):
+    """One row per (CATEGORY, SUBCATEGORY) pair with a boolean column per rule"""
+    # NOTE: Fuel is sold without a GTIN, its FUEL category only exists in the daily aggregate, not in the product master.
+    return (
+        pl.concat([gtin.select(CLASS_KEYS), daily.select(CLASS_KEYS)])
+        .unique()
+        .with_columns([rule_expr(patterns).alias(flag) for flag, patterns in rules.items()])
+        .sort(CLASS_KEYS)
+    )
+
+
+def load_product_classes(rules_file=RULES_FILE, data=None):
+    """Read the persisted classification, rebuilding it when the product master or the rules changed"""
+    rules = load_rules(rules_file)
+    data = data or scan_all()
+    build = build_product_classes(data["gtin"], data["daily"], rules)
+    rules_mtime = os.path.getmtime(rules_file) if os.path.exists(rules_file) else 0
+    if (
+        is_stale(PRODUCT_CLASSES, ['gtin', 'daily']) or
+        os.path.getmtime(PRODUCT_CLASSES) < rules_mtime or
+        schema_changed(pl.read_parquet_schema(PRODUCT_CLASSES), build)
+    ):
+        os.makedirs(ROLLUP_DIR, exist_ok=True)
+        build.collect().write_parquet(PRODUCT_CLASSES)
+    return pl.read_parquet(PRODUCT_CLASSES)
+
+
+def flagged(classes, flag, keys=CLASS_KEYS):
+    """Distinct key values whose products all carry flag, keys can be coarser than (CATEGORY, SUBCATEGORY)"""
+    return (
+        classes
+        .group_by(keys)
+        .agg(pl.col(flag).all())
+        .filter(pl.col(flag))
+        .select(keys)
+    )
+
+
+def with_flag(frame, classes, flag):
+    """Rows of frame whose (CATEGORY, SUBCATEGORY) carry flag, as a lazy semi join on the category codes"""
+    return frame.lazy().join(flagged(classes, flag).lazy(), on=CLASS_KEYS, how="semi", nulls_equal=True)
+
+
+def main():
+    classes = load_product_classes()
+    print(f"product classes: {len(classes):,} category pairs in {PRODUCT_CLASSES}")
+    for flag in classes.columns[len(CLASS_KEYS):]:
+        print(f"  {flag}: {classes[flag].sum():,}")
+
+
+if __name__ == "__main__":
+    main()
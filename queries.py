@@ -0,0 +1,112 @@
+"""
+Page query functions.
+Every Polars pipeline a page runs lives here as a plain function of its inputs, so the pages,
+the benchmark suite and any offline job all run exactly the same query.
+Inputs can be DataFrames or LazyFrames, results are always collected DataFrames.
+Rollup-backed queries (top products, payment summaries) live in rollups.py.
+"""
+import polars as pl
+
+from census import ACS_VARS
+from product_classes import with_flag
+from tracing import traced
+
+
+@traced()
+def beverage_brand_performance(filtered_daily, min_transactions, product_classes):
+    """Revenue, units and transactions per packaged beverage brand, lowest revenue first"""
+    return (
+        with_flag(filtered_daily, product_classes, "is_packaged_beverage")
+        .filter(
+            (pl.col("CATEGORY").is_not_null()) &
+            (pl.col("BRAND").is_not_null())
+        )
+        .group_by("BRAND")
+        .agg([
+            pl.sum("TOTAL_REVENUE_AMOUNT").alias("revenue"),
+            pl.col("QUANTITY").cast(pl.Int64).sum().alias("units"),
+            pl.col("TRANSACTION_COUNT").cast(pl.Int64).sum().alias("transactions")
+        ])
+        .with_columns([
+            (pl.col("revenue") / pl.col("units")).alias("rev_per_unit"),
+            (pl.col("revenue") / pl.col("transactions")).alias("rev_per_transaction")
+        ])
+        .filter(pl.col("transactions") >= min_transactions)
+        .sort("revenue")
+        .lazy()
+        .collect()
+    )
+
+
+@traced()
+def store_performance(filtered_daily):
+    """Revenue and transactions per store"""
+    return (
+        filtered_daily
+        .group_by("STORE_ID")
+        .agg([
+            pl.sum("TOTAL_REVENUE_AMOUNT").alias("revenue"),
+            pl.col("TRANSACTION_COUNT").cast(pl.Int64).sum().alias("transactions")
+        ])
+        .lazy()
+        .collect()
+    )
+
+
+@traced()
+def enrich_stores(stores_df, tract_df, acs_tract_df, county_acs_df):
+    """Stores joined to their tract, the tract's ACS variables and the county's ACS variables (prefixed county_)"""
+    stores_tract_acs = (
+        stores_df
+        .join(tract_df, on="STORE_ID", how="left")
+        .join(acs_tract_df, on=["STATEFP", "COUNTYFP", "TRACT"], how="left")
+    )
+
+    # NOTE: Renamed county columns for joining
+    county_df = county_acs_df.with_columns(
+        [pl.col(var).alias(f"county_{var}") for var in ACS_VARS] +
+        [pl.col("NAME").alias("county_NAME")]
+    )
+
+    return stores_tract_acs.join(
+        county_df,
+        left_on=["STATEFP", "COUNTYFP"],
+        right_on=["state", "county"],
+        how="left"
+    )
+
+
+@traced()
+def stores_with_demographics(stores_enriched, store_perf):
+    """Enriched stores with their sales, limited to stores that have tract population and income"""
+    return (
+        stores_enriched
+        .join(store_perf, on="STORE_ID", how="left")
+        .filter(
+            (pl.col("B01003_001E").is_not_null()) &
+            (pl.col("B19019_001E").is_not_null())
+        )
+    )
+
+
+@traced()
+def state_demographics_summary(valid_stores):
+    """Store count and average tract demographics per state"""
+    return (
+        valid_stores
+        .with_columns([
+            pl.col("B01003_001E").cast(pl.Float64).alias("population"),
+            pl.col("B19019_001E").cast(pl.Float64).alias("income"),
+            pl.col("B17001_002E").cast(pl.Float64).alias("poverty"),
+            pl.col("B25077_001E").cast(pl.Float64).alias("home_value")
+        ])
+        .group_by("STATE")
+        .agg([
+            pl.count("STORE_ID").alias("store_count"),
+            pl.mean("population").alias("avg_tract_pop"),
+            pl.mean("income").alias("avg_income"),
+            pl.mean("poverty").alias("avg_poverty"),
+            pl.mean("home_value").alias("avg_home_value")
+        ])
+        .sort("store_count", descending=True)
+    )
@@ -0,0 +1,161 @@
+"""
+Rendering helpers shared by every page.
+Charts and tables are handed polars frames directly (Plotly reads them through narwhals, Great Tables
+natively), so nothing is copied into pandas on a rerun. Chart inputs are capped at a point budget
+before they are serialized to the browser, and every stage is traced as its own span (see tracing.py).
+
+Great Tables HTML is memoized in a process-wide LRU shared by every session, keyed on a content hash of
+the table's frame plus its formatting spec, so an unchanged table costs a dictionary lookup on a rerun.
+
+Every page ends with show_export(), a download of the detailed records behind the current filters (see export.py).
+
+Set CSTORE_POINT_BUDGET to change the number of points a single chart may carry (default 5000) and
+CSTORE_TABLE_CACHE to change the number of rendered tables kept (default 256).
+"""
+from collections import OrderedDict
+import hashlib
+import os
+import threading
+
+import polars as pl
+import streamlit as st
+
+from tracing import span
+
+POINT_BUDGET = int(os.environ.get("CSTORE_POINT_BUDGET", "5000"))
+TABLE_CACHE_SIZE = int(os.environ.get("CSTORE_TABLE_CACHE", "256"))
+
+_tables = OrderedDict()
+_tables_lock = threading.Lock()
+_table_stats = {'hits': 0, 'misses': 0}
+
+
+def chart_data(df, budget=None):
+    """Rows for a scatter/bar/box chart, a seeded uniform sample when the frame is over the point budget"""
+    budget = budget or POINT_BUDGET
+    if len(df) <= budget:
+        return df
+    with span("downsample", rows=budget):
+        return df.sample(n=budget, seed=0)
+
+
+def series_data(df, x, y, color=None, budget=None):
+    """
+    Points for a line chart, consecutive x values averaged into buckets when the series are over the point budget
+    The budget is split evenly across the series in color
+    """
+    budget = budget or POINT_BUDGET
+    if len(df) <= budget:
+        return df
+    series = [color] if color else []
+    per_series = max(budget // max(df.select(series).n_unique() if series else 1, 1), 2)
+    with span("downsample", rows=budget):
+        position = pl.int_range(pl.len())
+        count = pl.len()
+        if series:
+            position, count = position.over(series), count.over(series)
+        return (
+            df.sort(series + [x])
+            .with_columns((position * per_series // count).alias("_bucket"))
+            .group_by(series + ["_bucket"], maintain_order=True)
+            .agg([pl.col(x).first(), pl.col(y).mean()])
+            .drop("_bucket")
+        )
+
+
+def frame_digest(df):
+    """Content hash of a DataFrame: schema, shape and the per-row hashes in order"""
+    digest = hashlib.blake2b(repr(df.schema).encode(), digest_size=16)
+    digest.update(df.height.to_bytes(8, "little"))
+    if df.height:
+        digest.update(df.hash_rows(seed=0).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def build_table(df, title, subtitle=None, currency=(), numbers=(), missing_text=None):
+    """Great Tables table for df: a header, USD currency columns and whole-number columns"""
+    # NOTE: Imported on first use, only pages that render a table pay for great_tables.
+    from great_tables import GT
+
+    gt_table = GT(df).tab_header(title=title, subtitle=subtitle)
+    if currency:
+        gt_table = gt_table.fmt_currency(columns=list(currency), currency="USD")
+    if numbers:
+        gt_table = gt_table.fmt_number(columns=list(numbers), decimals=0)
+    if missing_text is not None:
+        gt_table = gt_table.sub_missing(missing_text=missing_text)
+    return gt_table
+
+
+def table_html(df, **spec):
+    """
+    HTML of build_table(df, **spec), rendered once per distinct (frame content, spec)
+    Returns (html, cached) where cached is True when the HTML came from the cache
+    """
+    key = (frame_digest(df), repr(sorted(spec.items())))
+    with _tables_lock:
+        html = _tables.get(key)
+        if html is not None:
+            _tables.move_to_end(key)
+            _table_stats['hits'] += 1
+            return html, True
+        _table_stats['misses'] += 1
+
+    # NOTE: Rendered outside the lock, two sessions missing on the same table at once both render it and one result wins.
+    html = build_table(df, **spec).as_raw_html()
+    with _tables_lock:
+        _tables[key] = html
+        while len(_tables) > TABLE_CACHE_SIZE:
+            _tables.popitem(last=False)
+    return html, False
+
+
+def table_cache_info():
+    """Hits, misses and current size of the rendered-table cache"""
+    with _tables_lock:
+        return {**_table_stats, 'size': len(_tables), 'max_size': TABLE_CACHE_SIZE}
+
+
+def show_table(df, **spec):
+    """Render df as a Great Tables table (see build_table for the spec), memoized across reruns and sessions"""
+    with span("gt_html", rows=len(df)) as record:
+        html, cached = table_html(df, **spec)
+        if cached:
+            record['name'] = "gt_html (cached)"
+    st.html(html)
+
+
+def show_chart(fig):
+    """Render a Plotly figure at container width, the span covers figure serialization"""
+    with span("plotly_chart"):
+        st.plotly_chart(fig, width="stretch")
+
+
+def show_export(data, year_filter, month_filter, store_filter, tables):
+    """Expander that streams the selection's detail rows of one of tables (export.py names) to a file and links it for download"""
+    # NOTE: Imported on first use, like great_tables, a rerun that doesn't export never loads the export module.
+    from app_data import load_backend
+    from export import EXPORT_TABLES, FORMATS, MAX_DOWNLOAD_MB, export_file, export_url
+    from result_cache import dataset_version
+
+    with st.expander("Download Detailed Records"):
+        col1, col2 = st.columns([2, 1])
+        with col1:
+            table = st.selectbox("Records", tables, format_func=EXPORT_TABLES.get, key="export_table")
+        with col2:
+            fmt = st.radio("Format", FORMATS, horizontal=True, key="export_format")
+        st.caption("Every row of the selected years, months and stores, written in chunks so exports of any size fit in memory.")
+        if not st.button("Prepare Export", key="export_prepare"):
+            return
+        with span(f"export {table}"):
+            path = export_file(data, dataset_version(load_backend()), table, fmt, year_filter, month_filter, store_filter)
+        size_mb = os.path.getsize(path) / 2**20
+        if size_mb > MAX_DOWNLOAD_MB:
+            st.warning(
+                f"{size_mb:,.1f} MB is over the {MAX_DOWNLOAD_MB} MB the app serves, "
+                f"narrow the selection or run `python export.py {table} --format {fmt}`."
+            )
+            return
+        # NOTE: A link to the file on disk, Streamlit's static route streams it instead of holding it in server memory.
+        name = os.path.basename(path)
+        st.markdown(f'<a href="{export_url(path)}" download="{name}">Download {name}</a> ({size_mb:,.1f} MB)', unsafe_allow_html=True)
@@ -0,0 +1,248 @@
+"""
+Result cache shared by every worker and instance.
+Streamlit's caches live in one process, so every Cloud Run instance recomputes the same aggregation for the same
+filters. The app_data getters run their query through cached_result(), which keys the result on (query name,
+filter params, data version) and keeps it as Arrow IPC in a store every instance can reach:
+
+    dir     one .arrow file per result in CSTORE_RESULT_CACHE_DIR (default data/results), a local disk shares the
+            results between the workers of a host, a shared mount (Filestore, a GCS FUSE bucket) across the fleet
+    redis   a Redis-compatible server at CSTORE_REDIS_URL (Memorystore, Valkey, a local redis-server stand-in)
+    off     nothing is shared, every process computes its own results
+
+Pick it with CSTORE_RESULT_CACHE (default dir). The directory store evicts the least recently used results once it
+is over CSTORE_RESULT_CACHE_MB (default 256), a Redis server evicts by its own maxmemory with allkeys-lru.
+The data version covers the source files, the ingested batches and the query code, so a popular filter
+combination is computed once per data version across the fleet and a new version never reads an old result.
+Hits, misses and evictions of this process are shown in the sidebar Performance panel.
+"""
+import hashlib
+import io
+import json
+import os
+import struct
+import threading
+
+import polars as pl
+
+from data_layer import DATA_DIR, TABLE_PATHS, source_files
+from ingest import data_version
+
+RESULT_CACHE = os.environ.get("CSTORE_RESULT_CACHE", "dir")
+RESULT_CACHE_DIR = os.environ.get("CSTORE_RESULT_CACHE_DIR", f"{DATA_DIR}/results")
+RESULT_CACHE_MB = int(os.environ.get("CSTORE_RESULT_CACHE_MB", "256"))
+REDIS_URL = os.environ.get("CSTORE_REDIS_URL", "redis://localhost:6379/0")
+
+CODE_DIR = os.path.dirname(os.path.abspath(__file__))
+# NOTE: A change to any of these changes what a query returns, so they are part of the data version.
+CODE_FILES = [
+    "app_data.py", "baskets.py", "data_layer.py", "filter_engine.py", "product_classes.py", "queries.py",
+    "result_cache.py", "rollups.py"
+]
+
+_stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+_stats_lock = threading.Lock()
+_versions = {}
+
+
+def count(event, n=1):
+    with _stats_lock:
+        _stats[event] += n
+
+
+def cache_info():
+    """Hits, misses, stored results and evictions of this process"""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def encode(value):
+    """
+    A DataFrame, or a tuple or dict of DataFrames, as bytes: a length-prefixed JSON header naming the
+    parts, followed by each part as an Arrow IPC stream
+    """
+    if isinstance(value, pl.DataFrame):
+        kind, parts = "frame", {"": value}
+    elif isinstance(value, tuple):
+        kind, parts = "tuple", {str(i): df for i, df in enumerate(value)}
+    else:
+        kind, parts = "dict", value
+    blobs = []
+    for df in parts.values():
+        buffer = io.BytesIO()
+        df.write_ipc_stream(buffer, compression="lz4")
+        blobs.append(buffer.getvalue())
+    header = json.dumps({'kind': kind, 'parts': [[name, len(blob)] for name, blob in zip(parts, blobs)]}).encode()
+    return struct.pack("<I", len(header)) + header + b"".join(blobs)
+
+
+def decode(blob):
+    """The value encode() wrote"""
+    (size,) = struct.unpack_from("<I", blob)
+    header = json.loads(blob[4:4 + size])
+    offset = 4 + size
+    parts = {}
+    for name, length in header['parts']:
+        parts[name] = pl.read_ipc_stream(io.BytesIO(blob[offset:offset + length]))
+        offset += length
+    if header['kind'] == "frame":
+        return parts[""]
+    if header['kind'] == "tuple":
+        return tuple(parts.values())
+    return parts
+
+
+class DirectoryCache:
+    """One IPC blob per key in a directory, least recently used first out once it is over max_bytes"""
+
+    name = "dir"
+
+    def __init__(self, root=RESULT_CACHE_DIR, max_bytes=RESULT_CACHE_MB * 2**20):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key):
+        return f"{self.root}/{key}.arrow"
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                blob = f.read()
+            # NOTE: The mtime is the recency every instance evicts by, a hit moves the result to the back of the line.
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return blob
+
+    def put(self, key, blob):
+        path = self.path(key)
+        # NOTE: Written under a private name and renamed, a reader on another instance sees the whole result or none.
+        tmp = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(blob)
+        os.replace(tmp, path)
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used results until the directory fits in max_bytes"""
+        entries = []
+        for entry in os.scandir(self.root):
+            if entry.name.endswith(".arrow"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                count('evictions')
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class RedisCache:
+    """IPC blobs in a Redis-compatible server, eviction is left to the server's maxmemory policy"""
+
+    name = "redis"
+
+    def __init__(self, url=REDIS_URL):
+        import redis
+
+        self._errors = redis.RedisError
+        self._client = redis.Redis.from_url(url)
+        self._client.ping()
+
+    # NOTE: A server that goes away mid-run turns into misses, the page computes its own result instead of failing.
+    def get(self, key):
+        try:
+            return self._client.get(f"cstore:{key}")
+        except self._errors:
+            return None
+
+    def put(self, key, blob):
+        try:
+            self._client.set(f"cstore:{key}", blob)
+        except self._errors:
+            pass
+
+
+class NoCache:
+    """Nothing is shared, every call computes"""
+
+    name = "off"
+
+    def get(self, key):
+        return None
+
+    def put(self, key, blob):
+        pass
+
+
+def get_result_cache(name=None):
+    """Store named by CSTORE_RESULT_CACHE, the directory store when Redis isn't installed or can't be reached"""
+    name = name or RESULT_CACHE
+    if name == "off":
+        return NoCache()
+    if name == "redis":
+        try:
+            return RedisCache()
+        except Exception:
+            pass
+    return DirectoryCache()
+
+
+def code_version():
+    """sha256 over the query modules' source"""
+    digest = hashlib.sha256()
+    for name in CODE_FILES:
+        with open(os.path.join(CODE_DIR, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def dataset_version(backend):
+    """
+    Version of the data the queries read: the backend's files (name, size, mtime), the ingested batches and the code
+    Stat'ed once per process and ingested batch, a new batch is the only way the files change under a running app
+    """
+    # NOTE: Imported here like artifacts.extra_files does, so loading the app doesn't import the rules module for this.
+    from product_classes import RULES_FILE
+
+    key = (backend.name, data_version())
+    if key not in _versions:
+        if backend.name == "duckdb":
+            files = [backend.path]
+        else:
+            files = [f for table in TABLE_PATHS for f in source_files(table)]
+        files.append(RULES_FILE)
+        stats = [
+            [f, os.stat(f).st_size, os.stat(f).st_mtime_ns] if os.path.exists(f) else [f, None, None] for f in files
+        ]
+        digest = hashlib.sha256(json.dumps([backend.name, data_version(), code_version(), stats]).encode())
+        _versions[key] = digest.hexdigest()[:16]
+    return _versions[key]
+
+
+def result_key(name, params, version):
+    """Cache key of one query result, params must be JSON-serializable"""
+    return hashlib.sha256(json.dumps([name, params, version], default=str).encode()).hexdigest()[:32]
+
+
+def cached_result(cache, name, params, version, compute):
+    """compute() served from the shared cache when any worker already stored it for this data version"""
+    key = result_key(name, params, version)
+    blob = cache.get(key)
+    if blob is not None:
+        count('hits')
+        return decode(blob)
+    count('misses')
+    value = compute()
+    cache.put(key, encode(value))
+    count('stores')
+    return value
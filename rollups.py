@@ -0,0 +1,299 @@
+"""
+Materialized rollups for the dashboard pages.
+Each rollup is computed once from the lazy sources, persisted under data/rollups/ and only rebuilt
+when its source files change. Pages then aggregate the (much smaller) rollup instead of the raw tables.
+Days appended by ingest.py are merged into the rollups that are current instead of rebuilding them.
+
+Build them offline with:
+
+    python rollups.py
+"""
+import os
+
+import polars as pl
+
+from data_layer import DATA_DIR, calendar_predicate, scan_all, sets_with_calendar, source_mtime
+from tracing import traced
+
+ROLLUP_DIR = f"{DATA_DIR}/rollups"
+
+WEEKLY_PRODUCT_CUBE = f"{ROLLUP_DIR}/weekly_product_cube.parquet"
+CUBE_KEYS = ["CALENDAR_YEAR", "CALENDAR_MONTH", "WEEk", "CATEGORY", "BRAND", "SKUPOS_DESCRIPTION"]
+
+PAYMENT_FACTS = f"{ROLLUP_DIR}/payment_facts.parquet"
+PAYMENT_PRODUCTS = f"{ROLLUP_DIR}/payment_product_counts.parquet"
+PAYMENT_TYPES = ["CASH", "CREDIT", "DEBIT"]
+
+STORE_TOTALS = f"{ROLLUP_DIR}/store_totals.parquet"
+STORE_TOTAL_KEYS = ["CALENDAR_YEAR", "CALENDAR_MONTH", "STORE_ID"]
+
+# NOTE: Group keys of each additive rollup, ingest.py merges a batch into them by summing the measures per key.
+ROLLUP_KEYS = {
+    WEEKLY_PRODUCT_CUBE: CUBE_KEYS,
+    PAYMENT_PRODUCTS: ["CALENDAR_YEAR", "CALENDAR_MONTH", "PAYMENT_TYPE", "SKUPOS_DESCRIPTION", "CATEGORY"],
+    STORE_TOTALS: STORE_TOTAL_KEYS,
+}
+
+
+def build_weekly_product_cube(daily):
+    """Daily aggregate rolled up to (year, month, week, category, brand, product)"""
+    return (
+        daily
+        .group_by(CUBE_KEYS)
+        .agg([
+            pl.sum("TOTAL_REVENUE_AMOUNT").alias("revenue"),
+            pl.col("QUANTITY").cast(pl.Int64).sum().alias("units"),
+            pl.col("TRANSACTION_COUNT").cast(pl.Int64).sum().alias("transactions")
+        ])
+        .sort(["CALENDAR_YEAR", "CALENDAR_MONTH", "WEEk"])
+    )
+
+
+def build_payment_facts(sets, items):
+    """One row per transaction that has items: payment type, store, date, item count and basket total"""
+    basket_items = (
+        items
+        .group_by("TRANSACTION_SET_ID")
+        .agg(pl.col("UNIT_QUANTITY").cast(pl.Int64).sum().alias("item_count"))
+    )
+    return (
+        sets_with_calendar(sets)
+        .filter(pl.col("PAYMENT_TYPE").is_in(PAYMENT_TYPES))
+        .join(basket_items, on="TRANSACTION_SET_ID", how="inner")
+        .select([
+            "TRANSACTION_SET_ID",
+            "STORE_ID",
+            pl.col("DATE_TIME").dt.date().alias("DATE"),
+            pl.col("CALENDAR_YEAR").cast(pl.Int32),
+            pl.col("CALENDAR_MONTH").cast(pl.Int32),
+            "PAYMENT_TYPE",
+            "item_count",
+            pl.col("GRAND_TOTAL_AMOUNT").alias("basket_total")
+        ])
+        .sort(["CALENDAR_YEAR", "CALENDAR_MONTH"])
+    )
+
+
+def build_payment_product_counts(sets, items, gtin):
+    """
+    Transactions and item revenue per (year, month, payment type, product)
+    A transaction falls in exactly one month, so purchase counts stay exact when summed across months
+    """
+    return (
+        items
+        .join(
+            sets_with_calendar(sets)
+            .filter(pl.col("PAYMENT_TYPE").is_in(PAYMENT_TYPES))
+            .select(["TRANSACTION_SET_ID", "CALENDAR_YEAR", "CALENDAR_MONTH", "PAYMENT_TYPE"]),
+            on="TRANSACTION_SET_ID",
+            how="inner"
+        )
+        .join(gtin.select(["GTIN", "CATEGORY", "SKUPOS_DESCRIPTION"]), on="GTIN", how="left")
+        .filter(pl.col("CATEGORY").is_not_null())
+        .group_by(["CALENDAR_YEAR", "CALENDAR_MONTH", "PAYMENT_TYPE", "SKUPOS_DESCRIPTION", "CATEGORY"])
+        .agg([
+            pl.col("TRANSACTION_SET_ID").n_unique().alias("purchase_count"),
+            pl.col("GRAND_TOTAL_AMOUNT").sum().alias("revenue")
+        ])
+        .with_columns([pl.col("CALENDAR_YEAR").cast(pl.Int32), pl.col("CALENDAR_MONTH").cast(pl.Int32)])
+        .sort(["CALENDAR_YEAR", "CALENDAR_MONTH"])
+    )
+
+
+def build_store_totals(daily):
+    """Daily aggregate rolled up to (year, month, store)"""
+    return (
+        daily
+        .group_by(STORE_TOTAL_KEYS)
+        .agg([
+            pl.sum("TOTAL_REVENUE_AMOUNT").alias("revenue"),
+            pl.col("TRANSACTION_COUNT").cast(pl.Int64).sum().alias("transactions")
+        ])
+        .sort(STORE_TOTAL_KEYS)
+    )
+
+
+def is_stale(path, tables):
+    """True when the rollup is missing or older than any of its source tables"""
+    if not os.path.exists(path):
+        return True
+    return os.path.getmtime(path) < max(source_mtime(t) for t in tables)
+
+
+def schema_changed(stored_schema, lf):
+    """True when a persisted table no longer has the schema its build query produces (e.g. after a dtype change)"""
+    return dict(stored_schema) != dict(lf.collect_schema())
+
+
+def load_or_build(path, tables, build):
+    """Read a persisted rollup, rebuilding and persisting it first when stale"""
+    if is_stale(path, tables) or schema_changed(pl.read_parquet_schema(path), build()):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        build().collect().write_parquet(path, statistics=True)
+    return pl.read_parquet(path)
+
+
+def append_to_rollup(path, delta):
+    """
+    Merge the rollup rows of newly ingested data into a persisted rollup and swap it into place
+    Rollups in ROLLUP_KEYS sum their measures per key, payment facts have one row per transaction and are appended
+    """
+    current = pl.read_parquet(path)
+    merged = pl.concat([current, delta.select(current.columns).cast(current.schema)])
+    keys = ROLLUP_KEYS.get(path)
+    if keys is not None:
+        merged = merged.group_by(keys).agg(pl.exclude(keys).sum()).select(current.columns).cast(current.schema)
+    # NOTE: Every rollup's keys start with the period, sorting on them keeps the row-group statistics tight for period filters.
+    merged = merged.sort(keys or ["CALENDAR_YEAR", "CALENDAR_MONTH"], maintain_order=True)
+    merged.write_parquet(f"{path}.tmp", statistics=True)
+    os.replace(f"{path}.tmp", path)
+    return len(merged)
+
+
+def load_weekly_product_cube(data=None):
+    data = data or scan_all()
+    return load_or_build(
+        WEEKLY_PRODUCT_CUBE,
+        ['daily'],
+        lambda: build_weekly_product_cube(data["daily"])
+    )
+
+
+def load_payment_facts(data=None):
+    data = data or scan_all()
+    return load_or_build(
+        PAYMENT_FACTS,
+        ['sets', 'items'],
+        lambda: build_payment_facts(data["sets"], data["items"])
+    )
+
+
+def load_payment_product_counts(data=None):
+    data = data or scan_all()
+    return load_or_build(
+        PAYMENT_PRODUCTS,
+        ['sets', 'items', 'gtin'],
+        lambda: build_payment_product_counts(data["sets"], data["items"], data["gtin"])
+    )
+
+
+def load_store_totals(data=None):
+    data = data or scan_all()
+    return load_or_build(
+        STORE_TOTALS,
+        ['daily'],
+        lambda: build_store_totals(data["daily"])
+    )
+
+
+def non_fuel_period(cube, year_filter, month_filter, fuel_categories):
+    """Cube rows for the selected period with the fuel categories (product_classes.flagged is_fuel) excluded"""
+    return cube.filter(calendar_predicate(year_filter, month_filter) & ~pl.col("CATEGORY").is_in(fuel_categories))
+
+
+@traced()
+def top_products(period, categories, n=5):
+    """Top-n products by revenue and their weekly series, from a non_fuel_period slice of the cube"""
+    if categories:
+        period = period.filter(pl.col("CATEGORY").is_in(categories))
+
+    top_n = (
+        period
+        .filter(
+            (pl.col("BRAND").is_not_null()) &
+            (pl.col("SKUPOS_DESCRIPTION").is_not_null()) &
+            (pl.col("CATEGORY").is_not_null())
+        )
+        .group_by(["BRAND", "SKUPOS_DESCRIPTION", "CATEGORY"])
+        .agg([
+            pl.sum("revenue").alias("total_revenue"),
+            pl.sum("units").alias("total_units"),
+            pl.sum("transactions").alias("total_transactions")
+        ])
+        .with_columns([
+            (pl.col("total_revenue") / pl.col("total_units")).alias("avg_price")
+        ])
+        # NOTE: Partial top-k selection, only the n winners get sorted for display.
+        .top_k(n, by="total_revenue")
+        .sort("total_revenue", descending=True)
+    )
+
+    weekly = (
+        period
+        .filter(
+            (pl.col("SKUPOS_DESCRIPTION").is_in(top_n["SKUPOS_DESCRIPTION"].to_list())) &
+            (pl.col("WEEk").is_not_null())
+        )
+        .group_by(["WEEk", "SKUPOS_DESCRIPTION", "BRAND"])
+        .agg([
+            pl.sum("revenue").alias("weekly_revenue"),
+            pl.sum("units").alias("weekly_units")
+        ])
+        .sort(["WEEk", "weekly_revenue"], descending=[False, True])
+    )
+    return top_n, weekly
+
+
+@traced()
+def summarize_payments(facts, year_filter, month_filter, payment_types):
+    """Transactions, spend, ticket size and basket size per payment type"""
+    return (
+        facts
+        .filter(calendar_predicate(year_filter, month_filter) & pl.col("PAYMENT_TYPE").is_in(payment_types))
+        .group_by("PAYMENT_TYPE")
+        .agg([
+            pl.len().alias("num_transactions"),
+            pl.col("basket_total").sum().alias("total_spend"),
+            pl.col("basket_total").mean().alias("avg_ticket"),
+            pl.col("item_count").sum().alias("total_items")
+        ])
+        .with_columns([
+            (pl.col("total_items") / pl.col("num_transactions")).alias("avg_items_per_txn")
+        ])
+    )
+
+
+@traced()
+def rank_products_by_payment(product_counts, year_filter, month_filter, payment_types, n=5):
+    """Most frequently purchased products per payment type"""
+    return (
+        product_counts
+        .filter(calendar_predicate(year_filter, month_filter) & pl.col("PAYMENT_TYPE").is_in(payment_types))
+        .group_by(["PAYMENT_TYPE", "SKUPOS_DESCRIPTION", "CATEGORY"])
+        .agg([
+            pl.sum("purchase_count"),
+            pl.sum("revenue")
+        ])
+        .sort(["PAYMENT_TYPE", "purchase_count"], descending=[False, True])
+        .group_by("PAYMENT_TYPE", maintain_order=True)
+        .head(n)
+    )
+
+
+@traced()
+def store_totals(totals, year_filter, month_filter, store_filter=None):
+    """Revenue and transactions per store for the selected period and stores"""
+    return (
+        totals
+        .filter(calendar_predicate(year_filter, month_filter, store_filter))
+        .group_by("STORE_ID")
+        .agg([
+            pl.sum("revenue"),
+            pl.sum("transactions")
+        ])
+    )
+
+
+def main():
+    cube = load_weekly_product_cube()
+    print(f"weekly product cube: {len(cube):,} rows in {WEEKLY_PRODUCT_CUBE}")
+    facts = load_payment_facts()
+    print(f"payment facts: {len(facts):,} rows in {PAYMENT_FACTS}")
+    product_counts = load_payment_product_counts()
+    print(f"payment product counts: {len(product_counts):,} rows in {PAYMENT_PRODUCTS}")
+    totals = load_store_totals()
+    print(f"store totals: {len(totals):,} rows in {STORE_TOTALS}")
+
+
+if __name__ == "__main__":
+    main()
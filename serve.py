@@ -0,0 +1,26 @@
+"""
+Container entry point: warm the caches (see warmup.py), then start the Streamlit server in the same process,
+so the sessions it serves find them filled. The server only listens once the warm-up is done, which is when
+Cloud Run's startup probe marks the instance ready. Arguments are passed on to `streamlit run`:
+
+    python serve.py --server.port=8080 --server.address=0.0.0.0
+"""
+import os
+import sys
+
+from streamlit.web import cli
+
+from warmup import APP_DIR, warm_up, warmup_enabled
+
+APP = os.path.join(APP_DIR, "streamlit1.py")
+
+
+def main():
+    if warmup_enabled():
+        warm_up()
+    sys.argv = ["streamlit", "run", APP, *sys.argv[1:]]
+    sys.exit(cli.main())
+
+
+if __name__ == "__main__":
+    main()
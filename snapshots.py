@@ -0,0 +1,131 @@
+"""
+Memory-mapped Arrow IPC snapshots of the three large transaction tables.
+daily, sets and items are written once as uncompressed Arrow IPC files sorted by (CALENDAR_YEAR, CALENDAR_MONTH,
+STORE_ID) and then memory-mapped, so every session in a process and every worker process on the host reads the
+same page-cache pages instead of holding its own copy. A period, and a store within a period, is a contiguous
+row range in each snapshot, which lets the filter engine serve partitions as zero-copy slices.
+
+Set CSTORE_SNAPSHOT_DIR to a tmpfs such as /dev/shm to share one copy across containers on a host.
+Snapshots are rebuilt automatically whenever a source table is newer than them, or ahead of time with:
+
+    python snapshots.py
+"""
+from contextlib import contextmanager
+import fcntl
+import os
+
+import polars as pl
+import pyarrow as pa
+
+from data_layer import DATA_DIR, has_calendar_columns, scan_all, sets_with_calendar
+from rollups import is_stale, schema_changed
+
+SNAPSHOT_DIR = os.environ.get("CSTORE_SNAPSHOT_DIR", f"{DATA_DIR}/snapshots")
+SNAPSHOT_TABLES = ['daily', 'sets', 'items']
+PERIOD_COLUMNS = ["CALENDAR_YEAR", "CALENDAR_MONTH"]
+SORT_COLUMNS = PERIOD_COLUMNS + ["STORE_ID"]
+
+# NOTE: items take their calendar columns from sets, so a newer sets table also invalidates the items snapshot.
+SNAPSHOT_SOURCES = {
+    'daily': ['daily'],
+    'sets': ['sets'],
+    'items': ['items', 'sets'],
+}
+
+
+def snapshots_enabled():
+    """Snapshots are on unless CSTORE_SNAPSHOTS=0"""
+    return os.environ.get("CSTORE_SNAPSHOTS", "1") != "0"
+
+
+def snapshot_path(name, snapshot_dir=SNAPSHOT_DIR):
+    return f"{snapshot_dir}/{name}.arrow"
+
+
+@contextmanager
+def build_lock(snapshot_dir=SNAPSHOT_DIR):
+    """Exclusive host-wide lock so concurrent workers build each snapshot once and the rest wait for it"""
+    os.makedirs(snapshot_dir, exist_ok=True)
+    with open(f"{snapshot_dir}/.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def layout_path(snapshot_dir=SNAPSHOT_DIR):
+    return f"{snapshot_dir}/layout"
+
+
+def layout_changed(snapshot_dir=SNAPSHOT_DIR):
+    """True when the snapshots on disk were written with another sort order than SORT_COLUMNS"""
+    path = layout_path(snapshot_dir)
+    if not os.path.exists(path):
+        return True
+    with open(path) as f:
+        return f.read().strip() != ",".join(SORT_COLUMNS)
+
+
+def snapshot_frame(name, data):
+    """LazyFrame for one snapshot: the page columns plus Int32 calendar columns, sorted by period and store"""
+    if name == 'daily':
+        lf = data["daily"]
+    elif name == 'sets':
+        lf = sets_with_calendar(data["sets"])
+    elif has_calendar_columns(data["items"]):
+        lf = data["items"]
+    else:
+        # NOTE: Items without a set never match a selection (filter_items semi joins on sets), so an inner join loses nothing.
+        # NOTE: Items take their store from the set as well, so the per-store row index covers them too.
+        periods = sets_with_calendar(data["sets"]).select(["TRANSACTION_SET_ID"] + SORT_COLUMNS)
+        lf = data["items"].join(periods, on="TRANSACTION_SET_ID", how="inner")
+    return (
+        lf
+        .with_columns([pl.col(c).cast(pl.Int32) for c in PERIOD_COLUMNS])
+        .sort(SORT_COLUMNS, maintain_order=True)
+    )
+
+
+def build_snapshot(name, data, snapshot_dir=SNAPSHOT_DIR):
+    """Stream one snapshot to disk and swap it into place atomically"""
+    path = snapshot_path(name, snapshot_dir)
+    tmp_path = f"{path}.tmp"
+    snapshot_frame(name, data).sink_ipc(tmp_path, compression="uncompressed")
+    # NOTE: os.replace leaves sessions that still map the old file on the old inode until they drop it.
+    os.replace(tmp_path, path)
+    return path
+
+
+def map_snapshot(path):
+    """Memory-map an IPC file and wrap it as a DataFrame without copying the buffers"""
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    return pl.from_arrow(table, rechunk=False)
+
+
+def load_snapshots(data=None, snapshot_dir=SNAPSHOT_DIR):
+    """Memory-mapped daily, sets and items, building any snapshot that is missing or stale first"""
+    data = data or scan_all()
+    with build_lock(snapshot_dir):
+        # NOTE: The sort order isn't visible in the schema, snapshots written before the store order are rebuilt from the layout marker.
+        relayout = layout_changed(snapshot_dir)
+        for name in SNAPSHOT_TABLES:
+            path = snapshot_path(name, snapshot_dir)
+            frame = snapshot_frame(name, data)
+            if relayout or is_stale(path, SNAPSHOT_SOURCES[name]) or schema_changed(pl.read_ipc_schema(path), frame):
+                build_snapshot(name, data, snapshot_dir)
+        if relayout:
+            with open(layout_path(snapshot_dir), "w") as f:
+                f.write(",".join(SORT_COLUMNS))
+    return {name: map_snapshot(snapshot_path(name, snapshot_dir)) for name in SNAPSHOT_TABLES}
+
+
+def main():
+    snapshots = load_snapshots()
+    for name, df in snapshots.items():
+        size = os.path.getsize(snapshot_path(name))
+        print(f"{name}: {len(df):,} rows, {size / 2**20:,.1f} MB in {snapshot_path(name)}")
+
+
+if __name__ == "__main__":
+    main()
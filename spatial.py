@@ -0,0 +1,184 @@
+"""
+Offline store-to-tract assignment.
+Tract polygons are read from a local GeoParquet file (WKB geometry), packed into flat edge arrays and
+indexed with a uniform lon/lat grid. Store points are then matched to tracts with vectorized even-odd
+containment tests, so the whole store table is assigned in one batch with no geocoder round-trips.
+
+TIGER/Line tract shapefiles can be converted once with GDAL:
+
+    ogr2ogr -f Parquet data/census_tract_boundaries.parquet tl_2020_16_tract.shp
+
+Then assign every store with:
+
+    python spatial.py
+"""
+import os
+import struct
+
+import numpy as np
+import polars as pl
+
+from census import TRACT_GEOCODED_FILE, TRACT_SCHEMA, write_atomic
+
+TRACT_BOUNDARIES_FILE = "data/census_tract_boundaries.parquet"
+
+
+def _read_geometry(buf, offset, rings):
+    """Append the rings of one WKB Polygon/MultiPolygon starting at offset, return the offset after it"""
+    endian = "<" if buf[offset] == 1 else ">"
+    (geom_type,) = struct.unpack_from(endian + "I", buf, offset + 1)
+    offset += 5
+    # NOTE: EWKB flags (PostGIS) carry Z/M/SRID in the high bits, ISO WKB adds 1000/2000/3000 to the type.
+    if geom_type & 0x20000000:
+        offset += 4
+    dims = 2 + bool(geom_type & 0x80000000) + bool(geom_type & 0x40000000)
+    base = geom_type & 0xFFFF
+    if base >= 1000:
+        dims = 4 if base >= 3000 else 3
+    kind = base % 1000
+
+    if kind == 3:
+        (ring_count,) = struct.unpack_from(endian + "I", buf, offset)
+        offset += 4
+        for _ in range(ring_count):
+            (point_count,) = struct.unpack_from(endian + "I", buf, offset)
+            offset += 4
+            coords = np.frombuffer(buf, dtype=endian + "f8", count=point_count * dims, offset=offset)
+            rings.append(coords.reshape(point_count, dims)[:, :2].astype(np.float64))
+            offset += point_count * dims * 8
+    elif kind == 6:
+        (polygon_count,) = struct.unpack_from(endian + "I", buf, offset)
+        offset += 4
+        for _ in range(polygon_count):
+            offset = _read_geometry(buf, offset, rings)
+    else:
+        raise ValueError(f"Unsupported WKB geometry type {geom_type}")
+    return offset
+
+
+def parse_wkb_rings(wkb):
+    """Every ring (exterior and holes) of a WKB Polygon/MultiPolygon as (n, 2) lon/lat arrays"""
+    rings = []
+    _read_geometry(wkb, 0, rings)
+    return rings
+
+
+class TractIndex:
+    """Packed tract edges plus a uniform grid over tract bounding boxes"""
+
+    def __init__(self, tracts, cell_size=0.1):
+        self.cell_size = cell_size
+        self.keys = tracts.select(["STATEFP", "COUNTYFP", "TRACT"])
+
+        edges, offsets, bounds = [], [0], []
+        for wkb in tracts["geometry"]:
+            rings = parse_wkb_rings(wkb)
+            tract_edges = np.concatenate([np.hstack([ring[:-1], ring[1:]]) for ring in rings])
+            edges.append(tract_edges)
+            offsets.append(offsets[-1] + len(tract_edges))
+            points = np.concatenate(rings)
+            bounds.append([points[:, 0].min(), points[:, 1].min(), points[:, 0].max(), points[:, 1].max()])
+
+        # NOTE: Edges of tract i are edges[offsets[i]:offsets[i + 1]], one contiguous array for the whole country.
+        self.edges = np.concatenate(edges) if edges else np.empty((0, 4))
+        self.offsets = np.asarray(offsets)
+        self.bounds = np.asarray(bounds).reshape(-1, 4)
+        self.grid = self._build_grid()
+
+    def _cell(self, values):
+        return np.floor(np.asarray(values) / self.cell_size).astype(np.int64)
+
+    def _build_grid(self):
+        grid = {}
+        min_x, min_y = self._cell(self.bounds[:, 0]), self._cell(self.bounds[:, 1])
+        max_x, max_y = self._cell(self.bounds[:, 2]), self._cell(self.bounds[:, 3])
+        for tract_id in range(len(self.bounds)):
+            for cx in range(min_x[tract_id], max_x[tract_id] + 1):
+                for cy in range(min_y[tract_id], max_y[tract_id] + 1):
+                    grid.setdefault((cx, cy), []).append(tract_id)
+        return {cell: np.asarray(ids) for cell, ids in grid.items()}
+
+    def _contains(self, tract_id, lon, lat):
+        """Even-odd ray casting of many points against every ring of one tract"""
+        x1, y1, x2, y2 = self.edges[self.offsets[tract_id]:self.offsets[tract_id + 1]].T
+        px, py = lon[:, None], lat[:, None]
+        straddles = (y1 > py) != (y2 > py)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            crossing_x = (x2 - x1) * (py - y1) / (y2 - y1) + x1
+        return ((straddles & (px < crossing_x)).sum(axis=1) % 2) == 1
+
+    def locate(self, lon, lat):
+        """Row index into self.keys for each point, -1 where no tract contains it"""
+        lon, lat = np.asarray(lon, dtype=np.float64), np.asarray(lat, dtype=np.float64)
+        result = np.full(len(lon), -1, dtype=np.int64)
+        cells = np.stack([self._cell(lon), self._cell(lat)], axis=1)
+
+        # NOTE: Candidate (point, tract) pairs come from the grid, then a vectorized bbox check drops most of them.
+        point_ids, tract_ids = [], []
+        for point_id, cell in enumerate(map(tuple, cells)):
+            candidates = self.grid.get(cell)
+            if candidates is not None:
+                point_ids.append(np.full(len(candidates), point_id))
+                tract_ids.append(candidates)
+        if not point_ids:
+            return result
+        point_ids, tract_ids = np.concatenate(point_ids), np.concatenate(tract_ids)
+        box = self.bounds[tract_ids]
+        inside_box = (
+            (lon[point_ids] >= box[:, 0]) & (lon[point_ids] <= box[:, 2]) &
+            (lat[point_ids] >= box[:, 1]) & (lat[point_ids] <= box[:, 3])
+        )
+        point_ids, tract_ids = point_ids[inside_box], tract_ids[inside_box]
+
+        for tract_id in np.unique(tract_ids):
+            points = point_ids[(tract_ids == tract_id) & (result[point_ids] == -1)]
+            if len(points):
+                hits = self._contains(tract_id, lon[points], lat[points])
+                result[points[hits]] = tract_id
+        return result
+
+    def assign(self, stores_df):
+        """STORE_ID -> STATEFP/COUNTYFP/TRACT for every store, in the census_tract_geocoded.parquet schema"""
+        located = self.locate(stores_df["LONGITUDE"].to_numpy(), stores_df["LATITUDE"].to_numpy())
+        keys = self.keys.with_row_index("tract_row").with_columns(pl.col("tract_row").cast(pl.Int64))
+        return (
+            stores_df.select("STORE_ID")
+            .with_columns(pl.Series("tract_row", located))
+            .join(keys, on="tract_row", how="left")
+            .select(list(TRACT_SCHEMA))
+            .cast(TRACT_SCHEMA)
+        )
+
+
+def has_tract_boundaries(path=TRACT_BOUNDARIES_FILE):
+    return os.path.exists(path)
+
+
+def load_tract_index(path=TRACT_BOUNDARIES_FILE):
+    """Build the tract index from a TIGER GeoParquet file (STATEFP, COUNTYFP, TRACTCE, geometry)"""
+    tracts = (
+        pl.read_parquet(path, columns=["STATEFP", "COUNTYFP", "TRACTCE", "geometry"])
+        .rename({"TRACTCE": "TRACT"})
+        .filter(pl.col("geometry").is_not_null())
+    )
+    return TractIndex(tracts)
+
+
+def assign_store_tracts(stores_df, index=None, cache_file=TRACT_GEOCODED_FILE):
+    """Assign every store to its tract offline and persist the result where the geocoder would"""
+    index = index or load_tract_index()
+    tract_df = index.assign(stores_df)
+    write_atomic(tract_df, cache_file)
+    return tract_df
+
+
+def main():
+    stores_df = pl.read_parquet("data/cstore_stores.parquet", columns=["STORE_ID", "LATITUDE", "LONGITUDE"])
+    stores_df = stores_df.with_columns(pl.col("STORE_ID").cast(pl.Int64))
+    tract_df = assign_store_tracts(stores_df)
+    matched = tract_df.filter(pl.col("TRACT").is_not_null()).height
+    print(f"assigned {matched:,} of {len(tract_df):,} stores to tracts in {TRACT_GEOCODED_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""DuckDB backend against an on-disk database built from the synthetic parquet tables"""
+import duckdb
+import polars as pl
+from polars.testing import assert_frame_equal
+import pytest
+
+import backends
+from backends import DuckDBBackend, ParquetBackend, build_database, get_backend
+
+
+@pytest.fixture(scope="module")
+def database(dataset, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("duckdb") / "cstore.duckdb")
+    build_database(path)
+    return path
+
+
+def sorted_frame(lf):
+    df = lf.collect()
+    return df.sort(df.columns, nulls_last=True)
+
+
+def test_tables_match_parquet(database):
+    duck = DuckDBBackend(database).tables()
+    parquet = ParquetBackend().tables()
+    assert set(duck) == set(parquet)
+    for name in ("gtin", "stores", "daily", "sets", "items"):
+        # NOTE: DuckDB tables also carry the calendar columns, the parquet scans derive them only when filtering.
+        columns = parquet[name].collect_schema().names()
+        assert_frame_equal(sorted_frame(duck[name].select(columns)), sorted_frame(parquet[name]), check_dtypes=False)
+
+
+def test_row_count_matches_parquet(database):
+    duck, parquet = DuckDBBackend(database), ParquetBackend()
+    for name in ("gtin", "daily", "sets", "items"):
+        assert duck.row_count(name) == parquet.row_count(name)
+
+
+def test_predicate_is_pushed_down(database, monkeypatch):
+    calls = []
+    register = backends.register_io_source
+
+    def recording(source, schema):
+        def wrapped(with_columns, predicate, n_rows, batch_size):
+            calls.append((with_columns, predicate))
+            yield from source(with_columns, predicate, n_rows, batch_size)
+
+        return register(wrapped, schema=schema)
+
+    monkeypatch.setattr(backends, "register_io_source", recording)
+    sets = DuckDBBackend(database).scan("sets")
+    result = sets.filter(pl.col("GRAND_TOTAL_AMOUNT") > 20).select("TRANSACTION_SET_ID").collect()
+
+    (with_columns, predicate), = calls
+    assert predicate is not None
+    assert set(with_columns) == {"TRANSACTION_SET_ID", "GRAND_TOTAL_AMOUNT"}
+    # NOTE: DuckDB's polars source turns the predicate into SQL, None here would mean it's filtered in polars instead.
+    assert duckdb.polars_io._predicate_to_expression(predicate) is not None
+    expected = ParquetBackend().tables()["sets"].filter(pl.col("GRAND_TOTAL_AMOUNT") > 20).select(pl.len()).collect()
+    assert len(result) == expected.item()
+
+
+def test_falls_back_to_parquet_without_database(dataset, tmp_path):
+    assert isinstance(get_backend("duckdb", str(tmp_path / "missing.duckdb")), ParquetBackend)
+
+
+def test_falls_back_to_parquet_on_corrupt_database(dataset, tmp_path):
+    path = tmp_path / "corrupt.duckdb"
+    path.write_bytes(b"not a database" * 1024)
+    assert isinstance(get_backend("duckdb", str(path)), ParquetBackend)
+
+
+def test_pool_timeout_is_an_error(database):
+    backend = DuckDBBackend(database, pool_size=1, pool_timeout=0.1)
+    with backend.connection():
+        with pytest.raises(TimeoutError):
+            with backend.connection():
+                pass
+
+
+def test_sources_do_not_wait_on_the_pool(database):
+    backend = DuckDBBackend(database, pool_size=1, pool_timeout=0.1)
+    data = backend.tables()
+    with backend.connection():
+        joined = data["items"].join(data["sets"], on="TRANSACTION_SET_ID").select(pl.len()).collect().item()
+    assert joined == backend.row_count("items")
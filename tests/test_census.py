@@ -0,0 +1,152 @@
+"""Census clients against a local stub server"""
+import os
+
+import polars as pl
+import pytest
+import requests
+
+import census
+from census import geocode_stores, get_json, make_session
+
+
+def store_id(params):
+    """The stub's stores sit at longitude -80.<STORE_ID>"""
+    return round((-float(params["x"]) - 80) * 1000)
+
+
+def stores(n):
+    return pl.DataFrame({
+        "STORE_ID": list(range(n)),
+        "LATITUDE": [35.0] * n,
+        "LONGITUDE": [-(80 + i / 1000) for i in range(n)],
+    })
+
+
+def geocoder(fail=()):
+    def respond(path, params):
+        sid = store_id(params)
+        if sid in fail:
+            return 400, {"errors": ["bad coordinates"]}
+        tract = {"STATE": "01", "COUNTY": "001", "TRACT": f"{sid:06d}"}
+        return 200, {"result": {"geographies": {"Census Tracts": [tract]}}}
+    return respond
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    """Row counts of every cache write"""
+    rows = []
+    write_atomic = census.write_atomic
+
+    def recording(df, path):
+        rows.append(len(df))
+        write_atomic(df, path)
+
+    monkeypatch.setattr(census, "write_atomic", recording)
+    return rows
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_get_json_retries(stub_server, status):
+    answers = [(status, {}), (status, {}), (200, {"ok": True})]
+    server = stub_server(lambda path, params: answers.pop(0))
+    assert get_json(make_session(), server.url, {}, backoff=0) == {"ok": True}
+    assert len(server.requests) == 3
+
+
+def test_get_json_gives_up_after_retries(stub_server):
+    server = stub_server(lambda path, params: (503, {}))
+    with pytest.raises(requests.HTTPError):
+        get_json(make_session(), server.url, {}, retries=2, backoff=0)
+    assert len(server.requests) == 3
+
+
+def test_get_json_does_not_retry_client_errors(stub_server):
+    server = stub_server(lambda path, params: (404, {}))
+    with pytest.raises(requests.HTTPError):
+        get_json(make_session(), server.url, {}, backoff=0)
+    assert len(server.requests) == 1
+
+
+def test_geocode_flushes_every_100_stores(stub_server, writes, tmp_path):
+    server = stub_server(geocoder(fail={7}))
+    cache_file = str(tmp_path / "geocoded.parquet")
+    tracts, failed = geocode_stores(stores(250), cache_file=cache_file, rate=10_000, base_url=server.url)
+    assert writes == [100, 200, 250]
+    assert failed == 1
+    assert len(tracts) == 250
+    assert pl.read_parquet(cache_file).filter(pl.col("TRACT").is_null())["STORE_ID"].to_list() == [7]
+
+
+def test_geocode_rerun_sends_only_missing_and_failed_stores(stub_server, writes, tmp_path):
+    cache_file = str(tmp_path / "geocoded.parquet")
+    # NOTE: A run that stopped after its first flush: stores 0-89 geocoded, 90-99 failed, 100-149 never sent.
+    partial = pl.DataFrame({
+        "STORE_ID": list(range(100)),
+        "STATEFP": ["01"] * 90 + [None] * 10,
+        "COUNTYFP": ["001"] * 90 + [None] * 10,
+        "TRACT": [f"{i:06d}" for i in range(90)] + [None] * 10,
+    }, schema=census.TRACT_SCHEMA)
+    partial.write_parquet(cache_file)
+
+    server = stub_server(geocoder())
+    tracts, failed = geocode_stores(stores(150), cache_file=cache_file, rate=10_000, base_url=server.url)
+    assert sorted(store_id(params) for _, params in server.requests) == list(range(90, 150))
+    assert failed == 0
+    assert tracts.sort("STORE_ID")["TRACT"].to_list() == [f"{i:06d}" for i in range(150)]
+    assert writes == [150]
+    assert os.path.exists(cache_file)
+
+
+def test_geocode_rerun_with_everything_cached_sends_nothing(stub_server, tmp_path):
+    cache_file = str(tmp_path / "geocoded.parquet")
+    server = stub_server(geocoder())
+    geocode_stores(stores(20), cache_file=cache_file, rate=10_000, base_url=server.url)
+    sent = len(server.requests)
+    geocode_stores(stores(20), cache_file=cache_file, rate=10_000, base_url=server.url)
+    assert sent == 20
+    assert len(server.requests) == 20
+
+
+def acs_endpoint(tracts_per_county=9):
+    """Fake ACS API: every county has tracts 000100, 000200, ... with the tract number as each variable's value"""
+    def respond(path, params):
+        assert params["for"] == "tract:*"
+        state, county = (part.split(":")[1] for part in params["in"].split(" "))
+        header = census.ACS_VARS + ["state", "county", "tract"]
+        rows = [
+            [str(i)] * len(census.ACS_VARS) + [state, county, f"{i * 100:06d}"]
+            for i in range(1, tracts_per_county + 1)
+        ]
+        return 200, [header] + rows
+    return respond
+
+
+def test_fetch_tract_acs_one_request_per_county(stub_server, writes, tmp_path):
+    needed = pl.DataFrame({
+        "STATEFP": ["01", "01", "01", "01", "48"],
+        "COUNTYFP": ["001", "001", "003", "003", "201"],
+        "TRACT": ["000100", "000300", "000200", "000900", "000500"],
+    })
+    server = stub_server(acs_endpoint())
+    cache_file = str(tmp_path / "acs.parquet")
+    acs, failed = census.fetch_tract_acs(needed, cache_file=cache_file, rate=1_000, base_url=server.url)
+
+    counties = sorted(params["in"] for _, params in server.requests)
+    assert counties == ["state:01 county:001", "state:01 county:003", "state:48 county:201"]
+    assert failed == []
+    key = ["STATEFP", "COUNTYFP", "TRACT"]
+    assert acs.select(key).sort(key).equals(needed.sort(key))
+    assert acs.filter(pl.col("TRACT") == "000500")[census.ACS_VARS[0]].item() == "5"
+    assert writes == [len(needed)]
+    assert pl.read_parquet(cache_file).sort(key).equals(acs.sort(key))
+
+
+def test_fetch_tract_acs_reports_failed_counties(stub_server, writes, tmp_path):
+    ok = acs_endpoint()
+    server = stub_server(lambda path, params: (400, {}) if "county:003" in params["in"] else ok(path, params))
+    needed = pl.DataFrame({"STATEFP": ["01", "01"], "COUNTYFP": ["001", "003"], "TRACT": ["000100", "000100"]})
+    acs, failed = census.fetch_tract_acs(needed, cache_file=str(tmp_path / "acs.parquet"), rate=1_000, base_url=server.url)
+    assert failed == ["01-003"]
+    assert acs["COUNTYFP"].to_list() == ["001"]
+    assert writes == [1]
@@ -0,0 +1,25 @@
+"""FilterEngine selections over the synthetic parquet tables"""
+from data_layer import scan_all
+from filter_engine import FilterEngine
+
+TABLES = ("filtered_daily", "filtered_sets", "filtered_items")
+
+
+def test_empty_selection_has_the_partition_schema(dataset):
+    engine = FilterEngine(scan_all())
+    populated = engine.select(2024, [1])
+    empty = engine.select(1999, [1])
+    for table in TABLES:
+        assert len(populated[table]) > 0
+        assert len(empty[table]) == 0
+        assert empty[table].schema == populated[table].schema
+
+
+def test_store_selection_matches_the_full_period(dataset):
+    engine = FilterEngine(scan_all())
+    full = engine.select(2024, [1, 2])
+    stores = full["filtered_sets"]["STORE_ID"].unique().head(3).to_list()
+    selected = engine.select(2024, [1, 2], stores)
+    for table in TABLES:
+        expected = full[table].filter(full[table]["STORE_ID"].is_in(stores))
+        assert selected[table].sort(selected[table].columns).equals(expected.sort(expected.columns))
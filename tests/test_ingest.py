@@ -0,0 +1,19 @@
+"""Batch validation in ingest.py"""
+import polars as pl
+import pytest
+
+import ingest
+
+
+def test_table_without_files_is_a_value_error(monkeypatch):
+    monkeypatch.setattr(ingest, "source_files", lambda name: [])
+    with pytest.raises(ValueError, match="sets"):
+        ingest.table_schema("sets")
+
+
+def test_first_ingest_of_a_missing_table_is_a_value_error(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    batch = tmp_path / "sets.parquet"
+    pl.DataFrame({"TRANSACTION_SET_ID": [1], "STORE_ID": [101]}).write_parquet(batch)
+    with pytest.raises(ValueError, match="sets: no stored files"):
+        ingest.ingest(sets=[str(batch)])
@@ -0,0 +1,29 @@
+"""CentroidIndex radius queries against a brute-force distance scan"""
+import numpy as np
+import polars as pl
+
+import trade_area
+from trade_area import CentroidIndex, haversine_miles
+
+
+def test_query_matches_brute_force():
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(39, 41, 5_000)
+    lon = rng.uniform(-101, -99, 5_000)
+    index = CentroidIndex(pl.DataFrame({"TRACT": np.arange(5_000)}), lat, lon)
+
+    for radius in (1, 5, 10):
+        rows, dist = index.query(40.0, -100.0, radius)
+        expected = np.flatnonzero(haversine_miles(40.0, -100.0, lat, lon) <= radius)
+        assert sorted(index.keys["TRACT"].to_numpy()[rows]) == sorted(expected)
+        assert np.all(dist <= radius)
+
+
+def test_query_keeps_centroids_on_the_band_edges(monkeypatch):
+    # NOTE: A band narrower than the radius puts centroids exactly on its edges while still within the radius.
+    monkeypatch.setattr(trade_area, "MILES_PER_DEGREE_LAT", 70.0)
+    band = 5 / 70.0
+    lat = np.array([40 - band, 40.0, 40 + band])
+    index = CentroidIndex(pl.DataFrame({"TRACT": ["south", "center", "north"]}), lat, np.full(3, -100.0))
+    rows, _ = index.query(40.0, -100.0, 5)
+    assert sorted(index.keys["TRACT"].to_numpy()[rows]) == ["center", "north", "south"]
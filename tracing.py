@@ -0,0 +1,125 @@
+"""
+Lightweight tracing for dashboard reruns.
+A rerun opens a trace with start_trace(), stages record spans (wall time, result rows and RSS delta)
+with the span() context manager or the @traced decorator, and finish_trace() closes it. The finished
+trace is written as one JSON line to stdout, which Cloud Run ships as a structured log entry.
+
+Spans are no-ops outside a trace, so the query modules can stay decorated when they run from the
+benchmark suite or offline jobs. Set CSTORE_PERF_LOG=0 to turn the log line off.
+"""
+from contextlib import contextmanager
+import contextvars
+import functools
+import json
+import os
+import sys
+import time
+
+import polars as pl
+
+_trace = contextvars.ContextVar("cstore_trace", default=None)
+
+
+def perf_log_enabled():
+    """The per-rerun JSON log line is on unless CSTORE_PERF_LOG=0"""
+    return os.environ.get("CSTORE_PERF_LOG", "1") != "0"
+
+
+def current_rss():
+    """Resident set size of this process in bytes (Linux /proc, falls back to the ru_maxrss high-water mark)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def result_rows(result):
+    """Row count of a stage's result: DataFrames are counted, tuples of DataFrames summed, anything else None"""
+    if isinstance(result, pl.DataFrame):
+        return len(result)
+    if isinstance(result, tuple) and result and all(isinstance(r, pl.DataFrame) for r in result):
+        return sum(len(r) for r in result)
+    return None
+
+
+def start_trace(**fields):
+    """Open a trace for the current rerun, fields (page, filters, ...) are copied into the log line"""
+    trace = {'fields': fields, 'spans': [], 'depth': 0, 'start': time.perf_counter(), 'rss': current_rss()}
+    _trace.set(trace)
+    return trace
+
+
+def annotate_trace(**fields):
+    """Add fields to the current trace once they are known (e.g. the page picked in the sidebar)"""
+    trace = _trace.get()
+    if trace is not None:
+        trace['fields'].update(fields)
+
+
+@contextmanager
+def span(name, rows=None):
+    """Time one stage, the yielded dict's 'rows' can be set inside the block"""
+    trace = _trace.get()
+    record = {'name': name, 'rows': rows}
+    if trace is None:
+        yield record
+        return
+
+    record['depth'] = trace['depth']
+    trace['depth'] += 1
+    rss_before = current_rss()
+    start = time.perf_counter()
+    record['offset'] = round(start - trace['start'], 4)
+    try:
+        yield record
+    finally:
+        record['seconds'] = round(time.perf_counter() - start, 4)
+        record['rss_delta_mb'] = round((current_rss() - rss_before) / 2**20, 1)
+        trace['depth'] -= 1
+        trace['spans'].append(record)
+
+
+def traced(name=None):
+    """Decorator form of span(), the result's row count is recorded when it is a DataFrame, a cache's clear() is kept"""
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name) as record:
+                result = fn(*args, **kwargs)
+                record['rows'] = result_rows(result)
+                return result
+        # NOTE: A traced st.cache_* function keeps its clear(), functools.wraps only copies plain attributes.
+        if hasattr(fn, "clear"):
+            wrapper.clear = fn.clear
+        return wrapper
+    return decorator
+
+
+def finish_trace():
+    """Close the current trace and return it as a log-ready dict, spans in start order"""
+    trace = _trace.get()
+    if trace is None:
+        return None
+    _trace.set(None)
+    # NOTE: Spans are appended when they end, so inner spans come before their parent until they are re-sorted.
+    spans = sorted(trace['spans'], key=lambda s: s['offset'])
+    return {
+        **trace['fields'],
+        'total_seconds': round(time.perf_counter() - trace['start'], 4),
+        'rss_mb': round(current_rss() / 2**20, 1),
+        'rss_delta_mb': round((current_rss() - trace['rss']) / 2**20, 1),
+        'spans': spans
+    }
+
+
+def log_trace(summary, stream=None, message="rerun"):
+    """Write a finished trace as one structured JSON line (Cloud Logging reads severity and message)"""
+    if summary is None or not perf_log_enabled():
+        return
+    stream = stream or sys.stdout
+    stream.write(json.dumps({'severity': "INFO", 'message': message, **summary}, default=str) + "\n")
+    stream.flush()
@@ -0,0 +1,138 @@
+"""
+Radius-based trade-area demographics.
+Tract centroids are held in a latitude-sorted index, so a radius query is a binary search for the
+latitude band followed by a vectorized haversine over that band only. ACS counts are summed over the
+tracts inside the radius and ACS medians are population-weighted.
+"""
+import numpy as np
+import polars as pl
+
+from census import ACS_VARS
+from spatial import TRACT_BOUNDARIES_FILE, load_tract_index
+from tracing import traced
+
+EARTH_RADIUS_MILES = 3958.8
+MILES_PER_DEGREE_LAT = 69.0
+
+TRADE_AREA_ACS_FILE = "data/census_trade_area_acs.parquet"
+MAX_RADIUS_MILES = 10
+
+POPULATION_VAR = "B01003_001E"
+# NOTE: Medians can't be summed across tracts, they are weighted by tract population instead.
+MEDIAN_VARS = ["B19019_001E", "B25077_001E", "B25064_001E"]
+COUNT_VARS = [var for var in ACS_VARS if var not in MEDIAN_VARS]
+
+
+def haversine_miles(lat1, lon1, lat2, lon2):
+    """Great-circle distance in miles, vectorized over numpy arrays"""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(a))
+
+
+class CentroidIndex:
+    """Tract centroids sorted by latitude for fast radius queries"""
+
+    def __init__(self, keys, lat, lon):
+        order = np.argsort(lat)
+        self.keys = keys[order]
+        self.lat = np.asarray(lat, dtype=np.float64)[order]
+        self.lon = np.asarray(lon, dtype=np.float64)[order]
+
+    def query(self, lat, lon, radius_miles):
+        """(tract rows, distances) for every centroid within radius_miles of one point"""
+        band = radius_miles / MILES_PER_DEGREE_LAT
+        # NOTE: Both ends are inclusive, a centroid exactly on the band's edge is still within the radius.
+        lo = np.searchsorted(self.lat, lat - band, side="left")
+        hi = np.searchsorted(self.lat, lat + band, side="right")
+        dist = haversine_miles(lat, lon, self.lat[lo:hi], self.lon[lo:hi])
+        within = dist <= radius_miles
+        return np.arange(lo, hi)[within], dist[within]
+
+    def query_many(self, store_ids, lats, lons, radius_miles):
+        """Every (STORE_ID, tract) pair within the radius, with the distance between them"""
+        pairs_store, pairs_tract, pairs_dist = [], [], []
+        for store_id, lat, lon in zip(store_ids, lats, lons):
+            if lat is None or lon is None:
+                continue
+            rows, dist = self.query(lat, lon, radius_miles)
+            pairs_store.extend([store_id] * len(rows))
+            pairs_tract.append(rows)
+            pairs_dist.append(dist)
+        rows = np.concatenate(pairs_tract) if pairs_tract else np.empty(0, dtype=np.int64)
+        dist = np.concatenate(pairs_dist) if pairs_dist else np.empty(0)
+        return pl.concat(
+            [
+                pl.DataFrame({"STORE_ID": pl.Series(pairs_store, dtype=pl.Int64), "distance_miles": dist}),
+                self.keys[rows]
+            ],
+            how="horizontal"
+        )
+
+
+def load_centroid_index(path=TRACT_BOUNDARIES_FILE):
+    """
+    Centroid index from the TIGER boundary file
+    Uses the TIGER internal points (INTPTLAT/INTPTLON) when present, bounding-box centers otherwise
+    """
+    columns = pl.read_parquet_schema(path)
+    if "INTPTLAT" in columns and "INTPTLON" in columns:
+        tracts = (
+            pl.read_parquet(path, columns=["STATEFP", "COUNTYFP", "TRACTCE", "INTPTLAT", "INTPTLON"])
+            .rename({"TRACTCE": "TRACT"})
+            .with_columns([pl.col("INTPTLAT").cast(pl.Float64), pl.col("INTPTLON").cast(pl.Float64)])
+        )
+        return CentroidIndex(
+            tracts.select(["STATEFP", "COUNTYFP", "TRACT"]),
+            tracts["INTPTLAT"].to_numpy(),
+            tracts["INTPTLON"].to_numpy()
+        )
+
+    index = load_tract_index(path)
+    return CentroidIndex(
+        index.keys,
+        (index.bounds[:, 1] + index.bounds[:, 3]) / 2,
+        (index.bounds[:, 0] + index.bounds[:, 2]) / 2
+    )
+
+
+@traced()
+def trade_area_tracts(stores_df, index, radius_miles=MAX_RADIUS_MILES):
+    """Unique tracts within radius_miles of any store, the set of tracts whose ACS data is needed"""
+    pairs = index.query_many(stores_df["STORE_ID"], stores_df["LATITUDE"], stores_df["LONGITUDE"], radius_miles)
+    return pairs.select(["STATEFP", "COUNTYFP", "TRACT"]).unique()
+
+
+@traced()
+def trade_area_demographics(stores_df, index, acs_df, radius_miles):
+    """
+    ACS variables aggregated over each store's trade area
+    Counts are summed, medians are population-weighted averages of the tract medians
+    """
+    pairs = index.query_many(stores_df["STORE_ID"], stores_df["LATITUDE"], stores_df["LONGITUDE"], radius_miles)
+
+    # NOTE: The ACS API reports missing estimates as large negative sentinels (e.g. -666666666), treat them as null.
+    acs = acs_df.select(
+        ["STATEFP", "COUNTYFP", "TRACT"] +
+        [pl.col(var).cast(pl.Float64, strict=False).alias(var) for var in ACS_VARS]
+    ).with_columns([
+        pl.when(pl.col(var) < 0).then(None).otherwise(pl.col(var)).alias(var) for var in ACS_VARS
+    ])
+
+    population = pl.col(POPULATION_VAR)
+    return (
+        pairs
+        .join(acs, on=["STATEFP", "COUNTYFP", "TRACT"], how="inner")
+        .group_by("STORE_ID")
+        .agg(
+            [pl.len().alias("tract_count")] +
+            [pl.col(var).sum().alias(var) for var in COUNT_VARS] +
+            [
+                pl.when(population.filter(pl.col(var).is_not_null()).sum() > 0)
+                .then((pl.col(var) * population).sum() / population.filter(pl.col(var).is_not_null()).sum())
+                .alias(var)
+                for var in MEDIAN_VARS
+            ]
+        )
+        .select(["STORE_ID", "tract_count"] + ACS_VARS)
+    )
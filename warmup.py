@@ -0,0 +1,100 @@
+"""
+Cache warm-up for a new instance.
+Without it, the first user after a scale-up pays for load_data(), the default All Years / all months selection
+and every page's first aggregation. warm_up() runs each page once headlessly (Streamlit's bare mode, every
+widget at its default) in this process, which fills the same process-wide caches a real session reads: the
+st.cache_resource loaders, the filter engine's partitions, the st.cache_data results and the rendered tables.
+A second round then times the pages again, its median is what a first visitor should now see.
+
+serve.py runs it before the server starts listening, so the instance only turns ready once the caches are
+warm. The warm-up is logged as one JSON line (message "warmup") with a span per page and round, and shown in
+the sidebar Performance panel. Set CSTORE_WARMUP=0 to skip it and CSTORE_WARMUP_ROUNDS to change the rounds.
+"""
+import os
+import runpy
+import statistics
+import time
+
+import streamlit as st
+from streamlit import logger as st_logger
+
+from app_data import PAGES, load_data, load_table_counts
+from tracing import finish_trace, log_trace, span, start_trace
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+ALL_MONTHS = list(range(1, 13))
+WARMUP_ROUNDS = int(os.environ.get("CSTORE_WARMUP_ROUNDS", "2"))
+
+_report = {}
+
+
+def warmup_enabled():
+    """Warm-up runs at start unless CSTORE_WARMUP=0"""
+    return os.environ.get("CSTORE_WARMUP", "1") != "0"
+
+
+def run_page(path):
+    """Execute a page script the way Streamlit does, outside a session every st call renders nothing"""
+    # NOTE: Page paths are relative to the entry point, like st.Page resolves them.
+    runpy.run_path(os.path.join(APP_DIR, path), run_name="__main__")
+
+
+def warm_up(year=None, months=None, rounds=WARMUP_ROUNDS):
+    """
+    Populate the process caches with the default selection and every page, rounds times
+    Returns the report: total seconds, per-round page seconds and the median page latency of the last round
+    """
+    months = months or ALL_MONTHS
+    # NOTE: Bare mode warns about the missing session on every st call, those warnings are noise here.
+    # NOTE: Reading the option parses the config first, which would otherwise reset the level on the first st call.
+    log_level = st.get_option("logger.level")
+    st_logger.set_log_level("error")
+    start_trace(year=year, months=months, rounds=rounds)
+    errors = {}
+    page_seconds = []
+    try:
+        with span("load_data"):
+            load_table_counts(load_data())
+        st.session_state["global_filters"] = (year, months, None)
+        for round_number in range(1, rounds + 1):
+            seconds = {}
+            for path, title in PAGES:
+                start = time.perf_counter()
+                with span(f"round {round_number}: {title}"):
+                    # NOTE: A failing page only loses its own warm-up, the instance still starts.
+                    try:
+                        run_page(path)
+                    except Exception as e:
+                        errors[title] = repr(e)
+                seconds[title] = round(time.perf_counter() - start, 4)
+            page_seconds.append(seconds)
+    finally:
+        summary = finish_trace()
+        st_logger.set_log_level(log_level)
+
+    summary['page_seconds'] = page_seconds
+    summary['page_p50_seconds'] = round(statistics.median(page_seconds[-1].values()), 4) if page_seconds else None
+    summary['errors'] = errors
+    log_trace(summary, message="warmup")
+    _report.clear()
+    _report.update(summary)
+    return summary
+
+
+def warmup_report():
+    """The report of this process's warm-up, empty when it didn't run"""
+    return dict(_report)
+
+
+def main():
+    summary = warm_up()
+    print(f"warm-up {summary['total_seconds']:.2f}s, page p50 after warm-up {summary['page_p50_seconds']}s")
+    for round_number, seconds in enumerate(summary['page_seconds'], 1):
+        for title, value in seconds.items():
+            print(f"  round {round_number}  {value:>8.4f}s  {title}")
+    for title, error in summary['errors'].items():
+        print(f"  failed: {title}: {error}")
+
+
+if __name__ == "__main__":
+    main()